@@ -1,6 +1,7 @@
+import atexit
+import io
 import os
-import queue
-import threading
+import signal
 from datetime import datetime
 from flask import Flask, request, jsonify
 from flask_cors import CORS
@@ -12,9 +13,15 @@ from paper_generation_service import (
     PaperGenerationError,
     generate_primary6_math_pdf,
     get_available_topics,
+    get_runtime_stats,
     is_supported_subject,
     normalize_topics,
+    start_inventory_builder,
+    stop_inventory_builder,
+    warm_up,
 )
+from job_store import PaperJobStore
+from worker_pool import PaperWorkerPool
 
 # Load environment variables from .env file
 load_dotenv()
@@ -31,8 +38,10 @@ EXPO_PUSH_URL = 'https://exp.host/--/api/v2/push/send'
 # Initialize Supabase client
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-# Internal event queue
-paper_queue = queue.Queue()
+try:
+    SHUTDOWN_TIMEOUT = float(os.getenv('PAPER_SHUTDOWN_TIMEOUT', '600'))
+except (TypeError, ValueError):
+    SHUTDOWN_TIMEOUT = 600.0
 
 def send_expo_push_notification(expo_push_token, title, body, data=None):
     """Send push notification via Expo"""
@@ -106,6 +115,13 @@ def process_paper_generation(paper_data):
     
     try:
         print(f"Processing paper generation for ID: {paper_id}")
+
+        # Redelivered jobs may already have been finished by another worker
+        if paper_data.get('_recovered') or paper_data.get('_attempt', 1) > 1:
+            current = supabase.table('generated_papers').select('status').eq('id', paper_id).single().execute()
+            if current.data and current.data.get('status') in ('completed', 'failed'):
+                print(f"Paper {paper_id} is already {current.data['status']}, skipping redelivered job")
+                return
         
         # Update status to 'processing'
         supabase.table('generated_papers').update({
@@ -124,16 +140,22 @@ def process_paper_generation(paper_data):
         
         # Generate the practice paper (calls your AI pipeline)
         print(f"Generating paper for {subject_name} - {grade_level}, Topics: {topics_list}")
-        pdf_buffer, metadata = generate_primary6_math_pdf(subject_name, grade_level, topics_list)
+        # The answer key is rendered in the same pass as the paper, when requested
+        answer_key_buffer = io.BytesIO() if paper_data.get('includeAnswerKey') else None
+        pdf_buffer, metadata = generate_primary6_math_pdf(
+            subject_name, grade_level, topics_list, tutor_id=tutor_id, answer_key=answer_key_buffer
+        )
         
         # Upload to Supabase Storage
-        filename = f"{paper_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"{paper_id}_{timestamp}.pdf"
         storage_path = f"{tutor_id}/{filename}"
         
         print(f"Uploading to storage: {storage_path}")
         supabase.storage.from_('generatedPapers').upload(
             path=storage_path,
-            file=pdf_buffer.read(),
+            # getvalue() hands over the buffer's bytes without copying them
+            file=pdf_buffer.getvalue(),
             file_options={
                 'content-type': 'application/pdf',
                 'upsert': 'true'
@@ -144,6 +166,20 @@ def process_paper_generation(paper_data):
         download_url = supabase.storage.from_('generatedPapers').get_public_url(storage_path)
         
         print(f"Paper uploaded successfully. Download URL: {download_url}")
+
+        answer_key_url = None
+        if answer_key_buffer is not None:
+            answer_key_path = f"{tutor_id}/{paper_id}_{timestamp}_answers.pdf"
+            supabase.storage.from_('generatedPapers').upload(
+                path=answer_key_path,
+                file=answer_key_buffer.getvalue(),
+                file_options={
+                    'content-type': 'application/pdf',
+                    'upsert': 'true'
+                }
+            )
+            answer_key_url = supabase.storage.from_('generatedPapers').get_public_url(answer_key_path)
+            print(f"Answer key uploaded successfully. Download URL: {answer_key_url}")
         
         # Update database record with download URL and status
         supabase.table('generated_papers').update({
@@ -154,15 +190,18 @@ def process_paper_generation(paper_data):
         
         # Send push notification
         if expo_push_token:
+            push_data = {
+                'type': 'paper_completed',
+                'paperId': paper_id,
+                'downloadUrl': download_url
+            }
+            if answer_key_url:
+                push_data['answerKeyUrl'] = answer_key_url
             send_expo_push_notification(
                 expo_push_token,
                 'Paper Ready!',
                 f'Your {subject_name} practice paper is ready to download.',
-                {
-                    'type': 'paper_completed',
-                    'paperId': paper_id,
-                    'downloadUrl': download_url
-                }
+                push_data
             )
         
         print(f"Paper generation completed successfully for ID: {paper_id}")
@@ -179,30 +218,77 @@ def process_paper_generation(paper_data):
         )
 
 
-def queue_worker():
+def handle_dead_letter(paper_data):
+    """Fail papers whose job kept crashing or timing out its worker."""
+    mark_paper_failed(
+        paper_data['id'],
+        paper_data.get('expoPushToken'),
+        'There was an error generating your practice paper. Please try again.'
+    )
+
+
+def recover_unfinished_papers():
     """
-    Background worker that continuously polls the queue and processes jobs.
-    Runs in a separate thread.
+    Startup recovery sweep: re-enqueue papers still marked pending/processing
+    (e.g. queued before a restart or crash). Papers already in the job store
+    are left untouched, so this is safe to run from every backend process.
     """
-    print("Queue worker started")
-    while True:
-        try:
-            # Get paper data from queue (blocks until item is available)
-            paper_data = paper_queue.get()
-            
-            # Process the paper generation
-            process_paper_generation(paper_data)
-            
-            # Mark task as done
-            paper_queue.task_done()
-            
-        except Exception as e:
-            print(f"Queue worker error: {str(e)}")
+    try:
+        released = job_store.recover_orphaned_leases()
+        response = supabase.table('generated_papers').select(
+            'id, tutorId, subjectId, topics, expoPushToken'
+        ).in_('status', ['pending', 'processing']).execute()
+        requeued = 0
+        for row in response.data or []:
+            if job_store.put({
+                'id': row['id'],
+                'tutorId': row['tutorId'],
+                'subjectId': row['subjectId'],
+                'topics': row['topics'],
+                'expoPushToken': row.get('expoPushToken'),
+                '_recovered': True,
+            }):
+                requeued += 1
+        print(f"Recovery sweep: re-enqueued {requeued} paper(s), released {released} orphaned lease(s)")
+    except Exception as e:
+        print(f"Recovery sweep failed: {str(e)}")
+
 
+def shutdown_workers(*_args):
+    """
+    Stop taking new jobs and let the workers finish in-flight ones; queued jobs
+    stay in the job store for the next start. Registered for interpreter exit and SIGTERM/SIGINT.
+    """
+    stop_inventory_builder()
+    worker_pool.shutdown(timeout=SHUTDOWN_TIMEOUT)
 
-# Start the background worker thread
-worker_thread = threading.Thread(target=queue_worker, daemon=True)
-worker_thread.start()
+
+def _handle_shutdown_signal(signum, _frame):
+    print(f"Received signal {signum}, finishing in-flight papers before exit")
+    shutdown_workers()
+    raise SystemExit(0)
+
+
+# Load the question bank and generator once, before any worker needs it
+warm_up()
+
+# Durable job queue (SQLite, see job_store.py) shared by every backend process on this host
+job_store = PaperJobStore(on_dead_letter=handle_dead_letter)
+recover_unfinished_papers()
+
+# Start the background worker pool (size from PAPER_WORKER_COUNT)
+worker_pool = PaperWorkerPool(job_store, process_paper_generation)
+worker_pool.start()
+
+# Pre-generate questions while no paper is being generated (QUESTION_INVENTORY_TARGET > 0)
+start_inventory_builder(should_pause=lambda: worker_pool.in_flight > 0)
+atexit.register(shutdown_workers)
+for _signal in (signal.SIGTERM, signal.SIGINT):
+    try:
+        signal.signal(_signal, _handle_shutdown_signal)
+    except ValueError:
+        # Signal handlers can only be installed from the main thread
+        pass
 
 
 @app.route('/available-topics', methods=['GET'])
@@ -220,6 +306,22 @@ def available_topics():
         return jsonify({'error': f'Failed to fetch topics: {str(e)}'}), 500
 
 
+@app.route('/stats', methods=['GET'])
+def runtime_stats():
+    """
+    Monitoring counters for the generation pipeline and the paper queue.
+    """
+    try:
+        stats = get_runtime_stats()
+        stats['queue'] = {
+            'queued_or_leased': job_store.qsize(),
+            'in_flight': worker_pool.in_flight,
+        }
+        return jsonify(stats)
+    except Exception as e:
+        return jsonify({'error': f'Failed to fetch stats: {str(e)}'}), 500
+
+
 @app.route('/generate-paper', methods=['POST'])
 def generate_paper():
     """
@@ -230,7 +332,8 @@ def generate_paper():
         "tutorId": "uuid",
         "subjectId": "uuid",
         "topics": "comma-separated topics",
-        "expoPushToken": "ExponentPushToken[...]" (optional)
+        "expoPushToken": "ExponentPushToken[...]" (optional),
+        "includeAnswerKey": true (optional)
     }
     """
     try:
@@ -241,6 +344,7 @@ def generate_paper():
         subject_id = data.get('subjectId')
         topics = data.get('topics')
         expo_push_token = data.get('expoPushToken')
+        include_answer_key = bool(data.get('includeAnswerKey'))
         
         # Validate required fields
         if not tutor_id or not subject_id or not topics:
@@ -285,8 +389,8 @@ def generate_paper():
         
         print(f"Created paper record with ID: {paper_id}")
         
-        # Add to queue for processing
-        paper_queue.put({
+        # Persist the job for the worker pool
+        job_store.put({
             'id': paper_id,
             'tutorId': tutor_id,
             'subjectId': subject_id,
@@ -294,7 +398,8 @@ def generate_paper():
             'topicsList': canonical_topics,
             'subjectName': subject_name,
             'gradeLevel': grade_level,
-            'expoPushToken': expo_push_token
+            'expoPushToken': expo_push_token,
+            'includeAnswerKey': include_answer_key
         })
         
         print(f"Added paper {paper_id} to processing queue")
@@ -315,5 +420,5 @@ def generate_paper():
 
 if __name__ == '__main__':
     print("Starting Flask AI Backend Server...")
-    print(f"Queue worker running in background thread")
+    print(f"Paper worker pool running with {worker_pool.size} thread(s)")
     app.run(host='0.0.0.0', port=5000, debug=False)  # debug=False for production
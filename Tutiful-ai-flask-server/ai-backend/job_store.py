@@ -0,0 +1,275 @@
+"""
+SQLite-backed paper job queue that survives restarts and can be shared by
+several backend processes on the same host.
+
+Jobs are claimed with a lease. A worker that crashes (or a process that is
+killed) simply stops renewing its lease, and once the lease expires the job
+becomes visible again to any worker, giving at-least-once processing.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional
+
+
+DEFAULT_DB_PATH = Path(__file__).resolve().parent / "paper_jobs.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS paper_jobs (
+    paper_id TEXT PRIMARY KEY,
+    tutor_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires_at REAL,
+    enqueued_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_paper_jobs_status ON paper_jobs (status, enqueued_at);
+CREATE INDEX IF NOT EXISTS idx_paper_jobs_tutor ON paper_jobs (tutor_id, status);
+"""
+
+# Pick the visible job whose tutor currently holds the fewest live leases,
+# oldest first. This keeps the per-tutor fairness of the old in-memory queue
+# while letting several processes pull from the same table.
+_CLAIM_SQL = """
+SELECT j.paper_id, j.payload, j.attempts
+FROM paper_jobs AS j
+WHERE j.status = 'queued'
+   OR (j.status = 'leased' AND j.lease_expires_at < :now)
+ORDER BY (
+    SELECT COUNT(*) FROM paper_jobs AS l
+    WHERE l.tutor_id = j.tutor_id
+      AND l.status = 'leased'
+      AND l.lease_expires_at >= :now
+), j.enqueued_at
+LIMIT 1
+"""
+
+
+def _env_number(name: str, default, cast=int):
+    try:
+        return cast(os.getenv(name, str(default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class PaperJobStore:
+    """Durable job queue with leases, visibility timeouts and retry counts."""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        lease_seconds: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        poll_interval: float = 2.0,
+        on_dead_letter: Optional[Callable[[Dict], None]] = None,
+    ):
+        self.db_path = str(db_path or os.getenv('PAPER_QUEUE_DB') or DEFAULT_DB_PATH)
+        self.lease_seconds = lease_seconds or _env_number('PAPER_JOB_LEASE_SECONDS', 300.0, float)
+        self.max_attempts = max_attempts or _env_number('PAPER_JOB_MAX_ATTEMPTS', 3)
+        self.poll_interval = poll_interval
+        self.on_dead_letter = on_dead_letter
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._condition = threading.Condition()
+        self._closed = False
+
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per call keeps this safe across threads and processes
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    def put(self, paper_data: Dict) -> bool:
+        """Persist a job. Returns False when the paper is already queued or running."""
+        if self._closed:
+            raise RuntimeError("Paper queue is shutting down; not accepting new jobs.")
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO paper_jobs (paper_id, tutor_id, payload, enqueued_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    str(paper_data['id']),
+                    str(paper_data.get('tutorId') or ''),
+                    json.dumps(paper_data),
+                    now,
+                    now,
+                ),
+            )
+            inserted = cursor.rowcount > 0
+        finally:
+            conn.close()
+        if inserted:
+            with self._condition:
+                self._condition.notify()
+        return inserted
+
+    def _claim(self) -> Optional[Dict]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(_CLAIM_SQL, {'now': now}).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            paper_id, payload, attempts = row
+            paper_data = json.loads(payload)
+            if attempts >= self.max_attempts:
+                # The job kept losing its lease (worker crash/kill); stop redelivering it
+                conn.execute(
+                    "UPDATE paper_jobs SET status = 'dead', lease_owner = NULL, updated_at = ? WHERE paper_id = ?",
+                    (now, paper_id),
+                )
+                conn.execute("COMMIT")
+                print(f"Paper {paper_id} exceeded {self.max_attempts} attempts; moving to dead letter")
+                if self.on_dead_letter:
+                    try:
+                        self.on_dead_letter(paper_data)
+                    except Exception as e:
+                        print(f"Dead letter handler failed for {paper_id}: {str(e)}")
+                return {}
+            conn.execute(
+                "UPDATE paper_jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires_at = ?, updated_at = ? WHERE paper_id = ?",
+                (self.owner, now + self.lease_seconds, now, paper_id),
+            )
+            conn.execute("COMMIT")
+            paper_data['_attempt'] = attempts + 1
+            return paper_data
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        Lease the next job, waiting up to `timeout` seconds (forever when None).
+        Returns None on timeout or once the store is closed.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._closed:
+            job = self._claim()
+            if job:
+                return job
+            if job == {}:
+                continue  # dead-lettered a job, look again straight away
+            wait = self.poll_interval
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                wait = min(wait, remaining)
+            # Other processes can enqueue too, so fall back to polling
+            with self._condition:
+                if not self._closed:
+                    self._condition.wait(wait)
+        return None
+
+    def complete(self, paper_id: str) -> None:
+        """Acknowledge a job; it will not be delivered again."""
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM paper_jobs WHERE paper_id = ?", (str(paper_id),))
+        finally:
+            conn.close()
+
+    def release(self, paper_id: str) -> None:
+        """Give a leased job back to the queue without waiting for the lease to expire."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE paper_jobs SET status = 'queued', lease_owner = NULL, lease_expires_at = NULL, "
+                "updated_at = ? WHERE paper_id = ? AND status = 'leased'",
+                (time.time(), str(paper_id)),
+            )
+        finally:
+            conn.close()
+
+    def extend_leases(self, paper_ids: Iterable[str]) -> None:
+        """Renew the visibility timeout for jobs this process is still working on."""
+        paper_ids = [str(paper_id) for paper_id in paper_ids]
+        if not paper_ids:
+            return
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "UPDATE paper_jobs SET lease_expires_at = ?, updated_at = ? "
+                "WHERE paper_id = ? AND status = 'leased' AND lease_owner = ?",
+                [(now + self.lease_seconds, now, paper_id, self.owner) for paper_id in paper_ids],
+            )
+        finally:
+            conn.close()
+
+    def recover_orphaned_leases(self) -> int:
+        """
+        Requeue jobs leased by processes on this host that are no longer running,
+        instead of waiting for their leases to time out.
+        """
+        host = socket.gethostname()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT paper_id, lease_owner FROM paper_jobs WHERE status = 'leased' AND lease_owner LIKE ?",
+                (f"{host}:%",),
+            ).fetchall()
+        finally:
+            conn.close()
+        recovered = 0
+        for paper_id, owner in rows:
+            try:
+                pid = int(owner.rsplit(':', 1)[1])
+            except (IndexError, ValueError):
+                continue
+            if pid != os.getpid() and not _process_alive(pid):
+                self.release(paper_id)
+                recovered += 1
+        return recovered
+
+    def close(self) -> None:
+        """Stop handing out jobs. Queued jobs stay on disk for the next start."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def qsize(self) -> int:
+        conn = self._connect()
+        try:
+            (count,) = conn.execute(
+                "SELECT COUNT(*) FROM paper_jobs WHERE status IN ('queued', 'leased')"
+            ).fetchone()
+            return count
+        finally:
+            conn.close()
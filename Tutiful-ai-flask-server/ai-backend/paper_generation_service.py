@@ -10,11 +10,10 @@ import json
 import random
 import re
 import sys
-import tempfile
-import uuid
+import threading
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Sequence, Tuple
+from typing import BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple
 
 
 class PaperGenerationError(Exception):
@@ -49,6 +48,62 @@ SUPPORTED_SUBJECT_KEYWORDS = ("math", "mathematics")
 SUPPORTED_GRADE_KEYWORDS = ("primary 6", "primary six", "p6", "grade 6", "grade six", "6")
 
 
+_generator: FinalWorkingPSLEMathPaperGenerator | None = None
+_generator_lock = threading.Lock()
+_inventory_builder = None
+
+
+def get_generator() -> FinalWorkingPSLEMathPaperGenerator:
+    """
+    Return the process-wide generator, loading the question bank and agents on first use.
+    The generator is thread-safe; per-paper state lives in a GenerationSession.
+    """
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = FinalWorkingPSLEMathPaperGenerator(str(QUESTIONS_FILE))
+    return _generator
+
+
+def warm_up() -> None:
+    """Load the generator at startup so the first paper doesn't pay for it."""
+    get_generator()
+
+
+def start_inventory_builder(should_pause: Optional[Callable[[], bool]] = None) -> None:
+    """
+    Keep the question inventory topped up in the background (only when
+    QUESTION_INVENTORY_TARGET > 0). `should_pause` lets live papers have the LM server first.
+    """
+    global _inventory_builder
+    with _generator_lock:
+        if _inventory_builder is not None:
+            return
+        _inventory_builder = get_generator().create_inventory_builder(should_pause)
+    if _inventory_builder is not None:
+        _inventory_builder.start()
+
+
+def stop_inventory_builder(timeout: float = 5.0) -> None:
+    if _inventory_builder is not None:
+        _inventory_builder.stop(timeout)
+
+
+def get_runtime_stats() -> Dict:
+    """Counters worth watching in production (LM response cache hit rate, inventory levels, ...)."""
+    generator = get_generator()
+    return {
+        'lm_cache': generator.cache_stats(),
+        'inventory': generator.inventory.levels() if generator.inventory else {},
+        'stem_normalizer': generator.generator.stem_normalizer.stats(),
+        'answer_checker': generator.validator.answer_checker.stats(),
+        'generation_stats': generator.generation_stats.snapshot() if generator.generation_stats else {},
+        'tutor_exposure': generator.exposure_index.stats() if generator.exposure_index else {},
+        'pdf_cache': generator.formatter.pdf_cache.stats() if generator.formatter.pdf_cache else {},
+    }
+
+
 def _normalize_token(value: str) -> str:
     return re.sub(r"[^a-z0-9]", "", (value or "").strip().lower())
 
@@ -157,8 +212,15 @@ def generate_primary6_math_pdf(
     subject_name: str,
     grade_level: str,
     topics: Sequence[str],
+    tutor_id: Optional[str] = None,
+    answer_key: Optional[BinaryIO] = None,
 ) -> Tuple[io.BytesIO, Dict[str, str]]:
-    """Generate a Primary 6 Math paper and return the PDF bytes + metadata."""
+    """Generate a Primary 6 Math paper and return the PDF bytes + metadata.
+
+    With a `tutor_id`, curated questions from the tutor's earlier papers are avoided.
+    With an `answer_key` stream, the paper's answer key and marking scheme are rendered
+    into it in the same pass.
+    """
     if not is_supported_subject(subject_name, grade_level):
         raise PaperGenerationError("Only Primary 6 Mathematics is supported at the moment.")
 
@@ -166,12 +228,13 @@ def generate_primary6_math_pdf(
         raise PaperGenerationError("Please choose at least one topic.")
 
     topic_distribution = _build_topic_distribution(list(topics), TOTAL_QUESTIONS)
-    generator = FinalWorkingPSLEMathPaperGenerator(str(QUESTIONS_FILE))
+    generator = get_generator()
 
     paper_data = generator.generate_practice_paper(
         title=_build_title(subject_name),
         total_questions=TOTAL_QUESTIONS,
         topics_distribution=topic_distribution,
+        tutor_id=tutor_id,
     )
 
     if not paper_data:
@@ -179,18 +242,15 @@ def generate_primary6_math_pdf(
             "We could not generate a paper right now. Please try again in a moment."
         )
 
-    pdf_path = _render_pdf(generator, paper_data)
-    pdf_bytes = pdf_path.read_bytes()
-    pdf_path.unlink(missing_ok=True)
-
-    buffer = io.BytesIO(pdf_bytes)
-    buffer.seek(0)
+    buffer = _render_pdf(generator, paper_data, answer_key)
 
     metadata = {
         "title": paper_data.get("title", "Primary 6 Mathematics Practice Paper"),
         "topics": ", ".join(paper_data.get("topics_covered", topics)),
         "generatedAt": paper_data.get("generated_at", datetime.now(timezone.utc).isoformat()),
         "questionCount": str(paper_data.get("total_questions", TOTAL_QUESTIONS)),
+        # Stages skipped to stay within PAPER_TIME_BUDGET_SECONDS, e.g. "ai_review, quality_nudge"
+        "degradations": ", ".join(sorted(paper_data.get("generation_budget", {}).get("degradations", {}))),
     }
     return buffer, metadata
 
@@ -231,10 +291,17 @@ def _build_title(subject_name: str) -> str:
     return f"Primary 6 {subject_name} Practice Paper ({timestamp})"
 
 
-def _render_pdf(generator: FinalWorkingPSLEMathPaperGenerator, paper_data: Dict) -> Path:
-    tmp_dir = Path(tempfile.gettempdir())
-    pdf_path = tmp_dir / f"psle-paper-{uuid.uuid4().hex}.pdf"
-    success = generator.formatter.save_to_pdf(paper_data, str(pdf_path))
-    if not success or not pdf_path.exists():
+def _render_pdf(
+    generator: FinalWorkingPSLEMathPaperGenerator,
+    paper_data: Dict,
+    answer_key: Optional[BinaryIO] = None,
+) -> io.BytesIO:
+    """Build the PDF straight into memory; no temporary file is written."""
+    buffer = io.BytesIO()
+    success = generator.formatter.save_to_pdf(paper_data, buffer, answer_key=answer_key)
+    if not success or not buffer.tell() or (answer_key is not None and not answer_key.tell()):
         raise PaperGenerationError("Failed to render the generated paper to PDF.")
-    return pdf_path
+    buffer.seek(0)
+    if answer_key is not None:
+        answer_key.seek(0)
+    return buffer
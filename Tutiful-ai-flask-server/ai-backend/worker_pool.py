@@ -0,0 +1,112 @@
+"""
+Worker pool used to process paper generation requests from the job store.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from job_store import PaperJobStore
+
+
+def _env_int(name: str, default: int, minimum: int = 1) -> int:
+    try:
+        return max(minimum, int(os.getenv(name, str(default))))
+    except (TypeError, ValueError):
+        return default
+
+
+class PaperWorkerPool:
+    """
+    Fixed-size pool of daemon threads draining a PaperJobStore.
+
+    Threads (not processes) are used because each job spends nearly all of its
+    time waiting on LM Studio and Supabase I/O, and the Supabase client and the
+    loaded question bank can be shared between threads. For more throughput run
+    several backend processes against the same job store.
+    """
+
+    def __init__(self, job_store: PaperJobStore, handler: Callable[[Dict], None], size: Optional[int] = None):
+        self.job_store = job_store
+        self.handler = handler
+        self.size = size or _env_int('PAPER_WORKER_COUNT', 2)
+        self._threads = []
+        self._in_flight: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._started = False
+
+    @property
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+    def start(self) -> None:
+        if self._started:
+            return
+        self._started = True
+        for index in range(self.size):
+            thread = threading.Thread(
+                target=self._run,
+                name=f"paper-worker-{index + 1}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+        threading.Thread(target=self._renew_leases, name="paper-lease-renewer", daemon=True).start()
+        print(f"Started {self.size} paper worker thread(s)")
+
+    def _run(self) -> None:
+        name = threading.current_thread().name
+        print(f"{name} started")
+        while True:
+            paper_data = self.job_store.get()
+            if paper_data is None:
+                break
+            paper_id = str(paper_data['id'])
+            with self._lock:
+                self._in_flight[paper_id] = name
+            try:
+                self.handler(paper_data)
+            except Exception as e:
+                print(f"{name} error: {str(e)}")
+            finally:
+                # process_paper_generation records failures in Supabase itself, so the
+                # job is acknowledged either way; only crashes lead to redelivery.
+                self.job_store.complete(paper_id)
+                with self._lock:
+                    self._in_flight.pop(paper_id, None)
+        print(f"{name} stopped")
+
+    def _renew_leases(self) -> None:
+        interval = max(1.0, self.job_store.lease_seconds / 3)
+        while not self._stopped.wait(interval):
+            with self._lock:
+                paper_ids = list(self._in_flight)
+            try:
+                self.job_store.extend_leases(paper_ids)
+            except Exception as e:
+                print(f"Failed to renew paper job leases: {str(e)}")
+
+    def shutdown(self, timeout: Optional[float] = None) -> bool:
+        """
+        Stop taking new jobs and wait for in-flight jobs to finish. Queued jobs
+        stay in the job store and are picked up after the next start.
+
+        Returns True when every worker exited within the timeout.
+        """
+        self.job_store.close()
+        print(f"Shutting down paper workers: {self.in_flight} in flight, "
+              f"{self.job_store.qsize()} queued or leased in the job store")
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            thread.join(remaining)
+        self._stopped.set()
+        drained = not any(thread.is_alive() for thread in self._threads)
+        if not drained:
+            print("Paper workers did not finish before the shutdown timeout; their jobs will be redelivered")
+        return drained
@@ -0,0 +1,220 @@
+"""
+Incremental detection of JSON objects in streamed model output.
+
+Also used on complete responses: extract_json_object() finds the first object
+carrying the required keys in one pass, repairing the usual model mistakes
+(trailing commas, smart or single quotes, Python literals, LaTeX backslashes).
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, Iterable, Optional
+
+_SMART_DOUBLE = "\u201c\u201d"
+_SMART_SINGLE = "\u2018\u2019"
+_VALID_ESCAPES = frozenset('"\\/bfnrtu')
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+# A backslash followed by a word: a LaTeX command (`\frac`, `\times`), which JSON would
+# otherwise read as an escape (`\f` + "rac"); escaped backslashes are matched to skip them
+_BACKSLASH_WORD = re.compile(r"\\(\\|[A-Za-z]{2,})")
+_HEX = frozenset("0123456789abcdefABCDEF")
+# \n, \r and \t are often real escapes followed by a word ("\nWhat is..."): only these
+# LaTeX commands starting with those letters are taken literally
+_NRT_COMMANDS = frozenset(
+    "ne neq not nu newline times tau tan theta tfrac to rho rm right rangle".split()
+)
+
+
+def _latex_backslash(match: "re.Match") -> str:
+    word = match.group(1)
+    if word == "\\":
+        return match.group(0)
+    if word[0] == "u" and len(word) >= 5 and all(c in _HEX for c in word[1:5]):
+        return match.group(0)  # \uXXXX
+    if word[0] in "nrt" and word not in _NRT_COMMANDS and not word.startswith("text"):
+        return match.group(0)
+    return "\\\\" + word
+
+
+def escape_latex(candidate: str) -> str:
+    """Double the backslash of LaTeX commands so they survive JSON parsing as written."""
+    if "\\" not in candidate:
+        return candidate
+    return _BACKSLASH_WORD.sub(_latex_backslash, candidate)
+
+
+def repair_json(candidate: str) -> str:
+    """
+    Rewrite near-JSON into JSON in a single pass: smart and single quoted strings
+    become double quoted, commas before a closing bracket are dropped, Python
+    True/False/None become JSON literals and invalid escapes such as LaTeX's
+    `\\(` keep their backslash instead of breaking the parse, as do LaTeX commands
+    that start like a valid escape (`\\frac`, see escape_latex()).
+    """
+    candidate = escape_latex(candidate)
+    out = []
+    i, n = 0, len(candidate)
+    closer: Optional[str] = None  # characters that end the current string
+    while i < n:
+        ch = candidate[i]
+        if closer is not None:
+            if ch == "\\" and i + 1 < n:
+                nxt = candidate[i + 1]
+                if nxt in _VALID_ESCAPES:
+                    out.append(ch + nxt)
+                elif nxt == "'":
+                    out.append(nxt)
+                else:
+                    out.append("\\\\" + nxt)
+                i += 2
+                continue
+            if ch in closer:
+                out.append('"')
+                closer = None
+            elif ch == '"':
+                out.append('\\"')
+            else:
+                out.append(ch)
+        elif ch == '"':
+            closer = '"'
+            out.append(ch)
+        elif ch in _SMART_DOUBLE:
+            closer = _SMART_DOUBLE
+            out.append('"')
+        elif ch == "'" or ch in _SMART_SINGLE:
+            closer = "'" + _SMART_SINGLE
+            out.append('"')
+        elif ch == ",":
+            j = i + 1
+            while j < n and candidate[j].isspace():
+                j += 1
+            if j >= n or candidate[j] not in "}]":
+                out.append(ch)
+        elif ch.isalpha():
+            j = i + 1
+            while j < n and candidate[j].isalnum():
+                j += 1
+            word = candidate[i:j]
+            out.append(_PY_LITERALS.get(word, word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+class JSONObjectDetector:
+    """
+    Finds the first complete top-level JSON object in text that arrives in chunks.
+
+    Braces are balanced outside of string literals only (straight or smart
+    double quotes), so `{` or `}` inside a question's text do not confuse the
+    count. A balanced span that mentions every required key is parsed with its
+    LaTeX commands escaped, then once more after repair_json(). A span that still
+    does not yield an object carrying `required_keys` (for example LaTeX such as
+    `\\frac{1}{2}` in a preamble) is skipped and scanning resumes right after its
+    opening brace; finish() does the same for a span still open at the end of the
+    text (a stray `{` in prose). Prose between candidates is scanned once, but the
+    text of a rejected candidate is scanned again, so the worst case is quadratic.
+    """
+
+    def __init__(self, required_keys: Iterable[str] = ()):
+        self.required_keys = tuple(required_keys)
+        self.text = ""
+        self.result: Optional[Dict[str, Any]] = None
+        self.end: Optional[int] = None
+        self._pos = 0
+        self._start: Optional[int] = None
+        self._depth = 0
+        self._closer: Optional[str] = None  # characters ending the string being scanned
+        self._escape = False
+
+    @property
+    def complete(self) -> bool:
+        return self.result is not None
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Add streamed text; returns the parsed object once one has completed."""
+        if self.result is not None:
+            return self.result
+        self.text += chunk
+        text = self.text
+        i = self._pos
+        while i < len(text):
+            if self._start is None:
+                # Prose between objects is skipped at C speed
+                i = text.find("{", i)
+                if i < 0:
+                    i = len(text)
+                    break
+                self._start = i
+                self._depth = 1
+                i += 1
+                continue
+            ch = text[i]
+            if self._closer is not None:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch in self._closer:
+                    self._closer = None
+            elif ch == '"':
+                self._closer = '"'
+            elif ch in _SMART_DOUBLE:
+                self._closer = _SMART_DOUBLE
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    parsed = self._accept(text[self._start:i + 1])
+                    if parsed is not None:
+                        self.result = parsed
+                        self.end = i + 1
+                        self._pos = i + 1
+                        return parsed
+                    i = self._start
+                    self._start = None
+            i += 1
+        self._pos = i
+        return None
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """Call once the text is complete: a span that never closed is rescanned after its opening brace."""
+        while self.result is None and self._start is not None:
+            self._pos = self._start + 1
+            self._start = None
+            self._depth = 0
+            self._closer = None
+            self._escape = False
+            self.feed("")
+        return self.result
+
+    def _accept(self, candidate: str) -> Optional[Dict[str, Any]]:
+        if any(key not in candidate for key in self.required_keys):
+            return None
+        candidate = escape_latex(candidate)
+        try:
+            # strict=False lets raw newlines inside strings through, which models emit often
+            parsed = json.loads(candidate, strict=False)
+        except ValueError:
+            try:
+                parsed = json.loads(repair_json(candidate), strict=False)
+            except ValueError:
+                return None
+        if not isinstance(parsed, dict):
+            return None
+        if any(key not in parsed for key in self.required_keys):
+            return None
+        return parsed
+
+
+def extract_json_object(text: str, required_keys: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+    """First complete JSON object in `text` that carries `required_keys`, or None."""
+    detector = JSONObjectDetector(required_keys)
+    detector.feed(text)
+    return detector.finish()
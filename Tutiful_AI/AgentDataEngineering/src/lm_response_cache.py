@@ -0,0 +1,197 @@
+"""
+Persistent, content-addressed cache for LM Studio chat completions.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS lm_responses (
+    key TEXT PRIMARY KEY,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lm_responses_access ON lm_responses (last_access);
+"""
+
+
+def cache_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    response_format: Optional[Dict[str, Any]] = None,
+    **options: Any,
+) -> str:
+    """Stable hash of everything that determines a completion."""
+    material = json.dumps(
+        {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "response_format": response_format,
+            "options": options,
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=list,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LMResponseCache:
+    """
+    SQLite-backed response store with a TTL and least-recently-used eviction.
+
+    Safe to share between threads and processes; every call uses its own
+    short-lived connection, like the paper job store.
+    """
+
+    def __init__(self, db_path: str, ttl_seconds: float = 7 * 24 * 3600, max_entries: int = 5000):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    def _count(self, stat: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, stat, getattr(self, stat) + amount)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT content, created_at FROM lm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            content, created_at = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM lm_responses WHERE key = ?", (key,))
+                self._count("misses")
+                return None
+            conn.execute("UPDATE lm_responses SET last_access = ? WHERE key = ?", (now, key))
+            self._count("hits")
+            return content
+        finally:
+            conn.close()
+
+    def put(self, key: str, content: str) -> None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO lm_responses (key, content, created_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, content, now, now),
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM lm_responses").fetchone()
+            if count > self.max_entries:
+                # Expired rows go first, then the least recently used ones
+                cursor = conn.execute(
+                    "DELETE FROM lm_responses WHERE key IN ("
+                    "SELECT key FROM lm_responses "
+                    "ORDER BY (created_at < ?) DESC, last_access ASC LIMIT ?)",
+                    (now - self.ttl_seconds, count - self.max_entries),
+                )
+                self._count("evictions", cursor.rowcount)
+        finally:
+            conn.close()
+
+    def record_bypass(self) -> None:
+        self._count("bypassed")
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for monitoring; hit_rate covers lookups only, not bypassed calls."""
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+class CachedLMStudioClient:
+    """
+    Drop-in wrapper that answers repeated chat requests from an LMResponseCache.
+
+    Calls with a temperature above `max_temperature` are sampled for variety, so
+    they bypass the cache. Only successful, non-empty completions are stored.
+    Everything other than `chat` is delegated to the wrapped client.
+    """
+
+    def __init__(self, client: Any, cache: LMResponseCache, max_temperature: float = 0.0):
+        self.client = client
+        self.cache = cache
+        self.max_temperature = max_temperature
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.2,
+        max_tokens: int = 800,
+        response_format: Optional[Dict[str, Any]] = None,
+        **options: Any,
+    ) -> Tuple[str, bool]:
+        if temperature > self.max_temperature:
+            self.cache.record_bypass()
+            return self.client.chat(
+                messages, temperature=temperature, max_tokens=max_tokens,
+                response_format=response_format, **options,
+            )
+
+        key = cache_key(self.client.model, messages, temperature, max_tokens, response_format, **options)
+        try:
+            cached = self.cache.get(key)
+        except sqlite3.Error as exc:
+            self.cache.logger.warning("LM response cache read failed: %s", exc)
+            cached = None
+        if cached is not None:
+            return cached, True
+
+        content, success = self.client.chat(
+            messages, temperature=temperature, max_tokens=max_tokens,
+            response_format=response_format, **options,
+        )
+        if success and content:
+            try:
+                self.cache.put(key, content)
+            except sqlite3.Error as exc:
+                self.cache.logger.warning("LM response cache write failed: %s", exc)
+        return content, success
@@ -4,10 +4,26 @@ Lightweight LM Studio client tailored for local Mistral-style chat endpoints.
 
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
-from typing import Any, Dict, List, Optional, Tuple
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # Only needed by AsyncLMStudioClient
+    httpx = None
+
+try:
+    from .json_stream import JSONObjectDetector
+except ImportError:  # Loaded as a top-level module (src/ on sys.path)
+    from json_stream import JSONObjectDetector
 
 
 class LMStudioClientError(Exception):
@@ -18,35 +34,224 @@ class LMStudioUnavailableError(LMStudioClientError):
     """Raised when the LM Studio server cannot be reached."""
 
 
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker shared by the sync and async clients.
+
+    After `failure_threshold` failures in a row the circuit opens and requests
+    are refused for `reset_timeout` seconds; then a single caller is let through
+    to probe the server (half-open) while everyone else keeps failing fast.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.logger = logging.getLogger("LMStudioClient")
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._open_until = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return (
+                self._consecutive_failures >= self.failure_threshold
+                and time.monotonic() < self._open_until
+            )
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._consecutive_failures < self.failure_threshold:
+                return True
+            now = time.monotonic()
+            if now < self._open_until:
+                return False
+            # Half-open: let this caller probe the server, keep everyone else failing fast
+            self._open_until = now + self.reset_timeout
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._consecutive_failures >= self.failure_threshold:
+                self.logger.info("LM Studio reachable again; closing circuit")
+            self._consecutive_failures = 0
+            self._open_until = 0.0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                if self._consecutive_failures == self.failure_threshold:
+                    self.logger.warning(
+                        "LM Studio failed %s times in a row; failing fast for %.0fs",
+                        self._consecutive_failures,
+                        self.reset_timeout,
+                    )
+                self._open_until = time.monotonic() + self.reset_timeout
+
+
+class StructuredOutputSupport:
+    """
+    Remembers, per (server, model), whether `response_format` is accepted.
+
+    A server that rejects a schema answers 400 and the request is repeated
+    without it. Once that has happened, later calls leave the schema out up
+    front instead of paying for the rejected request every time. Rejections
+    are forgotten after `recheck_after` seconds in case the model was swapped.
+    """
+
+    def __init__(self, recheck_after: float = 3600.0):
+        self.recheck_after = recheck_after
+        self._lock = threading.Lock()
+        self._known: Dict[Tuple[str, str], Tuple[bool, float]] = {}
+
+    def supported(self, base_url: str, model: str) -> Optional[bool]:
+        """True/False once known, None while untested."""
+        with self._lock:
+            entry = self._known.get((base_url, model))
+        if entry is None:
+            return None
+        supported, checked_at = entry
+        if not supported and time.monotonic() - checked_at > self.recheck_after:
+            return None
+        return supported
+
+    def record(self, base_url: str, model: str, supported: bool) -> None:
+        with self._lock:
+            previous = self._known.get((base_url, model))
+            self._known[(base_url, model)] = (supported, time.monotonic())
+        if not supported and (previous is None or previous[0]):
+            logging.getLogger("LMStudioClient").info(
+                "%s at %s does not accept response_format; sending plain prompts", model, base_url
+            )
+
+
+# Shared by every client in the process, sync and async alike
+structured_output_support = StructuredOutputSupport()
+
+
+def _backoff_delay(attempt: int, base: float, cap: float) -> float:
+    # Full jitter keeps concurrent callers from retrying in lockstep
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _chat_payload(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    max_tokens: int,
+    response_format: Optional[Dict[str, Any]],
+    stream: bool = False,
+) -> Dict[str, Any]:
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if response_format:
+        payload["response_format"] = response_format
+    if stream:
+        payload["stream"] = True
+    return payload
+
+
+_SSE_DONE = object()
+
+
+def _sse_delta(line: str):
+    """Content carried by one server-sent event line; _SSE_DONE marks the end of the stream."""
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return _SSE_DONE
+    choices = json.loads(data).get("choices") or []
+    if not choices:
+        return None
+    return (choices[0].get("delta") or {}).get("content") or None
+
+
 class LMStudioClient:
-    """Simple wrapper around the LM Studio chat completions endpoint."""
+    """
+    Wrapper around the LM Studio chat completions endpoint.
+
+    The client keeps one pooled keep-alive session for all calls, retries
+    connection errors and 5xx responses with jittered exponential backoff, and
+    trips a circuit breaker after repeated failures so callers fail fast while
+    the local server is down instead of waiting out the read timeout each time.
+    Instances are safe to share between threads.
+    """
 
     def __init__(
         self,
         base_url: str = "http://127.0.0.1:1234",
         model: str = "mistral-7b-instruct-v0.3",
         timeout: int = 120,
+        connect_timeout: float = 5.0,
+        pool_size: int = 4,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        health_ttl: float = 5.0,
+        breaker: Optional[CircuitBreaker] = None,
     ):
         self.base_url = base_url.rstrip("/")
         self.model = model
         self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.health_ttl = health_ttl
+        self.breaker = breaker or CircuitBreaker(failure_threshold, reset_timeout)
         self.logger = logging.getLogger(self.__class__.__name__)
 
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._health: Optional[Tuple[float, bool]] = None
+
     @property
     def chat_url(self) -> str:
         return f"{self.base_url}/v1/chat/completions"
 
+    @property
+    def circuit_open(self) -> bool:
+        return self.breaker.is_open
+
+    @property
+    def supports_structured_output(self) -> Optional[bool]:
+        """Whether this server/model accepts `response_format`; None until a request has told."""
+        return structured_output_support.supported(self.base_url, self.model)
+
     def is_available(self) -> bool:
-        """Best-effort health check."""
-        try:
-            response = requests.get(f"{self.base_url}/v1/models", timeout=3)
-            if response.status_code == 200:
-                return True
-            self.logger.debug("LM Studio health probe returned %s", response.status_code)
+        """Best-effort health check, cached for `health_ttl` seconds."""
+        now = time.monotonic()
+        health = self._health
+        if health and now - health[0] < self.health_ttl:
+            return health[1]
+        if not self.breaker.allow_request():
             return False
+        try:
+            response = self.session.get(
+                f"{self.base_url}/v1/models", timeout=(self.connect_timeout, 3)
+            )
+            available = response.status_code == 200
+            if available:
+                self.breaker.record_success()
+            else:
+                self.logger.debug("LM Studio health probe returned %s", response.status_code)
         except requests.RequestException as exc:
             self.logger.debug("LM Studio health probe failed: %s", exc)
-            return False
+            self.breaker.record_failure()
+            available = False
+        self._health = (time.monotonic(), available)
+        return available
 
     def chat(
         self,
@@ -54,34 +259,326 @@ class LMStudioClient:
         temperature: float = 0.2,
         max_tokens: int = 800,
         response_format: Optional[Dict[str, Any]] = None,
+        stop_at_json: bool = False,
+        required_keys: Sequence[str] = (),
     ) -> Tuple[str, bool]:
         """
         Send a chat completion request.
 
+        With `stop_at_json` the completion is streamed and the request is closed
+        as soon as a complete JSON object (containing `required_keys`) has
+        arrived, which also frees the server slot instead of letting the model
+        keep generating. The text received so far is returned.
+
+        A `response_format` the server is known to reject is left out (see
+        StructuredOutputSupport).
+
         Returns the content (or an empty string on failure) and whether the model was used.
         """
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "temperature": temperature,
-            "max_tokens": max_tokens,
-        }
-        if response_format:
-            payload["response_format"] = response_format
+        if response_format and structured_output_support.supported(self.base_url, self.model) is False:
+            response_format = None
+        payload = _chat_payload(
+            self.model, messages, temperature, max_tokens, response_format, stream=stop_at_json
+        )
+        timeout = (self.connect_timeout, self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow_request():
+                self.logger.debug("LM Studio circuit open; skipping chat request")
+                return "", False
+            try:
+                response = self.session.post(
+                    self.chat_url, json=payload, timeout=timeout, stream=stop_at_json
+                )
+                if response.status_code == 400 and "response_format" in payload:
+                    self.logger.debug("LM Studio rejected response_format request: %s", response.text)
+                    structured_output_support.record(self.base_url, self.model, False)
+                    payload.pop("response_format", None)
+                    response = self.session.post(
+                        self.chat_url, json=payload, timeout=timeout, stream=stop_at_json
+                    )
+                response.raise_for_status()
+                if "response_format" in payload:
+                    structured_output_support.record(self.base_url, self.model, True)
+                if stop_at_json:
+                    content = self._read_stream(response, required_keys)
+                else:
+                    data = response.json()
+                    content = data["choices"][0]["message"]["content"]
+                self.breaker.record_success()
+                return content.strip(), True
+            except requests.HTTPError as exc:
+                if exc.response is None or exc.response.status_code < 500:
+                    # The server answered; retrying the same request will not help
+                    self.logger.warning("LM Studio chat failed: %s", exc)
+                    return "", False
+                self.breaker.record_failure()
+                error = exc
+            except requests.ConnectionError as exc:
+                self.breaker.record_failure()
+                error = exc
+            except (KeyError, IndexError, ValueError) as exc:
+                self.logger.warning("Unexpected LM Studio payload: %s", exc)
+                return "", False
+            except requests.RequestException as exc:
+                # Read timeouts are not retried: the model was busy for the full timeout already
+                self.breaker.record_failure()
+                self.logger.warning("LM Studio chat failed: %s", exc)
+                return "", False
+
+            if attempt < self.max_retries:
+                delay = _backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                self.logger.debug(
+                    "LM Studio chat attempt %s failed (%s); retrying in %.2fs", attempt + 1, error, delay
+                )
+                time.sleep(delay)
 
+        self.logger.warning("LM Studio chat failed after %s attempts: %s", self.max_retries + 1, error)
+        return "", False
+
+    def _read_stream(self, response: requests.Response, required_keys: Sequence[str]) -> str:
+        detector = JSONObjectDetector(required_keys)
         try:
-            response = requests.post(self.chat_url, json=payload, timeout=self.timeout)
-            if response.status_code == 400 and response_format:
+            for raw_line in response.iter_lines():
+                delta = _sse_delta(raw_line.decode("utf-8"))
+                if delta is _SSE_DONE:
+                    break
+                if delta and detector.feed(delta) is not None:
+                    self.logger.debug("Complete JSON object streamed; closing the request early")
+                    break
+        finally:
+            # Closing an unfinished stream drops the connection, which stops generation server-side
+            response.close()
+        return detector.text
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncLMStudioClient:
+    """
+    Asyncio counterpart of LMStudioClient built on one httpx connection pool.
+
+    `max_concurrency` should match the number of parallel slots the LM server
+    serves; it bounds every request issued through this client. The retry,
+    timeout and circuit-breaker behaviour mirrors the sync client, and the two
+    can share one CircuitBreaker.
+
+    Thread-based callers can use the `*_blocking` helpers, which run the
+    coroutines on a private event loop thread so every thread shares the same
+    pool and concurrency bound. The pool is bound to the first event loop that
+    uses it, so use either the coroutines or the blocking helpers per instance.
+    """
+
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:1234",
+        model: str = "mistral-7b-instruct-v0.3",
+        timeout: int = 120,
+        connect_timeout: float = 5.0,
+        max_concurrency: int = 4,
+        max_retries: int = 2,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        if httpx is None:
+            raise LMStudioClientError("AsyncLMStudioClient requires the httpx package")
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker(failure_threshold, reset_timeout)
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        # Created lazily on the loop that first uses them
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+
+    @property
+    def chat_url(self) -> str:
+        return f"{self.base_url}/v1/chat/completions"
+
+    @property
+    def supports_structured_output(self) -> Optional[bool]:
+        """Whether this server/model accepts `response_format`; None until a request has told."""
+        return structured_output_support.supported(self.base_url, self.model)
+
+    def _ensure_client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.2,
+        max_tokens: int = 800,
+        response_format: Optional[Dict[str, Any]] = None,
+        stop_at_json: bool = False,
+        required_keys: Sequence[str] = (),
+    ) -> Tuple[str, bool]:
+        """
+        Send a chat completion request; `stop_at_json` and `response_format`
+        behave as in LMStudioClient.chat.
+
+        Returns the content (or an empty string on failure) and whether the model was used.
+        """
+        client = self._ensure_client()
+        if response_format and structured_output_support.supported(self.base_url, self.model) is False:
+            response_format = None
+        payload = _chat_payload(
+            self.model, messages, temperature, max_tokens, response_format, stream=stop_at_json
+        )
+
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow_request():
+                self.logger.debug("LM Studio circuit open; skipping chat request")
+                return "", False
+            try:
+                async with self._slots:
+                    if stop_at_json:
+                        content = await self._stream_chat(client, payload, required_keys)
+                    else:
+                        response = await client.post(self.chat_url, json=payload)
+                        if response.status_code == 400 and "response_format" in payload:
+                            self.logger.debug("LM Studio rejected response_format request: %s", response.text)
+                            structured_output_support.record(self.base_url, self.model, False)
+                            payload.pop("response_format", None)
+                            response = await client.post(self.chat_url, json=payload)
+                        response.raise_for_status()
+                        data = response.json()
+                        content = data["choices"][0]["message"]["content"]
+                if "response_format" in payload:
+                    structured_output_support.record(self.base_url, self.model, True)
+                self.breaker.record_success()
+                return content.strip(), True
+            except httpx.HTTPStatusError as exc:
+                if exc.response.status_code < 500:
+                    self.logger.warning("LM Studio chat failed: %s", exc)
+                    return "", False
+                self.breaker.record_failure()
+                error = exc
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError) as exc:
+                self.breaker.record_failure()
+                error = exc
+            except (KeyError, IndexError, ValueError) as exc:
+                self.logger.warning("Unexpected LM Studio payload: %s", exc)
+                return "", False
+            except httpx.HTTPError as exc:
+                # Read timeouts are not retried: the model was busy for the full timeout already
+                self.breaker.record_failure()
+                self.logger.warning("LM Studio chat failed: %s", exc)
+                return "", False
+
+            if attempt < self.max_retries:
+                delay = _backoff_delay(attempt, self.backoff_base, self.backoff_max)
+                self.logger.debug(
+                    "LM Studio chat attempt %s failed (%s); retrying in %.2fs", attempt + 1, error, delay
+                )
+                await asyncio.sleep(delay)
+
+        self.logger.warning("LM Studio chat failed after %s attempts: %s", self.max_retries + 1, error)
+        return "", False
+
+    async def _stream_chat(
+        self, client: "httpx.AsyncClient", payload: Dict[str, Any], required_keys: Sequence[str]
+    ) -> str:
+        async with client.stream("POST", self.chat_url, json=payload) as response:
+            if response.status_code == 400 and "response_format" in payload:
+                await response.aread()
                 self.logger.debug("LM Studio rejected response_format request: %s", response.text)
+                structured_output_support.record(self.base_url, self.model, False)
                 payload.pop("response_format", None)
-                response = requests.post(self.chat_url, json=payload, timeout=self.timeout)
+                return await self._stream_chat(client, payload, required_keys)
             response.raise_for_status()
-            data = response.json()
-            content = data["choices"][0]["message"]["content"]
-            return content.strip(), True
-        except requests.RequestException as exc:
-            self.logger.warning("LM Studio chat failed: %s", exc)
-            return "", False
-        except (KeyError, IndexError) as exc:
-            self.logger.warning("Unexpected LM Studio payload: %s", exc)
-            return "", False
+            detector = JSONObjectDetector(required_keys)
+            async for line in response.aiter_lines():
+                delta = _sse_delta(line)
+                if delta is _SSE_DONE:
+                    break
+                if delta and detector.feed(delta) is not None:
+                    self.logger.debug("Complete JSON object streamed; closing the request early")
+                    break
+            # Leaving the block with the body unread closes the connection, ending generation
+            return detector.text
+
+    async def gather_chats(
+        self,
+        message_lists: Sequence[List[Dict[str, str]]],
+        max_concurrency: Optional[int] = None,
+        **chat_kwargs: Any,
+    ) -> List[Tuple[str, bool]]:
+        """
+        Run one chat per message list concurrently and return the results in order.
+
+        `max_concurrency` further limits this batch below the client-wide bound.
+        `chat_kwargs` (temperature, max_tokens, response_format, stop_at_json, ...)
+        apply to every chat; pass a list of dicts as `per_chat_kwargs` to vary
+        them per request.
+        """
+        per_chat_kwargs = chat_kwargs.pop("per_chat_kwargs", None) or [{}] * len(message_lists)
+        limit = asyncio.Semaphore(max(1, max_concurrency or self.max_concurrency))
+
+        async def run(messages: List[Dict[str, str]], overrides: Dict[str, Any]) -> Tuple[str, bool]:
+            async with limit:
+                return await self.chat(messages, **{**chat_kwargs, **overrides})
+
+        return list(await asyncio.gather(
+            *(run(messages, overrides) for messages, overrides in zip(message_lists, per_chat_kwargs))
+        ))
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever, name="lm-studio-async", daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    def gather_chats_blocking(
+        self,
+        message_lists: Sequence[List[Dict[str, str]]],
+        max_concurrency: Optional[int] = None,
+        **chat_kwargs: Any,
+    ) -> List[Tuple[str, bool]]:
+        """Thread-friendly gather_chats: blocks the calling thread until every chat is done."""
+        future = asyncio.run_coroutine_threadsafe(
+            self.gather_chats(message_lists, max_concurrency=max_concurrency, **chat_kwargs),
+            self._ensure_loop(),
+        )
+        return future.result()
+
+    def chat_blocking(self, messages: List[Dict[str, str]], **chat_kwargs: Any) -> Tuple[str, bool]:
+        return self.gather_chats_blocking([messages], **chat_kwargs)[0]
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def close(self) -> None:
+        loop = self._loop
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.aclose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._loop = None
@@ -0,0 +1,568 @@
+"""
+Deterministic answer checking for common PSLE MCQ stems.
+
+A handful of stem shapes (a fraction or percentage of a quantity, percentage
+change, sharing in a ratio, speed/distance/time, rectangles, squares, cuboids
+and cubes, averages, cutting into equal pieces) are solved exactly with
+`fractions.Fraction`. The result is compared with the options so a question's
+answer key can be confirmed without asking the LM; when the calculation points
+elsewhere, the question is left to the AI review to settle.
+Options written as bare numbers are only compared when the question names the
+unit of its answer ("in litres", "how many hours"), or the answer is in $ or %.
+
+Solvers only fire when the numbers in the stem are fully accounted for by the
+pattern they recognise and the question sentence names the quantity they
+solve for; anything else is left undecided for the AI review.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+VERIFIED = "verified"
+REPAIRED = "repaired"
+WRONG = "wrong"
+UNDECIDED = "undecided"
+
+# unit -> (dimension, size in the dimension's base unit)
+UNITS: Dict[str, Tuple[str, Fraction]] = {
+    "mm": ("length", Fraction(1, 10)),
+    "cm": ("length", Fraction(1)),
+    "m": ("length", Fraction(100)),
+    "km": ("length", Fraction(100000)),
+    "g": ("mass", Fraction(1)),
+    "kg": ("mass", Fraction(1000)),
+    "ml": ("volume", Fraction(1)),
+    "l": ("volume", Fraction(1000)),
+    "cm³": ("volume", Fraction(1)),
+    "m³": ("volume", Fraction(1000000)),
+    "mm²": ("area", Fraction(1, 100)),
+    "cm²": ("area", Fraction(1)),
+    "m²": ("area", Fraction(10000)),
+    "km²": ("area", Fraction(10 ** 10)),
+    "s": ("time", Fraction(1, 60)),
+    "min": ("time", Fraction(1)),
+    "h": ("time", Fraction(60)),
+    "m/min": ("speed", Fraction(1)),
+    "m/s": ("speed", Fraction(60)),
+    "km/h": ("speed", Fraction(1000, 60)),
+    "km/min": ("speed", Fraction(1000)),
+    "cm/s": ("speed", Fraction(60, 100)),
+    "%": ("percent", Fraction(1)),
+    "$": ("money", Fraction(1)),
+}
+
+_UNIT_ALIASES = {
+    "litre": "l", "litres": "l", "liter": "l", "liters": "l", "ℓ": "l",
+    "millilitre": "ml", "millilitres": "ml",
+    "hour": "h", "hours": "h", "hr": "h", "hrs": "h",
+    "minute": "min", "minutes": "min", "mins": "min",
+    "second": "s", "seconds": "s", "sec": "s",
+    "cm2": "cm²", "m2": "m²", "mm2": "mm²", "km2": "km²", "cm3": "cm³", "m3": "m³",
+    "metres": "m", "metre": "m", "meters": "m", "meter": "m",
+    "kilometres": "km", "kilometre": "km", "centimetres": "cm", "centimetre": "cm",
+    "kilograms": "kg", "kilogram": "kg", "grams": "g", "gram": "g",
+}
+
+_NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+_UNIT = (
+    r"km/h|km/min|m/min|m/s|cm/s|"
+    r"(?:mm|cm|km|m)(?:²|³|2|3)(?![\d/])|"
+    r"kilometres?|centimetres?|metres?|meters?|kilograms?|grams?|millilitres?|litres?|liters?|ℓ|"
+    r"hours?|hrs?|minutes?|mins?|seconds?|sec|"
+    r"mm|cm|km|kg|ml|min|[mglhs]|%"
+)
+# A mixed number, a fraction or a plain number, with an optional $ and unit
+_QUANTITY = re.compile(
+    r"(?<![\w.,/])(?P<dollar>\$\s?)?"
+    r"(?:(?P<whole>\d+)\s+(?P<mnum>\d+)/(?P<mden>\d+)|(?P<num>\d+)/(?P<den>\d+)|(?P<dec>" + _NUMBER + r"))"
+    r"(?![\d/])(?:\s?(?P<unit>" + _UNIT + r")(?![a-z]))?",
+    re.IGNORECASE,
+)
+# "What is its volume in litres?", "How many hours did he take?"
+_ASKED_UNIT = re.compile(r"\b(?:in|how many)\s+(?P<unit>" + _UNIT + r")(?![a-z])", re.IGNORECASE)
+_OPTION_LABEL = re.compile(r"^\s*(?:\(?[a-d1-4]\)|[a-d1-4][.:])\s+", re.IGNORECASE)
+_SENTENCES = re.compile(r"(?<=[.?!])\s+")
+# Quantities written as words are not seen by the solvers, so their stems stay undecided
+_NUMBER_WORDS = re.compile(
+    r"\b(?:once|twice|thrice|double|doubled|triple|tripled|half|halves|third|thirds|quarters?|"
+    r"one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|dozens?|hundreds?|thousands?)\b"
+)
+
+
+@dataclass(frozen=True)
+class Quantity:
+    value: Fraction
+    unit: Optional[str]
+    decimals: Optional[int]  # digits after the point; None for fractions
+    start: int
+    end: int
+
+    @property
+    def dimension(self) -> Optional[str]:
+        return UNITS[self.unit][0] if self.unit in UNITS else None
+
+    def to(self, unit: str) -> Fraction:
+        return self.value * UNITS[self.unit][1] / UNITS[unit][1]
+
+
+@dataclass(frozen=True)
+class Solution:
+    value: Fraction
+    unit: Optional[str]
+    method: str
+    asked: bool = False  # `unit` is the one the question asks the answer in
+
+
+@dataclass(frozen=True)
+class AnswerCheck:
+    status: str
+    solution: Optional[Solution] = None
+    answer_index: Optional[int] = None
+    reason: str = ""
+
+    @property
+    def decided(self) -> bool:
+        return self.status != UNDECIDED
+
+
+def _canonical_unit(unit: Optional[str]) -> Optional[str]:
+    if not unit:
+        return None
+    unit = unit.lower()
+    return _UNIT_ALIASES.get(unit, unit)
+
+
+def _quantity(match: "re.Match") -> Quantity:
+    if match.group("whole"):
+        value = int(match.group("whole")) + Fraction(int(match.group("mnum")), int(match.group("mden")))
+        decimals = None
+    elif match.group("num"):
+        value = Fraction(int(match.group("num")), int(match.group("den")))
+        decimals = None
+    else:
+        text = match.group("dec").replace(",", "")
+        value = Fraction(text)
+        decimals = len(text.split(".")[1]) if "." in text else 0
+    unit = "$" if match.group("dollar") else _canonical_unit(match.group("unit"))
+    return Quantity(value, unit, decimals, match.start(), match.end())
+
+
+def quantities(text: str) -> List[Quantity]:
+    """Every number in `text`, with the unit written next to it."""
+    return [_quantity(m) for m in _QUANTITY.finditer(text)]
+
+
+def parse_option(option: str) -> Optional[Quantity]:
+    """The single quantity an option states ("B) 12.5 cm", "3 1/4", "$40"), or None."""
+    text = _OPTION_LABEL.sub("", str(option)).strip().rstrip(".")
+    found = list(_QUANTITY.finditer(text))
+    if len(found) != 1:
+        return None
+    match = found[0]
+    rest = (text[:match.start()] + " " + text[match.end():]).strip()
+    # Trailing count nouns ("pupils", "years") are fine; algebra and ratios are not
+    if rest and not re.fullmatch(r"[a-z][a-z '-]*", rest, re.IGNORECASE):
+        return None
+    if rest and len(rest) == 1:
+        return None
+    return _quantity(match)
+
+
+class _Stem:
+    """Lower-cased stem split into the givens and the question sentence."""
+
+    def __init__(self, text: str):
+        self.text = " ".join(text.split())
+        self.lower = self.text.lower()
+        sentences = _SENTENCES.split(self.lower)
+        self.ask = sentences[-1]
+        self.ask_start = len(self.lower) - len(self.ask)
+        self.givens = " ".join(sentences[:-1])
+        self.quantities = quantities(self.lower)
+
+    def dimensioned(self, dimension: str) -> List[Quantity]:
+        return [q for q in self.quantities if q.dimension == dimension]
+
+
+Solver = Callable[[_Stem], Optional[Solution]]
+_SOLVERS: List[Tuple[str, Solver]] = []
+
+
+def _solver(name: str):
+    def register(func: Solver) -> Solver:
+        _SOLVERS.append((name, func))
+        return func
+    return register
+
+
+# -- Fractions and percentages ----------------------------------------------
+
+_PART_OF = re.compile(r"\b(?:what is|what's|find|calculate|how much is)\s+\S+(?:\s\d+/\d+)?\s+of\s+(?:the\s+)?\$?\d")
+
+
+@_solver("fraction_of_quantity")
+def _fraction_of_quantity(stem: _Stem) -> Optional[Solution]:
+    if len(stem.quantities) != 2 or not _PART_OF.search(stem.ask):
+        return None
+    part, whole = stem.quantities
+    if part.start < stem.ask_start:
+        return None
+    if part.decimals is not None and part.unit != "%":
+        return None
+    if whole.unit == "%":
+        return None
+    rate = part.value / 100 if part.unit == "%" else part.value
+    return Solution(rate * whole.value, whole.unit, "fraction_of_quantity")
+
+
+_FROM_TO = re.compile(r"\bfrom\s+\$?\s?[\d.,]+[^,;]*?\bto\s+\$?\s?[\d.,]+")
+
+
+@_solver("percentage_change")
+def _percentage_change(stem: _Stem) -> Optional[Solution]:
+    direction = re.search(r"percentage (increase|decrease|change)", stem.ask)
+    if not direction or len(stem.quantities) != 2 or not _FROM_TO.search(stem.lower):
+        return None
+    before, after = stem.quantities
+    if before.value == 0 or before.unit != after.unit or "%" in (before.unit, after.unit):
+        return None
+    change = after.value - before.value
+    if (direction.group(1) == "increase" and change < 0) or (direction.group(1) == "decrease" and change > 0):
+        return None
+    return Solution(abs(change) / before.value * 100, "%", "percentage_change")
+
+
+# The question must ask for a sum of money or a value, not a count of things
+_ASKS_AMOUNT = re.compile(r"\b(?:price|cost|costs|amount|value|salary|fee|fare|bill)\b")
+_RATE_CHANGE = re.compile(
+    r"\b(?P<verb>increased|increases|raised|rises|rose|decreased|decreases|reduced|reduces|"
+    r"discount(?:ed)?|off|fell|falls|dropped|drops)\b"
+)
+
+
+@_solver("percentage_applied")
+def _percentage_applied(stem: _Stem) -> Optional[Solution]:
+    if len(stem.quantities) != 2:
+        return None
+    rates = [q for q in stem.quantities if q.unit == "%"]
+    if len(rates) != 1:
+        return None
+    rate = rates[0].value / 100
+    base = next(q for q in stem.quantities if q.unit != "%")
+    # The rate must be the later figure, applied to the base stated first
+    if base.start > rates[0].start:
+        return None
+    changes = {m.group("verb") for m in _RATE_CHANGE.finditer(stem.lower)}
+    if not changes:
+        return None
+    up = bool(changes & {"increased", "increases", "raised", "rises", "rose"})
+    down = bool(changes - {"increased", "increases", "raised", "rises", "rose"})
+    if up == down or re.search(r"\bhow many\b", stem.ask):
+        return None
+    asks_amount = _ASKS_AMOUNT.search(stem.ask)
+    if (re.search(r"how much (?:is|was|will be) the (?:discount|increase|decrease|reduction)", stem.ask)
+            or (asks_amount and re.search(r"by how much", stem.ask))):
+        return Solution(base.value * rate, base.unit, "percentage_applied")
+    if asks_amount and re.search(r"\b(?:new|final|sale|selling|discounted|reduced|now|after)\b", stem.ask):
+        factor = 1 + rate if up else 1 - rate
+        return Solution(base.value * factor, base.unit, "percentage_applied")
+    return None
+
+
+# -- Ratio ------------------------------------------------------------------
+
+_SHARED = re.compile(
+    r"\b(?:shared?|divided?|split|shares|divides)\b.*?\b(?:between|among|amongst)\s+"
+    r"(?P<names>[a-z]+(?:,\s*[a-z]+)*,?\s+and\s+[a-z]+)\s+in\s+the\s+ratio\s+(?:of\s+)?"
+    r"(?P<ratio>\d+(?:\s*:\s*\d+)+)"
+)
+
+
+@_solver("ratio_share")
+def _ratio_share(stem: _Stem) -> Optional[Solution]:
+    shared = _SHARED.search(stem.lower)
+    if not shared:
+        return None
+    names = [n.strip() for n in re.split(r",\s*and\s+|,\s*|\s+and\s+", shared.group("names")) if n.strip()]
+    parts = [int(p) for p in re.findall(r"\d+", shared.group("ratio"))]
+    if len(names) != len(parts) or not all(parts):
+        return None
+    ratio_span = (shared.start("ratio"), shared.end("ratio"))
+    totals = [q for q in stem.quantities if not ratio_span[0] <= q.start < ratio_span[1]]
+    if len(totals) != 1 or len(stem.quantities) != len(parts) + 1:
+        return None
+    total = totals[0]
+    unit_share = total.value / sum(parts)
+
+    if re.search(r"\b(?:larger|largest|bigger|biggest|greater|greatest) share\b", stem.ask):
+        return Solution(unit_share * max(parts), total.unit, "ratio_share")
+    if re.search(r"\b(?:smaller|smallest) share\b", stem.ask):
+        return Solution(unit_share * min(parts), total.unit, "ratio_share")
+    named = [i for i, name in enumerate(names) if re.search(rf"\b{re.escape(name)}\b", stem.ask)]
+    if re.search(r"\bmore\b.*\bthan\b", stem.ask) and len(named) == 2:
+        return Solution(unit_share * abs(parts[named[0]] - parts[named[1]]), total.unit, "ratio_share")
+    if len(named) == 1 and re.search(r"\b(?:get|gets|receive|receives|received|got|have|has)\b", stem.ask):
+        return Solution(unit_share * parts[named[0]], total.unit, "ratio_share")
+    return None
+
+
+# -- Speed, distance and time -------------------------------------------------
+
+@_solver("speed_distance_time")
+def _speed_distance_time(stem: _Stem) -> Optional[Solution]:
+    if len(stem.quantities) != 2:
+        return None
+    distance = stem.dimensioned("length")
+    time = stem.dimensioned("time")
+    speed = stem.dimensioned("speed")
+    if len(distance) == 1 and len(time) == 1 and re.search(r"\bspeed\b", stem.ask):
+        if time[0].value == 0:
+            return None
+        return Solution(distance[0].to("m") / time[0].to("min"), "m/min", "speed_distance_time")
+    if len(speed) == 1 and len(time) == 1 and re.search(r"\bhow far\b|\bdistance\b", stem.ask):
+        return Solution(speed[0].to("m/min") * time[0].to("min"), "m", "speed_distance_time")
+    if len(speed) == 1 and len(distance) == 1 and re.search(r"\bhow long\b|\btime\b|how many (?:hours|minutes)", stem.ask):
+        if speed[0].value == 0:
+            return None
+        return Solution(distance[0].to("m") / speed[0].to("m/min"), "min", "speed_distance_time")
+    return None
+
+
+# -- Rectangles, squares, cuboids and cubes -----------------------------------
+
+_LEN = r"(\d+(?:\.\d+)?)\s?(mm|cm|km|m)\b"
+_DIMENSIONS = (
+    re.compile(_LEN + r"\s*(?:by|x|×)\s*" + _LEN + r"(?:\s*(?:by|x|×)\s*" + _LEN + r")?"),
+    re.compile(r"\blength\b[^.]*?\b(?:of|is)\s+" + _LEN + r"[^.]*?\b(?:breadth|width)\b[^.]*?\b(?:of|is)\s+" + _LEN
+               + r"(?:[^.]*?\b(?:height|depth)\b[^.]*?\b(?:of|is)\s+" + _LEN + r")?"),
+    re.compile(_LEN + r"\s+long,?\s+(?:and\s+)?" + _LEN + r"\s+(?:wide|broad)(?:,?\s+(?:and\s+)?" + _LEN
+               + r"\s+(?:high|tall|deep))?"),
+)
+# Figures cut from, or drawn in, the shape named in the givens
+_OTHER_FIGURES = re.compile(
+    r"\b(?:triangles?|circles?|semicircles?|quadrants?|half|halves|shaded|diagonals?|pieces?|parts?|strips?)\b"
+)
+_SIDE = re.compile(r"\b(?:side|sides|edge|edges)\b[^.]*?\b(?:of|is|are|measures?|measuring)\s+" + _LEN)
+
+
+def _dimensions(stem: _Stem) -> Optional[List[Quantity]]:
+    for pattern in _DIMENSIONS:
+        found = pattern.search(stem.givens or stem.lower)
+        if found:
+            values = [v for v in found.groups() if v is not None]
+            return [Quantity(Fraction(values[i]), values[i + 1], None, 0, 0) for i in range(0, len(values), 2)]
+    return None
+
+
+@_solver("rectangle_cuboid")
+def _rectangle_cuboid(stem: _Stem) -> Optional[Solution]:
+    # A given area/perimeter/volume, or relative sizes, make this a multi-step problem
+    if re.search(r"\b(?:area|perimeter|volume|capacity|times|twice|half|longer|shorter|more|less|path|border|cut|water|filled)\b",
+                 stem.givens):
+        return None
+    if _OTHER_FIGURES.search(stem.ask):
+        return None
+    lengths = _dimensions(stem)
+    if lengths is None:
+        return None
+    if len(stem.quantities) != len(lengths):
+        return None
+    cm = [length.to("cm") for length in lengths]
+    if len(cm) == 2 and re.search(r"\brectang", stem.lower):
+        if re.search(r"\barea\b", stem.ask):
+            return Solution(cm[0] * cm[1], "cm²", "rectangle_cuboid")
+        if re.search(r"\bperimeter\b", stem.ask):
+            return Solution(2 * (cm[0] + cm[1]), "cm", "rectangle_cuboid")
+    if len(cm) == 3 and re.search(r"\bcuboid|\brectangular (?:box|tank|container|block|prism|solid)", stem.lower):
+        if re.search(r"\bvolume\b|\bcapacity\b", stem.ask):
+            return Solution(cm[0] * cm[1] * cm[2], "cm³", "rectangle_cuboid")
+    return None
+
+
+@_solver("square_cube")
+def _square_cube(stem: _Stem) -> Optional[Solution]:
+    if len(stem.quantities) != 1 or re.search(r"\b(?:area|perimeter|volume|times|twice|half|path|border|cut)\b", stem.givens):
+        return None
+    side = _SIDE.search(stem.lower)
+    if not side or _OTHER_FIGURES.search(stem.ask):
+        return None
+    cm = Quantity(Fraction(side.group(1)), side.group(2), None, 0, 0).to("cm")
+    # The question must be about the square or cube itself ("its area", "the volume of the cube")
+    if re.search(r"\bsquare\b", stem.lower) and not re.search(r"\bcube\b", stem.lower):
+        if not re.search(r"\b(?:square|its)\b", stem.ask):
+            return None
+        if re.search(r"\barea\b", stem.ask):
+            return Solution(cm * cm, "cm²", "square_cube")
+        if re.search(r"\bperimeter\b", stem.ask):
+            return Solution(4 * cm, "cm", "square_cube")
+    if (re.search(r"\bcube\b", stem.lower) and re.search(r"\b(?:cube|its)\b", stem.ask)
+            and re.search(r"\bvolume\b", stem.ask)):
+        return Solution(cm * cm * cm, "cm³", "square_cube")
+    return None
+
+
+# -- Averages and equal sharing ----------------------------------------------
+
+_LIST = re.compile(r"\$?\s?[\d.,/]+\s?[^\s,]*(?:,\s*\$?\s?[\d.,/]+\s?[^\s,]*)*,?\s+and\s+\$?\s?[\d.,/]+")
+
+
+@_solver("average")
+def _average(stem: _Stem) -> Optional[Solution]:
+    if len(stem.quantities) < 2 or not re.search(r"\b(?:average|mean)\b", stem.ask):
+        return None
+    if re.search(r"\b(?:if|another|new|after|joined|left|more|less|total|increase|decrease|each)\b", stem.lower):
+        return None
+    listed = _LIST.search(stem.lower)
+    if not listed:
+        return None
+    inside = [q for q in stem.quantities if listed.start() <= q.start < listed.end()]
+    if len(inside) != len(stem.quantities):
+        return None
+    units = {q.unit for q in stem.quantities}
+    if len(units) != 1:
+        return None
+    return Solution(sum(q.value for q in stem.quantities) / len(stem.quantities), units.pop(), "average")
+
+
+_EQUAL_PIECES = re.compile(
+    r"\b(?:into|÷|divided by|among|between)\s+(\d+)\s+(?:equal\s+)?"
+    r"(?:pieces?|parts?|portions?|lengths?|pieces|packets|bags|bottles|containers|groups|shares)\b"
+)
+
+
+@_solver("equal_pieces")
+def _equal_pieces(stem: _Stem) -> Optional[Solution]:
+    pieces = _EQUAL_PIECES.search(stem.lower)
+    if not pieces or len(stem.quantities) != 2 or not re.search(r"\beach\b", stem.ask):
+        return None
+    count = int(pieces.group(1))
+    whole = stem.quantities[0]
+    if count == 0 or whole.start >= pieces.start() or whole.unit == "%":
+        return None
+    return Solution(whole.value / count, whole.unit, "equal_pieces")
+
+
+def _in_asked_unit(stem: _Stem, solution: Solution) -> Solution:
+    """`solution` converted to the unit the question sentence names, if it names one."""
+    units = {_canonical_unit(m.group("unit")) for m in _ASKED_UNIT.finditer(stem.ask)}
+    if len(units) != 1:
+        return solution
+    unit = units.pop()
+    if unit not in UNITS or solution.unit not in UNITS or UNITS[unit][0] != UNITS[solution.unit][0]:
+        return solution
+    value = solution.value * UNITS[solution.unit][1] / UNITS[unit][1]
+    return Solution(value, unit, solution.method, asked=True)
+
+
+def solve(stem_text: str) -> Optional[Solution]:
+    """Exact answer to a stem in one of the recognised shapes, or None."""
+    stem = _Stem(stem_text or "")
+    if not stem.quantities or _NUMBER_WORDS.search(stem.lower):
+        return None
+    for _, solver in _SOLVERS:
+        try:
+            solution = solver(stem)
+        except (ZeroDivisionError, ValueError, KeyError):
+            solution = None
+        if solution is not None:
+            return _in_asked_unit(stem, solution)
+    return None
+
+
+def _compare(solution: Solution, option: Quantity) -> Tuple[bool, bool, bool]:
+    """
+    (equal, equal after rounding to the option's precision, comparable): the
+    last is False when the option may be in a unit the solution does not know,
+    so a mismatch says nothing.
+    """
+    value, tolerance = option.value, Fraction(0)
+    if option.decimals is not None:
+        tolerance = Fraction(1, 2 * 10 ** option.decimals)
+    comparable = True
+    if solution.unit in UNITS and option.unit in UNITS:
+        if UNITS[solution.unit][0] != UNITS[option.unit][0]:
+            return False, False, True
+        scale = UNITS[option.unit][1] / UNITS[solution.unit][1]
+        value, tolerance = value * scale, tolerance * scale
+    elif solution.unit in UNITS or option.unit in UNITS:
+        # Bare numbers against a unit (or the reverse): the option may be in another unit,
+        # unless the question says which unit its answer is in
+        comparable = option.unit is None and (solution.unit in ("$", "%") or solution.asked)
+    difference = abs(value - solution.value)
+    return difference == 0, difference <= tolerance, comparable
+
+
+class AnswerChecker:
+    """
+    Checks the answer key of MCQs whose stems `solve` understands: VERIFIED when the
+    calculated answer is the keyed option, REPAIRED when it is exactly one other option
+    (`answer_index`), WRONG when no option holds it.
+
+    Thread-safe; counts outcomes per status and per solving method for stats().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._statuses: Dict[str, int] = {}
+        self._methods: Dict[str, int] = {}
+
+    def _count(self, status: str, solution: Optional[Solution] = None) -> None:
+        with self._lock:
+            self._statuses[status] = self._statuses.get(status, 0) + 1
+            if solution is not None and status != UNDECIDED:
+                self._methods[solution.method] = self._methods.get(solution.method, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Checks per outcome, and decided checks per solving method."""
+        with self._lock:
+            return {"outcomes": dict(self._statuses), "methods": dict(self._methods)}
+
+    def check(self, stem: str, options: Sequence[str], answer_index: int) -> AnswerCheck:
+        solution = solve(stem)
+        if solution is None:
+            self._count(UNDECIDED)
+            return AnswerCheck(UNDECIDED)
+        parsed = [parse_option(option) for option in options]
+        if any(option is None for option in parsed):
+            self._count(UNDECIDED)
+            return AnswerCheck(UNDECIDED, solution)
+
+        exact, rounded, all_comparable = [], [], True
+        for i, option in enumerate(parsed):
+            equal, close, comparable = _compare(solution, option)
+            # An option in an unknown unit can neither confirm nor correct the key
+            if not comparable:
+                all_comparable = False
+                continue
+            if equal:
+                exact.append(i)
+            elif close:
+                rounded.append(i)
+        # A rounded option only counts when no option states the exact value
+        matching = exact or rounded
+
+        expected = _format(solution)
+        if len(matching) == 1:
+            index = matching[0]
+            if index == answer_index:
+                self._count(VERIFIED, solution)
+                return AnswerCheck(VERIFIED, solution, index, f"Answer verified by calculation ({expected})")
+            self._count(REPAIRED, solution)
+            return AnswerCheck(REPAIRED, solution, index,
+                               f"Calculation points to option {index + 1} ({expected})")
+        if not matching and all_comparable:
+            self._count(WRONG, solution)
+            return AnswerCheck(WRONG, solution, None, f"No option matches the calculated answer ({expected})")
+        self._count(UNDECIDED)
+        return AnswerCheck(UNDECIDED, solution)
+
+
+def _format(solution: Solution) -> str:
+    value = solution.value
+    text = str(value.numerator) if value.denominator == 1 else f"{float(value):.4g}"
+    if solution.unit == "$":
+        return f"${text}"
+    return f"{text} {solution.unit}" if solution.unit else text
@@ -0,0 +1,48 @@
+"""Micro-benchmark: PDF render time of one 30-question paper (rendered in memory, no LM calls)
+
+Full renders bypass the rendered-paper cache; when the cache is enabled, cache hits
+(header render and stamping) are timed separately.
+"""
+import io
+import logging
+import random
+import statistics
+import sys
+import time
+
+from final_working_generator import FinalWorkingPSLEMathPaperGenerator, PaperFormatter
+
+ROUNDS = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+
+logging.disable(logging.WARNING)
+random.seed(2024)  # same paper on every run, so timings are comparable
+gen = FinalWorkingPSLEMathPaperGenerator('final_cleaned_withtopics.json')
+paper = gen.generate_practice_paper(total_questions=30, title='Benchmark Paper', time_budget=0)
+if not paper:
+    print('FAILED: No paper generated')
+    sys.exit(1)
+print(f'Paper: {paper["total_questions"]} questions, sources {paper["question_sources"]}')
+
+
+def benchmark(formatter, label):
+    timings = []
+    size = 0
+    for _ in range(ROUNDS + 1):
+        buffer = io.BytesIO()
+        start = time.perf_counter()
+        if not formatter.save_to_pdf(paper, buffer):
+            print('FAILED: PDF render failed')
+            sys.exit(1)
+        timings.append((time.perf_counter() - start) * 1000)
+        size = buffer.tell()
+
+    # The first render pays for imports and ReportLab's one-off set-up (or fills the cache)
+    first, timings = timings[0], timings[1:]
+    print(f'{label} - first render: {first:.1f} ms')
+    print(f'{label} - steady state over {ROUNDS} renders: median {statistics.median(timings):.1f} ms, '
+          f'mean {statistics.mean(timings):.1f} ms, min {min(timings):.1f} ms ({size} bytes)')
+
+
+benchmark(PaperFormatter(), 'Full render')
+if gen.formatter.pdf_cache is not None:
+    benchmark(gen.formatter, 'Cache hit')
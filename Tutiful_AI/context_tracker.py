@@ -0,0 +1,157 @@
+"""
+Scenario contexts (tanks, gardens, murals, ...) used by the questions of a paper.
+
+Questions are scanned once, when they are accepted, with a single compiled
+pattern; ContextTracker keeps the running tally so choosing the next question
+does not mean rescanning every question already in the paper.
+"""
+
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+# Context nouns and, per tracked variant, the word that may precede them and
+# whether it must. A noun with two variants is reported once per variant
+# ("water tank" is both "water tank" and "tank").
+_CONTEXT_NOUNS: Dict[str, Tuple[Tuple[Optional[str], bool], ...]] = {
+    # Containers/liquids
+    r"tanks?": (("water", False), ("cylindrical", False)),
+    r"containers?": ((None, False),),
+    r"pools?": (("swimming", False),),
+    # Art-related
+    r"art\s+projects?": (("school", False), ("community", True)),
+    r"murals?": (("school", False), ("community", True)),
+    r"geometric\s+patterns?": ((None, False),),
+    r"art\s+club": ((None, False),),
+    r"art\s+rooms?": ((None, False),),
+    # Spaces
+    r"gardens?": (("rectangular", False),),
+    r"fields?": (("square", False), ("rectangular", False)),
+    r"rooms?": (("rectangular", False),),
+    r"parks?": (("rectangular", False),),
+    r"halls?": (("rectangular", False),),
+    r"playgrounds?": (("rectangular", False),),
+    r"banners?": (("rectangular", False),),
+    r"plots?": (("rectangular", False),),
+    r"lawns?": (("rectangular", False),),
+    r"carpets?": ((None, False),),
+    r"ponds?": ((None, False),),
+    r"fountains?": ((None, False),),
+}
+_NOUN_PATTERNS = [(re.compile(noun + r"$"), variants) for noun, variants in _CONTEXT_NOUNS.items()]
+_PREFIXES = sorted({prefix for variants in _CONTEXT_NOUNS.values() for prefix, _ in variants if prefix})
+_CONTEXT_SCAN = re.compile(
+    r"\b(?:(?P<prefix>" + "|".join(_PREFIXES) + r")\s+)?"
+    r"(?P<noun>" + "|".join(sorted(_CONTEXT_NOUNS, key=len, reverse=True)) + r")\b"
+)
+# "art room" also counts as a "room"
+_NESTED_NOUN = re.compile(r"(?:art\s+)(rooms?)$")
+
+_ART_CONTEXT = re.compile(r"\bart\s+project|\bmural|\bgeometric\s+pattern|\bart\s+club|\bart\s+room")
+# Art contexts are only refused once this many are already in the paper
+MAX_ART_CONTEXTS = 2
+# Contexts longer than this are too specific to refuse on their own
+MAX_CONTEXT_WORDS = 2
+
+
+def _variants(noun: str) -> Tuple[Tuple[Optional[str], bool], ...]:
+    for pattern, variants in _NOUN_PATTERNS:
+        if pattern.match(noun):
+            return variants
+    return ()
+
+
+def extract_contexts(text: str) -> Set[str]:
+    """Contexts mentioned in one question stem."""
+    contexts = set()
+    if not text:
+        return contexts
+    for match in _CONTEXT_SCAN.finditer(text.lower()):
+        prefix = match.group("prefix")
+        noun = " ".join(match.group("noun").split())
+        for allowed, required in _variants(noun):
+            if prefix and prefix == allowed:
+                contexts.add(f"{prefix} {noun}")
+            elif not required:
+                contexts.add(noun)
+        nested = _NESTED_NOUN.search(noun)
+        if nested:
+            contexts.add(nested.group(1))
+    return contexts
+
+
+def _is_art_context(context: str) -> bool:
+    return "art" in context or "mural" in context or "pattern" in context
+
+
+@lru_cache(maxsize=256)
+def _repeat_pattern(used_contexts: FrozenSet[str]) -> Optional["re.Pattern"]:
+    """One pattern matching any refusable context of a paper, compiled once per context set."""
+    short = sorted((c.lower() for c in used_contexts if len(c.split()) <= MAX_CONTEXT_WORDS),
+                   key=len, reverse=True)
+    if not short:
+        return None
+    return re.compile(r"\b(?:" + "|".join(re.escape(c) for c in short) + r")\b")
+
+
+def repeated_context(text: str, used_contexts: Iterable[str]) -> Optional[str]:
+    """
+    Why `text` would repeat a context of the paper, or None when it would not.
+
+    Art scenarios are refused once MAX_ART_CONTEXTS are in use; any other short
+    context is refused as soon as it is mentioned again.
+    """
+    if not text or not used_contexts:
+        return None
+    used = used_contexts if isinstance(used_contexts, frozenset) else frozenset(used_contexts)
+    q_text = text.lower()
+    if _ART_CONTEXT.search(q_text):
+        art_in_use = sum(1 for context in used if _is_art_context(context))
+        if art_in_use >= MAX_ART_CONTEXTS:
+            return f"repeated art context (already have {art_in_use} art contexts)"
+    pattern = _repeat_pattern(used)
+    match = pattern.search(q_text) if pattern else None
+    if match:
+        return f"repeated context '{match.group(0)}'"
+    return None
+
+
+class ContextTracker:
+    """
+    Contexts of the questions accepted into one paper so far.
+
+    Each accepted question is scanned once; `contexts` is a frozen snapshot
+    that is only rebuilt when a question adds a new context, so handing it to
+    every slot costs nothing.
+    """
+
+    def __init__(self, questions: Iterable = ()):
+        self.counts: Counter = Counter()
+        self._snapshot: FrozenSet[str] = frozenset()
+        for question in questions:
+            self.add(question)
+
+    def add(self, question) -> Set[str]:
+        """Record an accepted question; returns the contexts it mentions."""
+        found = extract_contexts(getattr(question, "question", None) or "")
+        if found:
+            new = not found.issubset(self._snapshot)
+            self.counts.update(found)
+            if new:
+                self._snapshot = frozenset(self.counts)
+        return found
+
+    @property
+    def contexts(self) -> FrozenSet[str]:
+        return self._snapshot
+
+    def repeated_context(self, question) -> Optional[str]:
+        return repeated_context(getattr(question, "question", None) or "", self._snapshot)
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+
+def union_contexts(context_sets: List[FrozenSet[str]]) -> FrozenSet[str]:
+    return frozenset().union(*context_sets) if context_sets else frozenset()
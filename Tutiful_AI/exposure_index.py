@@ -0,0 +1,283 @@
+"""
+Per-tutor history of the curated questions already used in their papers.
+
+Every question of the bank gets a fixed bit position, persisted so positions
+survive restarts; a tutor's history is a bitset over those positions. Loading
+it costs one row read per paper and checking a question is one dict lookup
+and one bit test, however long the history grows. When every question of a
+bucket has been shown to a tutor, the bucket starts a new cycle, so the bank
+is worked through evenly before anything repeats.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS question_positions (
+    question_key TEXT PRIMARY KEY,
+    position INTEGER NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tutor_exposure (
+    tutor_id TEXT PRIMARY KEY,
+    bits BLOB NOT NULL,
+    papers INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS exposure_meta (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def question_key(data: Dict) -> Optional[str]:
+    """Stable key of a curated question: its id, or a digest of its text when it has none."""
+    q_id = data.get('id')
+    if q_id:
+        return str(q_id)
+    text = (data.get('question') or '').strip()
+    if not text:
+        return None
+    return "sha1:" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+
+
+def _set_bits(bits: bytearray, positions: Iterable[int], value: bool) -> None:
+    for position in positions:
+        byte, mask = position >> 3, 1 << (position & 7)
+        if value:
+            if byte >= len(bits):
+                bits.extend(bytes(byte + 1 - len(bits)))
+            bits[byte] |= mask
+        elif byte < len(bits):
+            bits[byte] &= ~mask
+
+
+def _trimmed(bits: bytearray) -> bytes:
+    return bytes(bits).rstrip(b"\x00")
+
+
+def _positions_version(conn: sqlite3.Connection) -> int:
+    """Bumped by every compaction, which renumbers the positions of existing questions."""
+    row = conn.execute("SELECT value FROM exposure_meta WHERE name = 'positions_version'").fetchone()
+    return row[0] if row else 0
+
+
+class TutorExposure:
+    """
+    One tutor's history, loaded for the duration of a paper.
+
+    Changes are kept as deltas as well, so saving merges them into whatever
+    papers of the same tutor saved meanwhile instead of overwriting them.
+    """
+
+    def __init__(self, tutor_id: str, positions: Dict[str, int], bits: bytes = b"", version: int = 0):
+        self.tutor_id = tutor_id
+        # The positions version `positions` and `bits` were read at
+        self.version = version
+        self._positions = positions
+        self._bits = bytearray(bits)
+        self._marked: Set[int] = set()
+        self._cleared: Set[int] = set()
+
+    def _position(self, data: Dict) -> Optional[int]:
+        key = question_key(data)
+        return self._positions.get(key) if key else None
+
+    def seen(self, data: Dict) -> bool:
+        position = self._position(data)
+        if position is None:
+            return False
+        byte = position >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << (position & 7)))
+
+    def mark(self, data: Dict) -> None:
+        position = self._position(data)
+        if position is None:
+            return
+        _set_bits(self._bits, (position,), True)
+        self._marked.add(position)
+        self._cleared.discard(position)
+
+    def reset(self, questions: Iterable[Dict]) -> None:
+        """Forget `questions` (a bucket the tutor has been through), starting its next cycle."""
+        positions = {p for p in (self._position(data) for data in questions) if p is not None}
+        _set_bits(self._bits, positions, False)
+        self._cleared |= positions
+        self._marked -= positions
+
+    @property
+    def changed(self) -> bool:
+        return bool(self._marked or self._cleared)
+
+    def __len__(self) -> int:
+        return int.from_bytes(self._bits, "little").bit_count()
+
+
+class ExposureIndex:
+    """
+    SQLite-backed per-tutor exposure bitsets; safe to share between threads and processes.
+
+    Positions of questions that left the dataset are reclaimed at start-up once
+    they make up COMPACT_DEAD_FRACTION of all positions: positions are renumbered
+    densely and every tutor's bitset is rewritten to match. A compaction bumps the
+    stored positions version; processes started earlier notice it when they next
+    load or save a history, re-read the positions and remap their changes.
+    """
+
+    COMPACT_DEAD_FRACTION = 0.25
+
+    def __init__(self, db_path: str, questions: Iterable[Dict]):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+        self._keys = list(dict.fromkeys(k for k in (question_key(data) for data in questions) if k))
+        self._lock = threading.Lock()
+        self._positions, self._version = self._register(self._keys)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    @staticmethod
+    def _assign(conn: sqlite3.Connection, keys: List[str]) -> Dict[str, int]:
+        """Every stored position, after giving the keys without one the next free positions."""
+        positions = dict(conn.execute("SELECT question_key, position FROM question_positions"))
+        next_position = max(positions.values(), default=-1) + 1
+        new_rows = []
+        for key in keys:
+            if key not in positions:
+                positions[key] = next_position
+                new_rows.append((key, next_position))
+                next_position += 1
+        conn.executemany("INSERT INTO question_positions (question_key, position) VALUES (?, ?)", new_rows)
+        return positions
+
+    def _register(self, keys: List[str]) -> Tuple[Dict[str, int], int]:
+        """Assign positions to new keys (compacting if needed); returns the positions of `keys` and their version."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                positions = self._assign(conn, keys)
+                live = set(keys)
+                dead = len(positions) - len(live)
+                if dead and dead >= len(positions) * self.COMPACT_DEAD_FRACTION:
+                    positions = self._compact(conn, positions, live)
+                version = _positions_version(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        return {key: positions[key] for key in keys}, version
+
+    def _reload_positions(self, conn: sqlite3.Connection) -> None:
+        """Re-read positions another process renumbered; `conn` must hold a write transaction."""
+        positions = self._assign(conn, self._keys)
+        version = _positions_version(conn)
+        with self._lock:
+            self._positions = {key: positions[key] for key in self._keys}
+            self._version = version
+        logger.info(f"Question positions changed by another process, reloaded (version {version})")
+
+    def _remap(self, exposure: TutorExposure, positions: Set[int]) -> Set[int]:
+        """`exposure` positions translated to the current ones; questions no longer indexed are dropped."""
+        keys = {position: key for key, position in exposure._positions.items()}
+        current = self._positions
+        return {current[keys[p]] for p in positions if p in keys and keys[p] in current}
+
+    def _compact(self, conn: sqlite3.Connection, positions: Dict[str, int], live: Set[str]) -> Dict[str, int]:
+        kept = sorted((position, key) for key, position in positions.items() if key in live)
+        remap = {old: new for new, (old, _key) in enumerate(kept)}
+        conn.execute("DELETE FROM question_positions")
+        conn.executemany("INSERT INTO question_positions (question_key, position) VALUES (?, ?)",
+                         [(key, remap[old]) for old, key in kept])
+        rows = conn.execute("SELECT tutor_id, bits FROM tutor_exposure").fetchall()
+        for tutor_id, blob in rows:
+            old_bits = int.from_bytes(blob, "little")
+            new_bits = bytearray()
+            _set_bits(new_bits, (new for old, new in remap.items() if old_bits >> old & 1), True)
+            conn.execute("UPDATE tutor_exposure SET bits = ? WHERE tutor_id = ?", (_trimmed(new_bits), tutor_id))
+        conn.execute(
+            "INSERT INTO exposure_meta (name, value) VALUES ('positions_version', 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1"
+        )
+        logger.info(f"Compacted question positions: {len(positions)} -> {len(kept)}, {len(rows)} tutor histories rewritten")
+        return {key: remap[old] for old, key in kept}
+
+    def load(self, tutor_id: str) -> TutorExposure:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN")
+            try:
+                if _positions_version(conn) != self._version:
+                    # Take the write lock so the positions and bits are read at the same version
+                    conn.execute("COMMIT")
+                    conn.execute("BEGIN IMMEDIATE")
+                    if _positions_version(conn) != self._version:
+                        self._reload_positions(conn)
+                row = conn.execute("SELECT bits FROM tutor_exposure WHERE tutor_id = ?", (tutor_id,)).fetchone()
+                with self._lock:
+                    positions, version = self._positions, self._version
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        return TutorExposure(tutor_id, positions, row[0] if row else b"", version)
+
+    def save(self, exposure: TutorExposure) -> None:
+        """Merge the paper's changes into the tutor's stored history."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cleared, marked = exposure._cleared, exposure._marked
+                version = _positions_version(conn)
+                if version != exposure.version:
+                    # Positions were compacted since the history was loaded: translate its changes
+                    if version != self._version:
+                        self._reload_positions(conn)
+                    cleared, marked = self._remap(exposure, cleared), self._remap(exposure, marked)
+                row = conn.execute("SELECT bits FROM tutor_exposure WHERE tutor_id = ?",
+                                   (exposure.tutor_id,)).fetchone()
+                bits = bytearray(row[0] if row else b"")
+                _set_bits(bits, cleared, False)
+                _set_bits(bits, marked, True)
+                conn.execute(
+                    "INSERT INTO tutor_exposure (tutor_id, bits, papers, updated_at) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT (tutor_id) DO UPDATE SET bits = excluded.bits, papers = papers + 1, "
+                    "updated_at = excluded.updated_at",
+                    (exposure.tutor_id, _trimmed(bits), time.time()),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        exposure._marked.clear()
+        exposure._cleared.clear()
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        try:
+            tutors, papers = conn.execute("SELECT COUNT(*), COALESCE(SUM(papers), 0) FROM tutor_exposure").fetchone()
+        finally:
+            conn.close()
+        return {"questions": len(self._positions), "tutors": tutors, "papers": papers}
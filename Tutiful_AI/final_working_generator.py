@@ -3,20 +3,64 @@ Final working PSLE Math Paper Generator with improved variations
 Optimized for Mistral 7B Instruct v0.3 model in LM Studio
 """
 
+import io
 import json
+import math
 import random
 import logging
 import os
 import re
+import sqlite3
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Dict, Optional
-from dataclasses import dataclass
-from AgentDataEngineering.src.lm_studio_client import LMStudioClient
+from typing import BinaryIO, Callable, List, Dict, Optional, Union
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+from AgentDataEngineering.config.psle_config import PROCESSING_CONFIG
+from AgentDataEngineering.src.json_stream import escape_latex, extract_json_object
+from AgentDataEngineering.src.lm_response_cache import CachedLMStudioClient, LMResponseCache
+from AgentDataEngineering.src.lm_studio_client import AsyncLMStudioClient, LMStudioClient, LMStudioClientError
+import answer_checker
+from exposure_index import ExposureIndex, TutorExposure
+from context_tracker import ContextTracker, extract_contexts, repeated_context, union_contexts
+from generation_budget import AI_REVIEW, FALLBACK, LM_GENERATION, QUALITY_NUDGE, TOP_UP, GenerationBudget
+from generation_stats import GENERATED, NUDGE, VARIATION, GenerationStats, RetryPlan, RetryPolicy, StageOutcomes
+from pdf_cache import PaperPDFCache, concatenate_pdfs, paper_cache_key, pdf_merging_available, stamp_header
+from question_bank import QuestionBank
+from question_inventory import InventoryBuilder, QuestionInventory
+from question_schema import check_question_payload, question_response_format
+from review_batcher import ReviewBatcher
+import question_rules
+from stem_normalizer import StemNormalizer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# On-disk caches (LM responses, ...); outputs/ is not versioned
+CACHE_DIR = os.getenv("TUTIFUL_CACHE_DIR") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "outputs", "cache"
+)
+
+def _env_number(name: str, default, cast=int):
+    try:
+        return cast(os.getenv(name, str(default)))
+    except (TypeError, ValueError):
+        return default
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off", "")
+
+# Echoed Mistral instruction block at the start of a response
+_INSTRUCTION_ECHO = re.compile(r'^(?:<s>)?\[INST\].*?\[/INST\]', re.DOTALL)
+
 @dataclass
 class Question:
     id: str
@@ -29,30 +73,151 @@ class Question:
     question_type: str  # "MCQ" or "Open-ended"
     marks: int = 1  # Default marks for MCQ, can be 2-5 for open-ended
 
+@dataclass
+class GenerationSession:
+    """Per-paper generation state, kept apart from the shared generator so concurrent papers don't bleed into each other"""
+    used_question_ids: set = field(default_factory=set)
+    # Recently used character names to avoid repetition across questions
+    recent_names: deque = field(default_factory=lambda: deque(maxlen=16))
+    # Existential openings usage (There is/are/was/were) to limit frequency
+    recent_existential: deque = field(default_factory=lambda: deque(maxlen=20))
+    # Opening patterns for variety (person names, numbers, actions, questions, etc.)
+    recent_opening_patterns: deque = field(default_factory=lambda: deque(maxlen=30))
+    # History of the tutor the paper is for, so curated originals aren't repeated across their papers
+    exposure: Optional[TutorExposure] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
 class FinalWorkingPSLEMathPaperGenerator:
-    """Final working PSLE Math Paper Generator with improved variations"""
+    """Final working PSLE Math Paper Generator with improved variations
+
+    One instance can be shared by many threads: the question bank, LM client and
+    agents are read-only after construction, and everything that changes while a
+    paper is built lives in a GenerationSession.
+    """
     
     def __init__(self, questions_file: str):
         self.questions_file = questions_file
         self.questions_data = self._load_questions()
+        self.question_bank = QuestionBank(self.questions_data)
 
         lm_base_url = os.getenv("LM_STUDIO_BASE_URL", "http://127.0.0.1:1234")
         lm_model = os.getenv("LM_STUDIO_MODEL", "mistral-7b-instruct-v0.3")
-        try:
-            lm_timeout = int(os.getenv("LM_STUDIO_TIMEOUT", "120"))
-        except (TypeError, ValueError):
-            lm_timeout = 120
+
+        lm_timeout = _env_number("LM_STUDIO_TIMEOUT", 120)
+        lm_connect_timeout = _env_number("LM_STUDIO_CONNECT_TIMEOUT", 5.0, float)
+        lm_max_retries = _env_number("LM_STUDIO_MAX_RETRIES", 2)
 
         self.lm_client = LMStudioClient(
             base_url=lm_base_url,
             model=lm_model,
             timeout=lm_timeout,
+            connect_timeout=lm_connect_timeout,
+            pool_size=_env_number("LM_STUDIO_POOL_SIZE", 4),
+            max_retries=lm_max_retries,
         )
+
+        # Repeated prompts at or below LM_CACHE_MAX_TEMPERATURE (in practice, AI reviews) are answered from disk
+        self.lm_cache = None
+        if _env_flag("LM_CACHE_ENABLED", True):
+            try:
+                self.lm_cache = LMResponseCache(
+                    os.path.join(CACHE_DIR, "lm_responses.sqlite3"),
+                    ttl_seconds=_env_number("LM_CACHE_TTL_SECONDS", 7 * 24 * 3600, float),
+                    max_entries=_env_number("LM_CACHE_MAX_ENTRIES", 5000),
+                )
+                self.lm_client = CachedLMStudioClient(
+                    self.lm_client,
+                    self.lm_cache,
+                    max_temperature=_env_number("LM_CACHE_MAX_TEMPERATURE", 0.1, float),
+                )
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"LM response cache disabled: {e}")
+                self.lm_cache = None
+
+        # Requests LM Studio can serve at once; above 1 independent prompts (AI reviews) are
+        # fanned out concurrently through one async pool bounded to that many slots
+        self.async_lm_client = None
+        lm_max_concurrency = _env_number("LM_STUDIO_MAX_CONCURRENCY", 1)
+        if lm_max_concurrency > 1:
+            try:
+                self.async_lm_client = AsyncLMStudioClient(
+                    base_url=lm_base_url,
+                    model=lm_model,
+                    timeout=lm_timeout,
+                    connect_timeout=lm_connect_timeout,
+                    max_concurrency=lm_max_concurrency,
+                    max_retries=lm_max_retries,
+                    breaker=self.lm_client.breaker,
+                )
+            except LMStudioClientError as e:
+                logger.warning(f"Concurrent LM Studio requests disabled: {e}")
+
+        # How many questions of one paper are generated at the same time. Keep this at or
+        # below the number of parallel slots LM Studio serves; 1 generates strictly in order.
+        self.generation_concurrency = max(1, _env_number("PAPER_GENERATION_CONCURRENCY", 1))
+
+        # Wall-clock seconds one paper may take before stages are dropped; 0 means unlimited
+        self.time_budget = _env_number("PAPER_TIME_BUDGET_SECONDS", 300.0, float)
+
+        # Questions stocked per (topic, type) by the background inventory builder; papers draw
+        # from this stock before generating live. 0 turns the inventory off.
+        self.inventory_target = max(0, _env_number("QUESTION_INVENTORY_TARGET", 0))
+        self.inventory = None
+        if self.inventory_target:
+            try:
+                self.inventory = QuestionInventory(
+                    os.getenv("QUESTION_INVENTORY_DB") or os.path.join(CACHE_DIR, "question_inventory.sqlite3")
+                )
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Question inventory disabled: {e}")
+        # Outcomes of each generation stage per topic, kept across runs to steer retries
+        self.generation_stats = None
+        if _env_flag("GENERATION_STATS_ENABLED", True):
+            try:
+                self.generation_stats = GenerationStats(
+                    os.getenv("GENERATION_STATS_DB") or os.path.join(CACHE_DIR, "generation_stats.sqlite3")
+                )
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Generation stats disabled: {e}")
+        # Curated originals already used in each tutor's papers
+        self.exposure_index = None
+        if _env_flag("TUTOR_EXPOSURE_ENABLED", True):
+            try:
+                self.exposure_index = ExposureIndex(
+                    os.getenv("TUTOR_EXPOSURE_DB") or os.path.join(CACHE_DIR, "tutor_exposure.sqlite3"),
+                    self.questions_data,
+                )
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Tutor exposure history disabled: {e}")
+        # Name/opening variety state of the inventory builder thread
+        self._inventory_session = GenerationSession()
         
         # Initialize agents
-        self.validator = QuestionValidator(lm_client=self.lm_client)
-        self.generator = QuestionGenerator(self.questions_data, self.lm_client, self.validator)
-        self.formatter = PaperFormatter()
+        self.validator = QuestionValidator(
+            lm_client=self.lm_client,
+            review_batch_size=_env_number("LM_REVIEW_BATCH_SIZE", PROCESSING_CONFIG["batch_size"]),
+        )
+        if self.generation_concurrency > 1:
+            # Slots generated side by side share batched review calls
+            self.validator.enable_review_batching(_env_number("LM_REVIEW_BATCH_WINDOW", 0.25, float))
+        self.generator = QuestionGenerator(
+            self.questions_data, self.lm_client, self.validator, async_lm_client=self.async_lm_client,
+            stream_json=_env_flag("LM_STUDIO_STREAMING", True), inventory=self.inventory,
+            question_bank=self.question_bank,
+            structured_output=_env_flag("LM_STUDIO_STRUCTURED_OUTPUT", True),
+            retry_policy=RetryPolicy(self.generation_stats),
+        )
+        # Rendered papers by question set, so re-renders only stamp a new header
+        pdf_cache = None
+        if _env_flag("PDF_CACHE_ENABLED", True):
+            try:
+                pdf_cache = PaperPDFCache(
+                    os.path.join(CACHE_DIR, "paper_pdfs.sqlite3"),
+                    max_entries=_env_number("PDF_CACHE_MAX_ENTRIES", 500),
+                )
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"PDF cache disabled: {e}")
+        self.formatter = PaperFormatter(pdf_cache=pdf_cache)
     
     def _load_questions(self) -> List[Dict]:
         """Load questions from JSON file"""
@@ -68,13 +233,79 @@ class FinalWorkingPSLEMathPaperGenerator:
     def check_lm_studio_connection(self) -> bool:
         """Check if LM Studio is available"""
         return self.lm_client.is_available()
+
+    def cache_stats(self) -> Dict:
+        """Hit/miss counters of the LM response cache (empty when it is disabled)"""
+        return self.lm_cache.stats() if self.lm_cache else {}
+
+    def stock_inventory_question(self, topic: str, question_type: str, used_contexts: Optional[set] = None) -> bool:
+        """Generate one question live (no originals, no stock) and add it to the inventory"""
+        if self.inventory is None:
+            return False
+        with self.generator.use_session(self._inventory_session):
+            question = self.generator.generate_question(
+                topic, question_type, used_contexts=used_contexts, use_originals=False, use_inventory=False
+            )
+        if not question:
+            return False
+        payload = asdict(question)
+        payload["id"] = f"inventory_{uuid.uuid4().hex}"
+        self.inventory.add(
+            topic,
+            question_type,
+            payload,
+            quality_score=self.validator.get_quality_score(question),
+            contexts=extract_contexts(question.question),
+        )
+        logger.info(f"Stocked {question_type} question for {topic} (Source: {question.source})")
+        return True
+
+    def create_inventory_builder(self, should_pause: Optional[Callable[[], bool]] = None) -> Optional[InventoryBuilder]:
+        """Builder that keeps every (topic, type) bucket stocked; None when the inventory is off"""
+        if self.inventory is None:
+            return None
+        buckets = [(topic, question_type)
+                   for topic in self._get_available_topics()
+                   for question_type in ("MCQ", "Open-ended")]
+        return InventoryBuilder(
+            self.inventory, buckets, self.stock_inventory_question, self.inventory_target, should_pause=should_pause
+        )
     
     def generate_practice_paper(self, 
                               title: str = "PSLE Math Practice Paper",
                               total_questions: int = 30,
-                              topics_distribution: Optional[Dict[str, int]] = None) -> Optional[Dict]:
-        """Generate a complete practice paper"""
-        
+                              topics_distribution: Optional[Dict[str, int]] = None,
+                              session: Optional[GenerationSession] = None,
+                              time_budget: Optional[float] = None,
+                              tutor_id: Optional[str] = None) -> Optional[Dict]:
+        """Generate a complete practice paper (each paper gets a fresh GenerationSession unless one is given)
+
+        `time_budget` (seconds, default PAPER_TIME_BUDGET_SECONDS) bounds the wall-clock time: as it
+        runs out, expensive stages are skipped and the paper's "generation_budget" reports which.
+        With a `tutor_id`, curated originals already used in that tutor's earlier papers are
+        avoided until the tutor has been through the whole bucket.
+        """
+        budget = GenerationBudget(self.time_budget if time_budget is None else time_budget)
+        session = session or GenerationSession()
+        if tutor_id and self.exposure_index and session.exposure is None:
+            try:
+                session.exposure = self.exposure_index.load(tutor_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Tutor exposure history unavailable: {e}")
+        with self.generator.use_session(session):
+            paper_data = self._generate_practice_paper(title, total_questions, topics_distribution, budget)
+        if paper_data and session.exposure is not None and session.exposure.changed:
+            try:
+                self.exposure_index.save(session.exposure)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not save tutor exposure history: {e}")
+        return paper_data
+
+    def _generate_practice_paper(self,
+                                 title: str,
+                                 total_questions: int,
+                                 topics_distribution: Optional[Dict[str, int]],
+                                 budget: GenerationBudget) -> Optional[Dict]:
         if not self.questions_data:
             logger.error("No questions data available")
             return None
@@ -116,25 +347,33 @@ class FinalWorkingPSLEMathPaperGenerator:
         
         # Generate questions following the pre-planned structure
         all_questions = []
+        # Contexts of the accepted questions, to avoid repeating scenarios
+        context_tracker = ContextTracker()
         question_sources = {"Generated": 0, "Variation": 0, "Original": 0}
         failed_topics = []
 
-        for i, (topic, question_type) in enumerate(paper_plan, 1):
-            logger.info(f"Generating {question_type} question {i}/{len(paper_plan)} for topic: {topic}")
-
-            # Extract key contexts from already generated questions to avoid repetition
-            existing_contexts = self._extract_contexts_from_questions(all_questions)
-            question = self.generator.generate_question(topic, question_type, used_contexts=existing_contexts)
-            if question:
-                all_questions.append(question)
+        if self.generation_concurrency > 1 and len(paper_plan) > 1:
+            all_questions, failed_topics = self._generate_planned_questions_concurrently(paper_plan, budget)
+            for question in all_questions:
                 question_sources[question.source] += 1
-                logger.info(f"SUCCESS: Added {question_type} question for {topic} (Source: {question.source})")
-            else:
-                logger.warning(f"Failed to generate {question_type} question for {topic}")
-                failed_topics.append((topic, question_type))
+                context_tracker.add(question)
+        else:
+            for i, (topic, question_type) in enumerate(paper_plan, 1):
+                logger.info(f"Generating {question_type} question {i}/{len(paper_plan)} for topic: {topic}")
+
+                question = self.generator.generate_question(topic, question_type, used_contexts=context_tracker.contexts,
+                                                            budget=budget)
+                if question:
+                    all_questions.append(question)
+                    context_tracker.add(question)
+                    question_sources[question.source] += 1
+                    logger.info(f"SUCCESS: Added {question_type} question for {topic} (Source: {question.source})")
+                else:
+                    logger.warning(f"Failed to generate {question_type} question for {topic}")
+                    failed_topics.append((topic, question_type))
 
         # Fallback: Try to generate additional questions for failed topics (limit attempts)
-        if len(all_questions) < total_questions and failed_topics:
+        if len(all_questions) < total_questions and failed_topics and budget.allows(FALLBACK):
             remaining = total_questions - len(all_questions)
             max_fallback_attempts = min(len(failed_topics), remaining * 3)  # Try up to 3x remaining, or all failed topics
             logger.info(f"Attempting fallback generation for {min(len(failed_topics), max_fallback_attempts)} failed topics (need {remaining} more)...")
@@ -142,11 +381,15 @@ class FinalWorkingPSLEMathPaperGenerator:
             for i, (topic, question_type) in enumerate(failed_topics[:max_fallback_attempts]):
                 if len(all_questions) >= total_questions:
                     break
+                if not budget.allows(FALLBACK):
+                    logger.info("Fallback: time budget spent, stopping")
+                    break
                 logger.info(f"Fallback {i+1}/{max_fallback_attempts}: Trying {question_type} question for {topic}")
-                existing_contexts = self._extract_contexts_from_questions(all_questions)
-                question = self.generator.generate_question(topic, question_type, used_contexts=existing_contexts)
+                question = self.generator.generate_question(topic, question_type, used_contexts=context_tracker.contexts,
+                                                            budget=budget)
                 if question:
                     all_questions.append(question)
+                    context_tracker.add(question)
                     question_sources[question.source] += 1
                     fallback_successes += 1
                     logger.info(f"FALLBACK SUCCESS: Added {question_type} question for {topic} ({fallback_successes} success{'es' if fallback_successes != 1 else ''})")
@@ -156,7 +399,7 @@ class FinalWorkingPSLEMathPaperGenerator:
                     break
 
         # Final top-up: Keep generating until we reach total_questions (best-effort)
-        if len(all_questions) < total_questions:
+        if len(all_questions) < total_questions and budget.allows(TOP_UP):
             remaining = total_questions - len(all_questions)
             logger.info(
                 f"Topping up remaining questions: need {remaining} more..."
@@ -169,25 +412,33 @@ class FinalWorkingPSLEMathPaperGenerator:
             max_consecutive_failures = 15  # Reduced from 20 to 15 - stop sooner
             
             while len(all_questions) < total_questions and attempts < max_attempts and consecutive_failures < max_consecutive_failures:
+                if not budget.allows(TOP_UP):
+                    logger.info("Top-up: time budget spent, stopping")
+                    break
                 topic, question_type = random.choice(pool)
-                existing_contexts = self._extract_contexts_from_questions(all_questions)
-                question = self.generator.generate_question(topic, question_type, used_contexts=existing_contexts)
+                existing_contexts = context_tracker.contexts
+                question = self.generator.generate_question(topic, question_type, used_contexts=existing_contexts,
+                                                            budget=budget)
                 if question:
                     all_questions.append(question)
+                    context_tracker.add(question)
                     question_sources[question.source] += 1
                     consecutive_failures = 0  # Reset on success
                 else:
                     consecutive_failures += 1
                 attempts += 1
                 
-                # If too many consecutive failures, try different question types
-                if consecutive_failures >= 8:  # Reduced from 10 to 8
+                # If too many consecutive failures, try different question types (sooner for
+                # topics that rarely yield this type)
+                if consecutive_failures >= self.generator.retry_policy.type_switch_after(topic, question_type):
                     logger.info(f"Many consecutive failures ({consecutive_failures}), trying alternative question type...")
                     # Try switching question type
                     alt_question_type = "Open-ended" if question_type == "MCQ" else "MCQ"
-                    question = self.generator.generate_question(topic, alt_question_type, used_contexts=existing_contexts)
+                    question = self.generator.generate_question(topic, alt_question_type, used_contexts=existing_contexts,
+                                                                budget=budget)
                     if question:
                         all_questions.append(question)
+                        context_tracker.add(question)
                         question_sources[question.source] += 1
                         consecutive_failures = 0
                     else:
@@ -207,6 +458,9 @@ class FinalWorkingPSLEMathPaperGenerator:
         ordered_questions = mcq_questions + non_mcq_questions
         
         logger.info(f"Generated practice paper with {len(ordered_questions)} questions")
+        budget_report = budget.report()
+        if budget_report["degradations"]:
+            logger.warning(f"Paper generation degraded to meet its time budget: {budget_report}")
         
         # Create paper data
         paper_data = {
@@ -215,18 +469,97 @@ class FinalWorkingPSLEMathPaperGenerator:
             "total_questions": len(ordered_questions),
             "topics_covered": list(topics_distribution.keys()),
             "question_sources": question_sources,
+            "generation_budget": budget_report,
             "generated_at": datetime.now().isoformat()
         }
         
         return paper_data
     
+    # How often one plan slot may be sent back after clashing with a question accepted
+    # while it was being generated
+    MAX_SLOT_REQUEUES = 2
+
+    def _generate_planned_questions_concurrently(self, paper_plan: List[tuple], budget: GenerationBudget) -> tuple:
+        """Generate the planned questions on a bounded thread pool sharing the caller's session.
+
+        A worker only sees the contexts accepted before its slot was submitted, so each
+        result is reconciled when it comes back: exact duplicates, and generated questions
+        whose context clashes with one accepted in the meantime, send just that slot back
+        to the pool. Returns (questions in plan order, failed (topic, type) slots).
+        """
+        session = self.generator.session
+        total = len(paper_plan)
+        accepted: List[Question] = []
+        context_tracker = ContextTracker()
+        # Contexts of each accepted question, in acceptance order
+        accepted_contexts: List[frozenset] = []
+        accepted_texts = set()
+        results: Dict[int, Question] = {}
+        failed_topics = []
+        requeues: Dict[int, int] = {}
+        slots = deque(range(total))
+        pending = {}
+
+        def run(topic: str, question_type: str, used_contexts: set) -> Optional[Question]:
+            with self.generator.use_session(session):
+                return self.generator.generate_question(topic, question_type, used_contexts=used_contexts,
+                                                        budget=budget)
+
+        with ThreadPoolExecutor(max_workers=self.generation_concurrency,
+                                thread_name_prefix="question-worker") as executor:
+            while slots or pending:
+                while slots and len(pending) < self.generation_concurrency:
+                    index = slots.popleft()
+                    topic, question_type = paper_plan[index]
+                    logger.info(f"Generating {question_type} question {index + 1}/{total} for topic: {topic}")
+                    future = executor.submit(run, topic, question_type, context_tracker.contexts)
+                    pending[future] = (index, len(accepted))
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, seen_count = pending.pop(future)
+                    topic, question_type = paper_plan[index]
+                    try:
+                        question = future.result()
+                    except Exception as e:
+                        logger.error(f"Question {index + 1} generation error: {e}")
+                        question = None
+                    if not question:
+                        logger.warning(f"Failed to generate {question_type} question for {topic}")
+                        failed_topics.append((topic, question_type))
+                        continue
+
+                    normalized_text = ' '.join(question.question.lower().split())
+                    if normalized_text in accepted_texts:
+                        collision = "duplicate"
+                    elif question.source != "Original" and not self._check_context_diversity(
+                            question, union_contexts(accepted_contexts[seen_count:])):
+                        collision = "repeated context"
+                    else:
+                        collision = None
+
+                    if collision:
+                        if requeues.get(index, 0) < self.MAX_SLOT_REQUEUES:
+                            requeues[index] = requeues.get(index, 0) + 1
+                            logger.info(f"Question {index + 1} clashed with a concurrent question ({collision}); re-queueing")
+                            slots.append(index)
+                            continue
+                        if collision == "duplicate":
+                            failed_topics.append((topic, question_type))
+                            continue
+                        # Out of retries: keep it, the sequential path is just as lenient
+
+                    accepted.append(question)
+                    accepted_contexts.append(frozenset(context_tracker.add(question)))
+                    accepted_texts.add(normalized_text)
+                    results[index] = question
+                    logger.info(f"SUCCESS: Added {question_type} question for {topic} (Source: {question.source})")
+
+        return [results[index] for index in sorted(results)], failed_topics
+
     def _get_available_topics(self) -> List[str]:
         """Get list of available topics"""
-        topics = set()
-        for q in self.questions_data:
-            if 'topic' in q:
-                topics.add(q['topic'])
-        return sorted(list(topics))
+        return list(self.question_bank.topics)
     
     def _map_topics_to_available(self, desired_topics: Dict[str, int]) -> Dict[str, int]:
         """Map desired topics to available topics in the data"""
@@ -307,208 +640,113 @@ class FinalWorkingPSLEMathPaperGenerator:
         
         return question_plan
     
-    def _extract_contexts_from_questions(self, questions: List[Question]) -> set:
-        """Extract key objects/contexts from generated questions to track diversity"""
-        contexts = set()
-        import re
-        
-        # Common objects/scenarios to track - expanded list including art-related terms
-        context_patterns = [
-            # Containers/liquids
-            r'\b(?:water\s+)?tank[s]?\b',
-            r'\b(?:cylindrical\s+)?tank[s]?\b',
-            r'\bcontainer[s]?\b',
-            r'\b(?:swimming\s+)?pool[s]?\b',
-            # Art-related (important to catch these!)
-            r'\b(?:school\s+)?art\s+project[s]?\b',
-            r'\bcommunity\s+art\s+project[s]?\b',
-            r'\b(?:school\s+)?mural[s]?\b',
-            r'\bcommunity\s+mural[s]?\b',
-            r'\bgeometric\s+pattern[s]?\b',
-            r'\bart\s+club\b',
-            r'\bart\s+room[s]?\b',
-            # Spaces
-            r'\b(?:rectangular\s+)?garden[s]?\b',
-            r'\b(?:square\s+)?field[s]?\b',
-            r'\b(?:rectangular\s+)?field[s]?\b',
-            r'\b(?:rectangular\s+)?room[s]?\b',
-            r'\b(?:rectangular\s+)?park[s]?\b',
-            r'\b(?:rectangular\s+)?hall[s]?\b',
-            r'\b(?:rectangular\s+)?playground[s]?\b',
-            r'\b(?:rectangular\s+)?banner[s]?\b',
-            r'\b(?:rectangular\s+)?plot[s]?\b',
-            r'\b(?:rectangular\s+)?lawn[s]?\b',
-            r'\bcarpet[s]?\b',
-            r'\bpond[s]?\b',
-            r'\bfountain[s]?\b',
-        ]
-        
-        for q in questions:
-            if not q or not q.question:
-                continue
-            q_text = q.question.lower()
-            for pattern in context_patterns:
-                matches = re.findall(pattern, q_text)
-                for match in matches:
-                    # Normalize the match (remove extra spaces, standardize)
-                    normalized = ' '.join(match.strip().split())
-                    contexts.add(normalized)
-        
-        return contexts
-    
     def _check_context_diversity(self, question: Question, used_contexts: set) -> bool:
         """Check if question uses contexts that are too similar to already used ones"""
-        if not question or not question.question or not used_contexts:
-            return True  # Allow if no context to check against
-        
-        import re
-        q_text = question.question.lower()
-        
-        # Check for art-related terms specifically (strict check)
-        art_patterns = [
-            r'\b(?:school\s+)?art\s+project',
-            r'\bcommunity\s+art\s+project',
-            r'\b(?:school\s+)?mural',
-            r'\bcommunity\s+mural',
-            r'\bgeometric\s+pattern',
-            r'\bart\s+club',
-            r'\bart\s+room',
-        ]
-        
-        # Check if this question contains art-related terms
-        has_art_context = any(re.search(pattern, q_text) for pattern in art_patterns)
-        
-        # If it has art context and we've already used art contexts, reject it
-        # But be lenient - only reject if we've used art contexts multiple times (2+)
-        if has_art_context:
-            art_keywords_in_used = [
-                ctx for ctx in used_contexts
-                if 'art' in ctx or 'mural' in ctx or 'pattern' in ctx
-            ]
-            if len(art_keywords_in_used) >= 2:  # Only reject if 2+ art contexts already used
-                logger.debug(f"Rejecting question due to repeated art context (already have {len(art_keywords_in_used)} art contexts): {question.question[:100]}...")
-                return False
-        
-        # Check for other repeated contexts
-        for context in used_contexts:
-            # Create a pattern to check if the context appears in the question
-            # Make it more lenient - only reject if it's the main context
-            if len(context.split()) <= 2:  # Single words or short phrases
-                pattern = r'\b' + re.escape(context.lower()) + r'\b'
-                if re.search(pattern, q_text):
-                    # Check if this is a significant match (not just a word in a longer phrase)
-                    logger.debug(f"Rejecting question due to repeated context '{context}': {question.question[:100]}...")
-                    return False
-        
+        if not question or not question.question:
+            return True
+        reason = repeated_context(question.question, used_contexts)
+        if reason:
+            logger.debug(f"Rejecting question due to {reason}: {question.question[:100]}...")
+            return False
         return True
 
 class QuestionGenerator:
     """Enhanced question generator with improved variations"""
     
-    def __init__(self, questions_data: List[Dict], lm_client: LMStudioClient, validator: 'QuestionValidator'):
+    def __init__(self, questions_data: List[Dict], lm_client: LMStudioClient, validator: 'QuestionValidator',
+                 async_lm_client: Optional[AsyncLMStudioClient] = None, stream_json: bool = False,
+                 inventory: Optional[QuestionInventory] = None, question_bank: Optional[QuestionBank] = None,
+                 structured_output: bool = False, retry_policy: Optional[RetryPolicy] = None):
         self.questions_data = questions_data
+        self.question_bank = question_bank or QuestionBank(questions_data)
         self.lm_client = lm_client
+        self.async_lm_client = async_lm_client
+        self.inventory = inventory
+        # Stream generation requests and hang up once the question JSON is complete
+        self.stream_json = stream_json
+        # Ask for schema-constrained JSON; models that reject it are remembered by the client
+        self.structured_output = structured_output
         self.validator = validator
-        self._used_question_ids = set()
-        # Track recently used character names to avoid repetition across questions
+        # Which generation stages are worth their LM calls, per topic and question type
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Shared, stateless clean-up pipeline for generated stems
+        self.stem_normalizer = StemNormalizer()
+        # Per-paper state is resolved through the session active on the calling thread;
+        # callers that never open a session (scripts, tests) share this default one.
+        self._default_session = GenerationSession()
+        self._local = threading.local()
+
+    @contextmanager
+    def use_session(self, session: GenerationSession):
+        """Make `session` the active per-paper state for the current thread"""
+        previous = getattr(self._local, "session", None)
+        self._local.session = session
         try:
-            from collections import deque
-            self._recent_names = deque(maxlen=16)
-            # Track existential openings usage (There is/are/was/were) to limit frequency
-            self._recent_existential = deque(maxlen=20)
-            # Track opening patterns for variety (person names, numbers, actions, questions, etc.)
-            self._recent_opening_patterns = deque(maxlen=30)
-        except Exception:
-            self._recent_names = None
-            self._recent_existential = None
-            self._recent_opening_patterns = None
+            yield session
+        finally:
+            self._local.session = previous
+
+    @property
+    def session(self) -> GenerationSession:
+        return getattr(self._local, "session", None) or self._default_session
+
+    @property
+    def _used_question_ids(self) -> set:
+        return self.session.used_question_ids
+
+    @property
+    def _recent_names(self) -> deque:
+        return self.session.recent_names
+
+    @property
+    def _recent_existential(self) -> deque:
+        return self.session.recent_existential
+
+    @property
+    def _recent_opening_patterns(self) -> deque:
+        return self.session.recent_opening_patterns
+
+    def _track_opening_pattern(self, text: str) -> None:
+        """Record the opening pattern of an accepted stem for variety tracking"""
+        self._recent_opening_patterns.append(self.stem_normalizer.classify_opening(text))
     
     def _check_context_diversity(self, question: Question, used_contexts: set) -> bool:
         """Check if question uses contexts that are too similar to already used ones"""
-        if not question or not question.question or not used_contexts:
-            return True  # Allow if no context to check against
-        
-        import re
-        q_text = question.question.lower()
-        
-        # Check for art-related terms specifically (strict check)
-        art_patterns = [
-            r'\b(?:school\s+)?art\s+project',
-            r'\bcommunity\s+art\s+project',
-            r'\b(?:school\s+)?mural',
-            r'\bcommunity\s+mural',
-            r'\bgeometric\s+pattern',
-            r'\bart\s+club',
-            r'\bart\s+room',
-        ]
-        
-        # Check if this question contains art-related terms
-        has_art_context = any(re.search(pattern, q_text) for pattern in art_patterns)
-        
-        # If it has art context and we've already used art contexts, reject it
-        # But be lenient - only reject if we've used art contexts multiple times (2+)
-        if has_art_context:
-            art_keywords_in_used = [
-                ctx for ctx in used_contexts
-                if 'art' in ctx or 'mural' in ctx or 'pattern' in ctx
-            ]
-            if len(art_keywords_in_used) >= 2:  # Only reject if 2+ art contexts already used
-                logger.debug(f"Rejecting question due to repeated art context (already have {len(art_keywords_in_used)} art contexts): {question.question[:100]}...")
-                return False
-        
-        # Check for other repeated contexts
-        for context in used_contexts:
-            # Create a pattern to check if the context appears in the question
-            # Make it more lenient - only reject if it's the main context
-            if len(context.split()) <= 2:  # Single words or short phrases
-                pattern = r'\b' + re.escape(context.lower()) + r'\b'
-                if re.search(pattern, q_text):
-                    # Check if this is a significant match (not just a word in a longer phrase)
-                    logger.debug(f"Rejecting question due to repeated context '{context}': {question.question[:100]}...")
-                    return False
-        
+        if not question or not question.question:
+            return True
+        reason = repeated_context(question.question, used_contexts)
+        if reason:
+            logger.debug(f"Rejecting question due to {reason}: {question.question[:100]}...")
+            return False
         return True
     
     def get_sample_questions_by_topic(self, topic: str, count: int = 4) -> List[Dict]:
         """Get sample questions for a specific topic with graceful fallbacks for similar topics."""
-        required_fields = ['question', 'options', 'correct_answer_index', 'correct_answer_text', 'topic']
-        topic_questions = [
-            q for q in self.questions_data 
-            if q.get('topic') == topic and all(field in q for field in required_fields)
-        ]
-        if not topic_questions:
-            # Fallback 1: substring/similarity match on topic words
-            t_words = [w for w in re.split(r"[^a-zA-Z]+", topic.lower()) if w]
-            def similar_topic(qt: str) -> bool:
-                qt_l = (qt or '').lower()
-                return any(w in qt_l for w in t_words)
-            topic_questions = [
-                q for q in self.questions_data
-                if similar_topic(q.get('topic', '')) and all(field in q for field in required_fields)
-            ]
-        return random.sample(topic_questions, min(count, len(topic_questions)))
+        return self.question_bank.sample_questions(topic, count)
     
     def _sample_original_question(self, topic: str, question_type: str) -> Optional[Question]:
-        """Sample a validated question directly from the curated dataset to ensure correctness."""
-        candidates = []
-        for data in self.questions_data:
-            if data.get('topic') != topic:
-                continue
-            has_options = bool(data.get('options'))
-            if question_type == "MCQ" and not has_options:
-                continue
-            if question_type != "MCQ" and has_options:
-                continue
-            q_id = data.get('id')
-            if q_id in self._used_question_ids:
-                continue
-            candidates.append(data)
-        
-        if not candidates:
-            return None
-        
-        random.shuffle(candidates)
-        for data in candidates:
+        """Sample a validated question directly from the curated dataset to ensure correctness.
+
+        With a tutor's history on the session, questions from their earlier papers are skipped;
+        once none of the bucket is left the tutor starts a new cycle through it.
+        """
+        exposure = self.session.exposure
+        question_obj = None
+        if exposure is not None:
+            question_obj = self._sample_unused_original(topic, question_type, exclude=exposure.seen)
+            bucket = self.question_bank.originals(topic, question_type)
+            if question_obj is None and any(exposure.seen(data) for data in bucket):
+                logger.info(f"Tutor {exposure.tutor_id} has seen every {question_type} original for {topic}, starting over")
+                with self.session.lock:
+                    # Questions already in this paper stay marked for the new cycle
+                    exposure.reset(data for data in bucket if data.get('id') not in self._used_question_ids)
+        if question_obj is None:
+            question_obj = self._sample_unused_original(topic, question_type)
+        return question_obj
+
+    def _sample_unused_original(self, topic: str, question_type: str,
+                                exclude: Optional[Callable[[Dict], bool]] = None) -> Optional[Question]:
+        for data in self.question_bank.iter_unused(topic, question_type, self._used_question_ids, exclude):
             q_id = data.get('id')
             options = [str(opt) for opt in (data.get('options') or [])]
             correct_index = data.get('correct_answer_index', -1)
@@ -542,13 +780,46 @@ class QuestionGenerator:
             if not self.validator.validate_question(question_obj):
                 continue
             
-            self._used_question_ids.add(q_id)
+            # Reserve the id atomically: other workers on the same paper sample concurrently
+            with self.session.lock:
+                if q_id in self._used_question_ids:
+                    continue
+                self._used_question_ids.add(q_id)
+                if self.session.exposure is not None:
+                    self.session.exposure.mark(data)
             return question_obj
         
         return None
     
-    def generate_question(self, topic: str, question_type: str = "MCQ", difficulty: str = "Medium", used_contexts: Optional[set] = None) -> Optional[Question]:
-        """Generate a high-quality question with validation and retry"""
+    def _take_stocked_question(self, topic: str, question_type: str, used_contexts: Optional[set] = None) -> Optional[Question]:
+        """Draw a pre-generated question from the inventory, respecting the paper's context diversity"""
+        session = self.session
+
+        def accept(payload: Dict, _contexts: List[str]) -> bool:
+            if payload.get("id") in session.used_question_ids:
+                return False
+            return self._check_context_diversity(Question(**payload), used_contexts or set())
+
+        try:
+            payload = self.inventory.take(topic, question_type, accept=accept)
+        except sqlite3.Error as e:
+            logger.warning(f"Question inventory unavailable: {e}")
+            return None
+        if not payload:
+            return None
+        with session.lock:
+            session.used_question_ids.add(payload["id"])
+        logger.info(f"Using stocked {question_type} question for {topic}")
+        return Question(**payload)
+    
+    def generate_question(self, topic: str, question_type: str = "MCQ", difficulty: str = "Medium", used_contexts: Optional[set] = None,
+                          use_originals: bool = True, use_inventory: bool = True,
+                          budget: Optional[GenerationBudget] = None) -> Optional[Question]:
+        """Generate a high-quality question with validation and retry
+
+        With a `budget`, the quality nudge, the AI review and finally LM generation itself are
+        skipped as the paper's deadline approaches, leaving originals and local variations.
+        """
         sample_questions = self.get_sample_questions_by_topic(topic, 4)
         
         if not sample_questions:
@@ -556,474 +827,49 @@ class QuestionGenerator:
             return None
         
         # Prefer curated originals whenever available to guarantee correctness
-        original_question = self._sample_original_question(topic, question_type)
-        if original_question:
-            return original_question
-        
+        if use_originals:
+            original_question = self._sample_original_question(topic, question_type)
+            if original_question:
+                return original_question
+        
+        # Next, questions the inventory builder already generated and validated
+        if use_inventory and self.inventory is not None:
+            stocked_question = self._take_stocked_question(topic, question_type, used_contexts)
+            if stocked_question:
+                return stocked_question
+        
+        plan = self.retry_policy.plan(topic, question_type, budget.remaining if budget else math.inf)
+        with self.retry_policy.outcomes(topic, question_type).tracking() as outcomes:
+            return self._generate_new_question(sample_questions, topic, question_type, difficulty, used_contexts,
+                                               budget, plan, outcomes)
+
+    def _generate_new_question(self, sample_questions: List[Dict], topic: str, question_type: str, difficulty: str,
+                               used_contexts: Optional[set], budget: Optional[GenerationBudget],
+                               plan: RetryPlan, outcomes: StageOutcomes) -> Optional[Question]:
+        """LM generation (with a quality nudge) and local variations, retried as `plan` allows"""
         # Try multiple times to get a high-quality question
-        # Further reduced attempts to speed up runtime; rely on better prompts/templates
-        max_attempts = 2
+        max_attempts = plan.max_attempts
         max_context_rejections = 4  # Allow up to 4 context diversity rejections before being lenient
         context_rejection_count = 0
         best_question = None
         best_score = 0
         
-        # Track and avoid overuse of location-leading openings like "In a ..."
-        def _starts_with_location_opener(text: str) -> bool:
-            try:
-                import re
-                return bool(re.match(r"^\s*(in|at|on)\s+(a|an|the)\s+\w", (text or "").strip(), flags=re.IGNORECASE))
-            except Exception:
-                return False
-
-        def _rewrite_away_from_location_opener(text: str) -> str:
-            """Heuristic rewrite: move leading location prepositional phrase later.
-            Example: "In a park, Sarah planted trees." -> "Sarah planted trees in a park."""
-            try:
-                import re
-                s = (text or "").strip()
-                # Pattern capturing: In a/the/an <place>, <rest>
-                m = re.match(r"^\s*(in|at|on)\s+(a|an|the)\s+([^,]+),\s*(.+)$", s, flags=re.IGNORECASE)
-                if m:
-                    prep, art, place, rest = m.groups()
-                    # Clean up rest - remove trailing fragments like ". are" or ". is"
-                    rest = re.sub(r"\.\s+(are|is|was|were)\s*$", "", rest.strip(), flags=re.IGNORECASE)
-                    # Ensure proper ending punctuation
-                    if not rest.endswith(('.', '!', '?')):
-                        rest = rest.rstrip('.')
-                    return f"{rest} {prep.lower()} {art.lower()} {place}."
-                # Another pattern: "In a <place> <subject> ..." (no comma)
-                m2 = re.match(r"^\s*(in|at|on)\s+(a|an|the)\s+([^,]+)\s+(.*)$", s, flags=re.IGNORECASE)
-                if m2:
-                    prep, art, place, rest = m2.groups()
-                    # Clean up rest
-                    rest = re.sub(r"\.\s+(are|is|was|were)\s*$", "", rest.strip(), flags=re.IGNORECASE)
-                    if not rest.endswith(('.', '!', '?')):
-                        rest = rest.rstrip('.')
-                    return f"{rest} {prep.lower()} {art.lower()} {place}."
-                return text
-            except Exception:
-                return text
-
-        def _polish_question_opening(text: str) -> str:
-            """Polish the beginning of a question: ensure capitalization and reduce repetitive 'The ...' starts.
-            Heuristics only; aim to avoid harming content.
-            """
-            try:
-                import re
-                s = (text or "").strip()
-                if not s:
-                    return text
-                # Ensure first letter uppercase without altering acronyms/numbers
-                if re.match(r"^[a-z]", s):
-                    s = s[0].upper() + s[1:]
-
-                # Replace leading 'the ' with 'The '
-                s = re.sub(r"^\s*the\s+", "The ", s)
-
-                # If starts with 'The ' followed by a generic noun, swap to 'A/An '
-                generic_nouns = (
-                    "park", "garden", "hall", "room", "field", "playground", "banner", "plot", "lawn", "carpet",
-                    "pond", "fountain", "container", "tank", "box", "crate", "pool", "building", "area",
-                    "number", "amount", "ratio", "sum", "difference", "product", "average", "volume", "perimeter",
-                    "area", "length", "mass", "time", "distance", "speed", "rate", "student", "students",
-                    "teacher", "shop", "store"
-                )
-                m = re.match(r"^The\s+([A-Za-z]+)(\b.*)$", s)
-                if m:
-                    noun = m.group(1)
-                    rest = m.group(2)
-                    if noun.lower() in generic_nouns:
-                        article = "An" if noun[0].lower() in "aeiou" else "A"
-                        s = f"{article} {noun}{rest}"
-
-                # Normalize spaces before punctuation
-                s = re.sub(r"\s+([,.;!?])", r"\1", s)
-                return s
-            except Exception:
-                return text
-
-        def _diversify_names(text: str) -> str:
-            """Replace overused default names with diverse alternatives, avoiding recent repeats."""
-            try:
-                import re, random
-                s = (text or "")
-                if not s:
-                    return text
-                # Pool of diverse given names (gender-balanced, culturally varied)
-                name_pool = [
-                    "Aisha", "Hiro", "Priya", "Diego", "Liam", "Noah", "Emma", "Olivia", "Mia", "Zoe",
-                    "Lucas", "Mateo", "Sofia", "Aria", "Isla", "Ethan", "Ava", "Nora", "Leo", "Ivy",
-                    "Amir", "Yuna", "Jia", "Wei", "Hana", "Kai", "Maya", "Ravi", "Fatima", "Omar",
-                    "Elena", "Camila", "Jonas", "Greta", "Silas", "Anya", "Nikolai", "Layla", "Youssef", "Sora"
-                ]
-                # Overused/common defaults to swap away from
-                stale_names = [
-                    "Sarah", "David", "John", "Mary", "Peter", "Jane", "Tom", "James", "Emma", "Michael"
-                ]
-                # Build exclusion set from recent names already used and names already present in the text
-                recent = set(self._recent_names or [])
-                present = set(re.findall(r"\b[A-Z][a-z]+\b", s))
-                # Replacement function that picks a name not in recent or present
-                def pick_name() -> str:
-                    candidates = [n for n in name_pool if n not in recent and n not in present]
-                    if not candidates:
-                        candidates = [n for n in name_pool if n not in recent]
-                    return random.choice(candidates) if candidates else random.choice(name_pool)
-                # Replace each stale name separately to possibly get different replacements
-                for old in stale_names:
-                    pattern = r"\b" + re.escape(old) + r"\b"
-                    if re.search(pattern, s):
-                        new_name = pick_name()
-                        s = re.sub(pattern, new_name, s)
-                        try:
-                            if self._recent_names is not None:
-                                self._recent_names.append(new_name)
-                        except Exception:
-                            pass
-                return s
-            except Exception:
-                return text
-
-        def _clean_trailing_fragments(text: str) -> str:
-            """Remove trailing fragments like location phrases or verbs that appear after the question ends."""
-            try:
-                import re
-                s = (text or "").strip()
-                if not s:
-                    return text
-                
-                # CRITICAL FIX: Remove trailing fragments AFTER question mark or period
-                # Pattern: "? are" or "? are " or "? are." -> "?"
-                # Must be more aggressive to catch fragments that slip through
-                s = re.sub(r"([?!\.])\s*(are|is|was|were|have|has|had|do|does|did)\s*\.?\s*$", r"\1", s, flags=re.IGNORECASE)
-                
-                # Remove location phrases that come after question mark or period
-                # Examples: "? in a playground." -> "?"
-                #           ". in a bakery. were" -> "."
-                s = re.sub(r"([?!\.])\s+(in|at|on)\s+(a|an|the)\s+[^.!?]+\s*\.?\s*(are|is|was|were|have|has|had|do|does|did)?\s*$", r"\1", s, flags=re.IGNORECASE)
-                
-                # Remove trailing fragments: period followed by common verbs
-                s = re.sub(r"\.\s+(are|is|was|were|have|has|had|do|does|did)\s*$", ".", s, flags=re.IGNORECASE)
-                
-                # Remove trailing standalone words like "are" or "were" without period (after any whitespace)
-                s = re.sub(r"\s+(are|is|was|were|have|has|had|do|does|did)\s*$", "", s, flags=re.IGNORECASE)
-                
-                # Remove location phrases at the very end (after any punctuation)
-                # Pattern: ". in a location" or "? in a location" or just " in a location"
-                s = re.sub(r"([?!\.])\s+(in|at|on)\s+(a|an|the)\s+\w+[^.!?]*\.?\s*$", r"\1", s, flags=re.IGNORECASE)
-                
-                # More aggressive: if we have question mark, keep only up to and including it
-                q_match = re.search(r"([?!])", s)
-                if q_match:
-                    # Keep everything up to and including the last question mark or exclamation
-                    last_punct = max(s.rfind('?'), s.rfind('!'))
-                    if last_punct >= 0:
-                        # Check if there's trailing junk after the punctuation
-                        after_punct = s[last_punct+1:].strip()
-                        # If after punctuation is just location phrases or fragments, remove it
-                        if re.match(r"^(in|at|on)\s+(a|an|the)\s+", after_punct, flags=re.IGNORECASE):
-                            s = s[:last_punct+1]
-                        elif re.match(r"^(are|is|was|were|have|has|had|do|does|did)\s*\.?\s*$", after_punct, flags=re.IGNORECASE):
-                            s = s[:last_punct+1]
-                        elif after_punct and '.' in after_punct:
-                            # If there's a period after, it might be a location phrase
-                            parts = after_punct.split('.')
-                            if len(parts) > 1 and re.match(r"^\s*(in|at|on)\s+(a|an|the)\s+", parts[0], flags=re.IGNORECASE):
-                                s = s[:last_punct+1]
-                
-                # Clean up any remaining trailing period fragments
-                s = re.sub(r"\.\s*\.\s*$", ".", s)  # Multiple periods
-                s = re.sub(r"\?\s*\.\s*$", "?", s)  # Question mark followed by period
-                
-                # CRITICAL: If question ends with ?, aggressively remove anything after it
-                if '?' in s:
-                    last_q = s.rfind('?')
-                    if last_q >= 0:
-                        # ALWAYS remove everything after the last question mark if it's just fragments
-                        after_q = s[last_q+1:].strip()
-                        # If there's ANY text after ?, check if it's just fragments
-                        if after_q:
-                            # Check if it's just common fragment words (with or without punctuation)
-                            fragment_pattern = r'^(are|is|was|were|have|has|had|do|does|did)\s*\.?\s*$'
-                            if re.match(fragment_pattern, after_q, flags=re.IGNORECASE):
-                                s = s[:last_q+1]
-                            # If it starts with fragment word followed by anything, still remove it
-                            elif re.match(r'^(are|is|was|were)\s+', after_q, flags=re.IGNORECASE):
-                                s = s[:last_q+1]
-                        # If after ? is empty or just whitespace, that's fine
-                
-                # Final aggressive cleanup - remove any trailing fragments after ANY punctuation
-                # This catches cases where fragments might have slipped through
-                s = re.sub(r"([?!\.])\s*(are|is|was|were|have|has|had|do|does|did)\s*\.?\s*$", r"\1", s, flags=re.IGNORECASE)
-                s = re.sub(r"\s+(are|is|was|were|have|has|had|do|does|did)\s*$", "", s, flags=re.IGNORECASE)
-                
-                # Remove duplicate instructions (e.g., "to 1 decimal place. to 2 decimal places")
-                s = re.sub(r'to\s+(\d+)\s+decimal\s+place(?:s)?\.\s*to\s+(\d+)\s+decimal\s+place(?:s)?', r'to \2 decimal places', s, flags=re.IGNORECASE)
-                s = re.sub(r'correct\s+to\s+(\d+)\s+decimal\s+place(?:s)?\.\s*to\s+(\d+)\s+decimal\s+place(?:s)?', r'correct to \2 decimal places', s, flags=re.IGNORECASE)
-                
-                # Remove trailing instruction fragments after decimal place instructions
-                # Pattern: "...decimal place. with cash or measurements." -> "...decimal place."
-                s = re.sub(r'(decimal\s+place(?:s)?)\.\s+(with|or|and|using|in|for)\s+[^.!?]+\s*\.?$', r'\1.', s, flags=re.IGNORECASE)
-                
-                # Remove common trailing instruction fragments
-                # Pattern: "...? with cash or measurements."
-                trailing_patterns = [
-                    r'\s+with\s+(cash|measurements|money|units)\s+or\s+[^.!?]+\s*\.?$',
-                    r'\s+(with|or|and|using)\s+(cash|measurements|money|units)\s*\.?$',
-                ]
-                for pattern in trailing_patterns:
-                    s = re.sub(pattern, '', s, flags=re.IGNORECASE)
-                
-                return s.strip()
-            except Exception:
-                return text
-        
-        def _detect_incomplete_fractions(text: str) -> bool:
-            """Detect incomplete fractions like '3/' or '3/ of' that make questions unsolvable."""
-            try:
-                import re
-                # Pattern: digit followed by / but no digit after (or just whitespace/end)
-                # Examples: "3/", "3/ ", "3/ of", "3/ of the"
-                if re.search(r'\d+\s*/\s*(?=\s|of|$|[^0-9])', text, flags=re.IGNORECASE):
-                    return True
-                # Also check for fractions at word boundaries like "3/of" or "3/ " followed by non-digit
-                if re.search(r'\b\d+\s*/\s+(?!\d)', text, flags=re.IGNORECASE):
-                    # But allow if followed by a word that might be part of fraction notation
-                    # Actually, if it's "/ of" or "/ " and no number, it's incomplete
-                    match = re.search(r'\d+\s*/\s+', text, flags=re.IGNORECASE)
-                    if match:
-                        after_slash = text[match.end():].strip()
-                        # If next character is not a digit, it's likely incomplete
-                        if after_slash and not re.match(r'^\d', after_slash):
-                            # Exception: "3/4" is complete, but "3/ of" is not
-                            if re.match(r'^(of|the|a|an)\s', after_slash, flags=re.IGNORECASE):
-                                return True
-                return False
-            except Exception:
-                return False
-
-        def _replace_placeholder_names(text: str) -> str:
-            """Replace placeholders like [Name] (case-insensitive) with a single chosen name per question."""
-            try:
-                import re, random
-                s = (text or "")
-                if not s:
-                    return text
-                # Detect placeholder occurrences
-                placeholders = re.findall(r"\[(?:name|Name|NAME)\]", s)
-                if not placeholders:
-                    return text
-                # Use the same name for all placeholders in this question
-                name_pool = [
-                    "Aisha", "Hiro", "Priya", "Diego", "Liam", "Noah", "Emma", "Olivia", "Mia", "Zoe",
-                    "Lucas", "Mateo", "Sofia", "Aria", "Isla", "Ethan", "Ava", "Nora", "Leo", "Ivy",
-                    "Amir", "Yuna", "Jia", "Wei", "Hana", "Kai", "Maya", "Ravi", "Fatima", "Omar",
-                    "Elena", "Camila", "Jonas", "Greta", "Silas", "Anya", "Nikolai", "Layla", "Youssef", "Sora"
-                ]
-                recent = set(self._recent_names or [])
-                present = set(re.findall(r"\b[A-Z][a-z]+\b", s))
-                candidates = [n for n in name_pool if n not in recent and n not in present]
-                if not candidates:
-                    candidates = [n for n in name_pool if n not in recent]
-                chosen = random.choice(candidates) if candidates else random.choice(name_pool)
-                s = re.sub(r"\[(?:name|Name|NAME)\]", chosen, s)
-                try:
-                    if self._recent_names is not None:
-                        self._recent_names.append(chosen)
-                except Exception:
-                    pass
-                return s
-            except Exception:
-                return text
-
-        def _rewrite_existential_opening(text: str) -> str:
-            """Rewrite openings like 'There is/are/was/were ...' to subject-first.
-            Examples:
-              There are 24 apples in a box. -> 24 apples are in a box.
-              There is a tank that holds 80 L. -> A tank holds 80 L.
-            """
-            try:
-                import re
-                s = (text or "").strip()
-                if not s:
-                    return text
-                m = re.match(r"^There\s+(is|are|was|were)\s+(.+)$", s, flags=re.IGNORECASE)
-                if not m:
-                    return text
-                verb = m.group(1).lower()
-                rest = (m.group(2) or "").strip()
-                if not rest:
-                    return text
-
-                # Normalize sentence fragments for recombination
-                rest = rest.rstrip()
-                rest_no_trailing = rest.rstrip(".!?")
-
-                # Prepare subject/detail split
-                subject_phrase = rest_no_trailing
-                detail_phrase = ""
-
-                # Case 1: relative clause "that/which"
-                rel_match = re.match(r"^([^.?,;]+?)\s+(that|which)\s+(.*)$", rest_no_trailing, flags=re.IGNORECASE)
-                if rel_match:
-                    subject_phrase = rel_match.group(1).strip()
-                    detail_phrase = rel_match.group(3).strip()
-                else:
-                    # Case 2: prepositional phrase following the noun phrase
-                    prep_match = re.match(r"^([^.?,;]+?)(\s+(?:in|at|on|with|within|inside|outside|by|for|from|over|under|near|beside|among)\b.*)$", rest_no_trailing, flags=re.IGNORECASE)
-                    if prep_match:
-                        subject_phrase = prep_match.group(1).strip()
-                        detail_phrase = prep_match.group(2).strip()
-
-                # Capitalize subject appropriately (unless it starts with a number)
-                if subject_phrase and subject_phrase[0].isalpha():
-                    subject_phrase = subject_phrase[0].upper() + subject_phrase[1:]
-
-                verb_map = {"is": "is", "are": "are", "was": "was", "were": "were"}
-                new_verb = verb_map.get(verb, verb)
-
-                if rel_match:
-                    # Detail already contains a verb (e.g., "holds 80 L") - drop the copula
-                    sentence = f"{subject_phrase} {detail_phrase}"
-                elif detail_phrase:
-                    sentence = f"{subject_phrase} {new_verb} {detail_phrase}"
-                else:
-                    sentence = f"{subject_phrase} {new_verb}"
-
-                sentence = re.sub(r"\s+", " ", sentence).strip()
-                if sentence and sentence[-1] not in ".!?":
-                    sentence += "."
-                return sentence
-            except Exception:
-                return text
-
-        def _is_existential_opening(text: str) -> bool:
-            try:
-                import re
-                return bool(re.match(r"^\s*there\s+(is|are|was|were)\b", (text or "").strip(), flags=re.IGNORECASE))
-            except Exception:
-                return False
-
-        def _should_allow_existential() -> bool:
-            """Allow existential openings occasionally (e.g., <= 20% over recent 20 questions)."""
-            try:
-                import random
-                if self._recent_existential is None or len(self._recent_existential) == 0:
-                    # Cold start: allow with 1/4 probability
-                    return random.random() < 0.25
-                window = list(self._recent_existential)
-                used = sum(1 for x in window if x)
-                ratio = used / max(1, len(window))
-                # Target <= 0.2; allow if under target, else small chance to avoid hard ban
-                if ratio < 0.2:
-                    return True
-                # 10% chance even if above target to avoid deterministic feel
-                return random.random() < 0.10
-            except Exception:
-                return False
-
-        def _classify_opening_pattern(text: str) -> str:
-            """Classify the opening pattern of a question for variety tracking."""
-            try:
-                import re
-                s = (text or "").strip()
-                if not s:
-                    return "unknown"
-                s_lower = s.lower()
-                # Direct questions
-                if re.match(r"^(how|what|which|when|where|why)\s+", s_lower):
-                    return "direct_question"
-                # Person/name starts
-                if re.match(r"^[A-Z][a-z]+\s+(has|had|buys|bought|sells|sold|makes|made|gets|got|wants|needed|distributed|collected|painted|planted|shared|divided)", s_lower):
-                    return "person_action"
-                # Numbers/quantities
-                if re.match(r"^(\d+|A\s+total\s+of|A\s+group\s+of|An?\s+amount\s+of)\s+", s_lower):
-                    return "quantity_start"
-                # Existential
-                if re.match(r"^there\s+(is|are|was|were)\s+", s_lower):
-                    return "existential"
-                # Actions/time-based
-                if re.match(r"^(after|before|during|when|while|once|if)\s+", s_lower):
-                    return "action_time"
-                # Articles + noun (generic)
-                if re.match(r"^(a|an|the)\s+", s_lower):
-                    return "article_noun"
-                # Prepositional location
-                if re.match(r"^(in|at|on)\s+(a|an|the)\s+", s_lower):
-                    return "location_prep"
-                # Imperative/instructions
-                if re.match(r"^(find|calculate|solve|determine|work\s+out|compute)\s+", s_lower):
-                    return "imperative"
-                return "other"
-            except Exception:
-                return "unknown"
-
-
         for attempt in range(max_attempts):
             logger.info(f"Generation attempt {attempt + 1}/{max_attempts} for {topic} ({question_type})")
             
             # Try LM Studio generation first
-            if self.lm_client.is_available():
+            if plan.use_lm and self.lm_client.is_available() and self._within_budget(budget, LM_GENERATION):
+                outcomes.start(GENERATED, needs_reply=True)
                 try:
-                    generated_question = self._try_lm_studio_generation(sample_questions, topic, question_type, difficulty, used_contexts)
+                    generated_question = self._try_lm_studio_generation(sample_questions, topic, question_type, difficulty, used_contexts,
+                                                                        on_reply=outcomes.replied)
                     if generated_question:
-                        # Heuristic fix: rewrite opening if it starts with a location
-                        if _starts_with_location_opener(generated_question.question or ""):
-                            rewritten = _rewrite_away_from_location_opener(generated_question.question)
-                            if rewritten and rewritten != generated_question.question:
-                                generated_question.question = rewritten
-                        # Polish opening capitalization and reduce repetitive 'The ...' starts
-                        generated_question.question = _polish_question_opening(generated_question.question)
-                        # Replace placeholder names like [Name]
-                        generated_question.question = _replace_placeholder_names(generated_question.question)
-                        # Clean trailing fragments like ". are" or standalone "are"
-                        generated_question.question = _clean_trailing_fragments(generated_question.question)
-                        # Existential openings: allow occasionally based on recent frequency; otherwise rewrite
-                        if _is_existential_opening(generated_question.question):
-                            allow = _should_allow_existential()
-                            try:
-                                if self._recent_existential is not None:
-                                    self._recent_existential.append(bool(allow))
-                            except Exception:
-                                pass
-                            if not allow:
-                                generated_question.question = _rewrite_existential_opening(generated_question.question)
-                        else:
-                            try:
-                                if self._recent_existential is not None:
-                                    self._recent_existential.append(False)
-                            except Exception:
-                                pass
-                        # Track opening pattern for variety
-                        try:
-                            if self._recent_opening_patterns is not None:
-                                pattern = _classify_opening_pattern(generated_question.question)
-                                self._recent_opening_patterns.append(pattern)
-                        except Exception:
-                            pass
-                        # Diversify character names to avoid repeats like "Sarah"
-                        generated_question.question = _diversify_names(generated_question.question)
-                        
-                        # FINAL AGGRESSIVE CLEANUP: Multiple passes to catch all trailing fragments
-                        for _ in range(3):  # Multiple passes to catch stubborn fragments
-                            old_q = generated_question.question
-                            generated_question.question = _clean_trailing_fragments(generated_question.question)
-                            if generated_question.question == old_q:
-                                break  # No more changes needed
-                        
-                        # Final check: ensure no trailing "are", "is", etc. after question mark
-                        if generated_question.question and '?' in generated_question.question:
-                            last_q_idx = generated_question.question.rfind('?')
-                            if last_q_idx >= 0 and last_q_idx + 1 < len(generated_question.question):
-                                after_q = generated_question.question[last_q_idx+1:].strip()
-                                if after_q and re.match(r'^(are|is|was|were)\s*\.?\s*$', after_q, flags=re.IGNORECASE):
-                                    generated_question.question = generated_question.question[:last_q_idx+1]
-                        
+                        generated_question.question = self.stem_normalizer.normalize(generated_question.question, self.session)
                         # Check for incomplete fractions - reject immediately if found
-                        if _detect_incomplete_fractions(generated_question.question):
+                        if self.stem_normalizer.has_incomplete_fraction(generated_question.question):
                             logger.warning(f"REJECTED: Question has incomplete fraction (e.g., '3/') - unsolvable | Q: {generated_question.question[:80]}...")
                             continue
+                        self._track_opening_pattern(generated_question.question)
                         
                         # Attempt MCQ auto-repair before validation
                         if generated_question.question_type == "MCQ":
@@ -1050,10 +896,11 @@ class QuestionGenerator:
                         # Validate the question
                         if self.validator.validate_question(generated_question):
                             # Manual review - comprehensive quality check
-                            is_approved, review_reason = self.validator.manual_review_question(generated_question, topic)
+                            is_approved, review_reason = self._manual_review(generated_question, topic, budget)
                             if not is_approved:
                                 logger.warning(f"REJECTED by manual review: {review_reason} | Q: {generated_question.question[:80]}...")
                                 continue  # Skip this question and try again
+                            outcomes.succeed()
                             
                             quality_score = self.validator.get_quality_score(generated_question)
                             logger.info(f"Generated valid question with quality score: {quality_score}/10 | Review: {review_reason}")
@@ -1064,56 +911,18 @@ class QuestionGenerator:
                                 return generated_question
                             else:
                                 # Try a quality nudge re-prompt
-                                nudge_q = self._try_quality_nudge(sample_questions, topic, question_type, difficulty, used_contexts)
+                                nudge_q = None
+                                if plan.use_nudge and self._within_budget(budget, QUALITY_NUDGE):
+                                    outcomes.start(NUDGE, needs_reply=True)
+                                    nudge_q = self._try_quality_nudge(sample_questions, topic, question_type, difficulty, used_contexts,
+                                                                      on_reply=outcomes.replied)
                                 if nudge_q:
-                                    if _starts_with_location_opener(nudge_q.question or ""):
-                                        rewritten_n = _rewrite_away_from_location_opener(nudge_q.question)
-                                        if rewritten_n and rewritten_n != nudge_q.question:
-                                            nudge_q.question = rewritten_n
-                                    nudge_q.question = _polish_question_opening(nudge_q.question)
-                                    nudge_q.question = _replace_placeholder_names(nudge_q.question)
-                                    nudge_q.question = _clean_trailing_fragments(nudge_q.question)
-                                    if _is_existential_opening(nudge_q.question):
-                                        allow_n = _should_allow_existential()
-                                        try:
-                                            if self._recent_existential is not None:
-                                                self._recent_existential.append(bool(allow_n))
-                                        except Exception:
-                                            pass
-                                        if not allow_n:
-                                            nudge_q.question = _rewrite_existential_opening(nudge_q.question)
-                                    else:
-                                        try:
-                                            if self._recent_existential is not None:
-                                                self._recent_existential.append(False)
-                                        except Exception:
-                                            pass
-                                    nudge_q.question = _diversify_names(nudge_q.question)
-                                    # FINAL AGGRESSIVE CLEANUP: Multiple passes
-                                    for _ in range(3):
-                                        old_q = nudge_q.question
-                                        nudge_q.question = _clean_trailing_fragments(nudge_q.question)
-                                        if nudge_q.question == old_q:
-                                            break
-                                    # Final check for trailing fragments after ?
-                                    if nudge_q.question and '?' in nudge_q.question:
-                                        last_q_idx = nudge_q.question.rfind('?')
-                                        if last_q_idx >= 0 and last_q_idx + 1 < len(nudge_q.question):
-                                            after_q = nudge_q.question[last_q_idx+1:].strip()
-                                            if after_q and re.match(r'^(are|is|was|were)\s*\.?\s*$', after_q, flags=re.IGNORECASE):
-                                                nudge_q.question = nudge_q.question[:last_q_idx+1]
-                                    # Check for incomplete fractions
-                                    if _detect_incomplete_fractions(nudge_q.question):
+                                    nudge_q.question = self.stem_normalizer.normalize(nudge_q.question, self.session)
+                                    if self.stem_normalizer.has_incomplete_fraction(nudge_q.question):
                                         logger.warning(f"REJECTED nudge: incomplete fraction | Q: {nudge_q.question[:80]}...")
                                         nudge_q = None
                                         continue
-                                    # Track opening pattern for variety
-                                    try:
-                                        if self._recent_opening_patterns is not None:
-                                            pattern = _classify_opening_pattern(nudge_q.question)
-                                            self._recent_opening_patterns.append(pattern)
-                                    except Exception:
-                                        pass
+                                    self._track_opening_pattern(nudge_q.question)
                                     # Check context diversity for nudge result too (but be lenient after many rejections)
                                     nudge_context_check = self._check_context_diversity(nudge_q, used_contexts or set())
                                     if not nudge_context_check:
@@ -1133,19 +942,21 @@ class QuestionGenerator:
                                                 continue
                                         if self.validator.validate_question(nudge_q):
                                             # Manual review for nudge question
-                                            is_approved, review_reason = self.validator.manual_review_question(nudge_q, topic)
+                                            is_approved, review_reason = self._manual_review(nudge_q, topic, budget)
                                             if not is_approved:
                                                 logger.warning(f"REJECTED nudge question: {review_reason}")
                                                 nudge_q = None
                                             else:
+                                                outcomes.succeed()
                                                 n_score = self.validator.get_quality_score(nudge_q)
                                                 logger.info(f"Nudge result quality score: {n_score}/10 | Review: {review_reason}")
                                                 if n_score >= 7:  # Raised threshold for quality
                                                     return nudge_q
                                     elif self.validator.validate_question(nudge_q):
                                         # Manual review for nudge question
-                                        is_approved, review_reason = self.validator.manual_review_question(nudge_q, topic)
+                                        is_approved, review_reason = self._manual_review(nudge_q, topic, budget)
                                         if is_approved:
+                                            outcomes.succeed()
                                             n_score = self.validator.get_quality_score(nudge_q)
                                             logger.info(f"Nudge result quality score: {n_score}/10 | Review: {review_reason}")
                                             if n_score >= 7:  # Raised threshold for quality
@@ -1163,56 +974,15 @@ class QuestionGenerator:
                     logger.warning(f"LM Studio generation failed: {e}")
             
             # If LM Studio failed or produced low quality, try enhanced variations
+            outcomes.start(VARIATION)
             try:
                 variation_question = self._generate_enhanced_variation(sample_questions, topic, question_type)
                 if variation_question:
-                    if _starts_with_location_opener(variation_question.question or ""):
-                        rewritten_v = _rewrite_away_from_location_opener(variation_question.question)
-                        if rewritten_v and rewritten_v != variation_question.question:
-                            variation_question.question = rewritten_v
-                    variation_question.question = _polish_question_opening(variation_question.question)
-                    variation_question.question = _replace_placeholder_names(variation_question.question)
-                    variation_question.question = _clean_trailing_fragments(variation_question.question)
-                    if _is_existential_opening(variation_question.question):
-                        allow_v = _should_allow_existential()
-                        try:
-                            if self._recent_existential is not None:
-                                self._recent_existential.append(bool(allow_v))
-                        except Exception:
-                            pass
-                        if not allow_v:
-                            variation_question.question = _rewrite_existential_opening(variation_question.question)
-                    else:
-                        try:
-                            if self._recent_existential is not None:
-                                self._recent_existential.append(False)
-                        except Exception:
-                            pass
-                    variation_question.question = _diversify_names(variation_question.question)
-                    # FINAL AGGRESSIVE CLEANUP: Multiple passes
-                    for _ in range(3):
-                        old_q = variation_question.question
-                        variation_question.question = _clean_trailing_fragments(variation_question.question)
-                        if variation_question.question == old_q:
-                            break
-                    # Final check for trailing fragments after ?
-                    if variation_question.question and '?' in variation_question.question:
-                        last_q_idx = variation_question.question.rfind('?')
-                        if last_q_idx >= 0 and last_q_idx + 1 < len(variation_question.question):
-                            after_q = variation_question.question[last_q_idx+1:].strip()
-                            if after_q and re.match(r'^(are|is|was|were)\s*\.?\s*$', after_q, flags=re.IGNORECASE):
-                                variation_question.question = variation_question.question[:last_q_idx+1]
-                    # Check for incomplete fractions - reject if found
-                    if _detect_incomplete_fractions(variation_question.question):
+                    variation_question.question = self.stem_normalizer.normalize(variation_question.question, self.session)
+                    if self.stem_normalizer.has_incomplete_fraction(variation_question.question):
                         logger.warning(f"REJECTED variation: incomplete fraction | Q: {variation_question.question[:80]}...")
                         continue
-                    # Track opening pattern for variety
-                    try:
-                        if self._recent_opening_patterns is not None:
-                            pattern = _classify_opening_pattern(variation_question.question)
-                            self._recent_opening_patterns.append(pattern)
-                    except Exception:
-                        pass
+                    self._track_opening_pattern(variation_question.question)
                     # Check context diversity for variations too (but be lenient after many rejections)
                     var_context_check = self._check_context_diversity(variation_question, used_contexts or set())
                     if not var_context_check:
@@ -1232,11 +1002,12 @@ class QuestionGenerator:
                                 continue
                         if self.validator.validate_question(variation_question):
                             # Manual review for variation question
-                            is_approved, review_reason = self.validator.manual_review_question(variation_question, topic)
+                            is_approved, review_reason = self._manual_review(variation_question, topic, budget)
                             if not is_approved:
                                 logger.warning(f"REJECTED variation question: {review_reason}")
                                 variation_question = None
                             else:
+                                outcomes.succeed()
                                 quality_score = self.validator.get_quality_score(variation_question)
                                 logger.info(f"Generated valid variation with quality score: {quality_score}/10 | Review: {review_reason}")
                                 
@@ -1249,8 +1020,9 @@ class QuestionGenerator:
                                     logger.info(f"Better variation found (score: {quality_score}/10), continuing search...")
                     elif self.validator.validate_question(variation_question):
                         # Manual review for variation question
-                        is_approved, review_reason = self.validator.manual_review_question(variation_question, topic)
+                        is_approved, review_reason = self._manual_review(variation_question, topic, budget)
                         if is_approved:
+                            outcomes.succeed()
                             quality_score = self.validator.get_quality_score(variation_question)
                             logger.info(f"Generated valid variation with quality score: {quality_score}/10 | Review: {review_reason}")
                             
@@ -1271,7 +1043,7 @@ class QuestionGenerator:
         # Return the best question found, even if not perfect - BUT only after manual review
         if best_question and best_score >= 5:  # Raised threshold - minimum quality for fallback
             # Final manual review check before using fallback
-            is_approved, review_reason = self.validator.manual_review_question(best_question, topic)
+            is_approved, review_reason = self._manual_review(best_question, topic, budget)
             if not is_approved:
                 logger.warning(f"REJECTED best available question: {review_reason} | Score: {best_score}/10")
                 return None  # Don't use rejected questions even as fallback
@@ -1295,6 +1067,15 @@ class QuestionGenerator:
                 logger.warning(f"Failed to generate any valid question for {topic} after {max_attempts} attempts")
             return None
 
+    @staticmethod
+    def _within_budget(budget: Optional[GenerationBudget], stage: str) -> bool:
+        return budget is None or budget.allows(stage)
+
+    def _manual_review(self, question: Question, topic: str, budget: Optional[GenerationBudget]) -> tuple:
+        """Manual review, without the AI reviewer once the budget no longer affords it"""
+        use_ai = self._within_budget(budget, AI_REVIEW)
+        return self.validator.manual_review_question(question, topic, use_ai=use_ai)
+
     def _repair_mcq_options(self, question: 'Question') -> bool:
         """Normalize and repair MCQ options to ensure plausibility and one-correct mapping.
 
@@ -1612,8 +1393,12 @@ class QuestionGenerator:
 
         return True
 
-    def _try_quality_nudge(self, sample_questions: List[Dict], topic: str, question_type: str, difficulty: str, used_contexts: Optional[set] = None) -> Optional['Question']:
-        """One-off re-prompt with explicit quality nudges (units, steps, rounding)."""
+    def _response_format(self, question_type: str) -> Optional[Dict]:
+        return question_response_format(question_type) if self.structured_output else None
+
+    def _try_quality_nudge(self, sample_questions: List[Dict], topic: str, question_type: str, difficulty: str, used_contexts: Optional[set] = None,
+                           on_reply: Optional[Callable[[], None]] = None) -> Optional['Question']:
+        """One-off re-prompt with explicit quality nudges (units, steps, rounding); `on_reply` is called if LM Studio answers."""
         context = self._create_rag_context(sample_questions, topic, question_type, used_contexts)
         nudge = (
             self._create_generation_prompt(context, topic, question_type, difficulty, used_contexts)
@@ -1632,15 +1417,21 @@ class QuestionGenerator:
                 messages=[{"role": "user", "content": nudge}],
                 temperature=0.6,
                 max_tokens=1100,
+                response_format=self._response_format(question_type),
+                stop_at_json=self.stream_json,
+                required_keys=("question",),
             )
             if success and response:
+                if on_reply is not None:
+                    on_reply()
                 return self._parse_generated_question(response, topic, question_type)
         except Exception as e:
             logger.debug(f"Quality nudge error: {e}")
         return None
     
-    def _try_lm_studio_generation(self, sample_questions: List[Dict], topic: str, question_type: str, difficulty: str, used_contexts: Optional[set] = None) -> Optional[Question]:
-        """Try to generate a question using LM Studio with retry mechanism"""
+    def _try_lm_studio_generation(self, sample_questions: List[Dict], topic: str, question_type: str, difficulty: str, used_contexts: Optional[set] = None,
+                                  on_reply: Optional[Callable[[], None]] = None) -> Optional[Question]:
+        """Try to generate a question using LM Studio with retry mechanism; `on_reply` is called once LM Studio answers"""
         # Create RAG context
         context = self._create_rag_context(sample_questions, topic, question_type, used_contexts)
         prompt = self._create_generation_prompt(context, topic, question_type, difficulty, used_contexts)
@@ -1651,17 +1442,26 @@ class QuestionGenerator:
             {"temperature": 0.5, "max_tokens": 900,  "prompt": self._create_simple_prompt(topic, question_type)}
         ]
         
+        response_format = self._response_format(question_type)
+
+        # The simple prompt is only a fallback: sending it up front would hold a second
+        # LM Studio slot for a reply that is rarely needed
         for i, config in enumerate(retry_configs):
             try:
-                logger.debug(f"LM Studio attempt {i+1}/8 with temperature {config['temperature']}")
+                logger.debug(f"LM Studio attempt {i+1}/{len(retry_configs)} with temperature {config['temperature']}")
                 
                 response, success = self.lm_client.chat(
                     messages=[{"role": "user", "content": config['prompt']}],
                     temperature=config['temperature'],
-                    max_tokens=config['max_tokens']
+                    max_tokens=config['max_tokens'],
+                    response_format=response_format,
+                    stop_at_json=self.stream_json,
+                    required_keys=("question",),
                 )
                 
                 if success and response:
+                    if on_reply is not None:
+                        on_reply()
                     logger.debug(f"LM Studio response (attempt {i+1}): {response}")
                     question = self._parse_generated_question(response, topic, question_type)
                     if question:
@@ -1987,69 +1787,29 @@ RESPOND WITH ONLY THIS JSON (no extra text):
     
     def _parse_generated_question(self, response: str, topic: str, question_type: str) -> Optional[Question]:
         """Parse the generated question from LM Studio response"""
-        import re
-        import json
-        
         try:
             # Clean the response and extract JSON
             response = response.strip()
             logger.debug(f"Raw LM Studio response: {response}")
             
-            # Try multiple extraction strategies
-            json_str = self._extract_json_from_response(response)
-            
-            if not json_str:
-                logger.warning("No JSON found in LM Studio response")
-                return None
-            
-            # Try multiple parsing strategies
-            parsing_strategies = [
-                # Strategy 1: Direct parse
-                json_str,
-                # Strategy 2: Fix quotes
-                json_str.replace("'", '"'),
-                # Strategy 3: Clean whitespace and fix quotes
-                json_str.replace('\n', ' ').replace('\r', ' ').replace("'", '"'),
-                # Strategy 4: Remove backslashes and fix quotes
-                json_str.replace('\\', '').replace("'", '"'),
-                # Strategy 5: More aggressive cleaning
-                json_str.replace('\n', ' ').replace('\r', ' ').replace('\\', '').replace("'", '"').replace('  ', ' '),
-                # Strategy 6: Handle LaTeX formatting
-                json_str.replace('\\[', '').replace('\\]', '').replace('\\{', '{').replace('\\}', '}'),
-                # Strategy 7: Handle boxed responses
-                json_str.replace('\\boxed{', '').replace('}', ''),
-                # Strategy 8: More aggressive cleaning
-                json_str.replace('\\[', '').replace('\\]', '').replace('\\{', '{').replace('\\}', '}').replace('\\boxed{', '').replace('\\', '').replace("'", '"'),
-                # Strategy 9: Remove any remaining LaTeX
-                json_str.replace('\\frac{', '').replace('\\', '').replace('{', '').replace('}', '').replace("'", '"'),
-                # Strategy 10: Fix common JSON issues
-                json_str.replace('True', 'true').replace('False', 'false').replace('None', 'null'),
-                # Strategy 11: Handle malformed quotes
-                json_str.replace('"', '"').replace('"', '"').replace(''', "'").replace(''', "'"),
-                # Strategy 12: Fix trailing commas
-                re.sub(r',\s*}', '}', json_str),
-                re.sub(r',\s*]', ']', json_str)
-            ]
-            
-            data = None
-            for i, strategy in enumerate(parsing_strategies):
-                try:
-                    data = json.loads(strategy)
-                    logger.debug(f"Successfully parsed JSON with strategy {i+1}")
-                    break
-                except json.JSONDecodeError as e:
-                    logger.debug(f"Strategy {i+1} failed: {e}")
-                    continue
+            # Schema-constrained responses are a bare, conforming object: skip the repairs below
+            structured = self._load_structured_question(response, question_type)
+            if structured is not None:
+                return self._question_from_payload(structured, topic)
             
+            data = self._extract_question_json(response)
             if data is None:
-                logger.warning("All JSON parsing strategies failed, trying partial extraction")
+                if '{' not in response:
+                    logger.warning("No JSON found in LM Studio response")
+                    return None
+                logger.warning("No complete question JSON in LM Studio response, trying partial extraction")
                 return self._extract_partial_question(response, topic, question_type)
             
             # Validate required fields
             required_fields = ['question', 'question_type', 'marks']
-            for field in required_fields:
-                if field not in data:
-                    logger.warning(f"Missing required field: {field}")
+            for required in required_fields:
+                if required not in data:
+                    logger.warning(f"Missing required field: {required}")
                     return None
             
             # Validate question type
@@ -2097,103 +1857,49 @@ RESPOND WITH ONLY THIS JSON (no extra text):
                     logger.warning(f"Open-ended questions should have correct_answer_index = -1: {data.get('correct_answer_index', -1)}")
                     return None
             
-            # Create Question object
-            question_id = f"generated_{topic}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
-            return Question(
-                id=question_id,
-                question=data['question'],
-                options=data.get('options', []),
-                correct_answer_index=data.get('correct_answer_index', -1),
-                correct_answer_text=data.get('correct_answer_text', ''),
-                topic=topic,
-                source="Generated",
-                question_type=data['question_type'],
-                marks=data['marks']
-            )
+            return self._question_from_payload(data, topic)
             
         except Exception as e:
             logger.warning(f"Failed to parse generated question: {e}")
             return None
     
-    def _extract_json_from_response(self, response: str) -> Optional[str]:
-        """Extract JSON from Mistral response using multiple strategies"""
-        import re
-        
-        # Clean the response first
-        response = response.strip()
-        
-        # Remove Mistral-specific formatting
-        response = re.sub(r'^<s>\[INST\].*?\[/INST\]', '', response, flags=re.DOTALL)
-        response = re.sub(r'^\[INST\].*?\[/INST\]', '', response, flags=re.DOTALL)
-        response = response.strip()
-        
-        # Strategy 1: Look for complete JSON object
-        json_patterns = [
-            # Standard JSON object
-            r'\{[^{}]*"question"[^{}]*"marks"[^{}]*\}',
-            # JSON with nested objects
-            r'\{[^{}]*"question"[^{}]*\}',
-            # JSON in code blocks
-            r'```json\s*(\{.*?\})\s*```',
-            r'```\s*(\{.*?\})\s*```',
-            # JSON after common phrases
-            r'(?:json|JSON|answer|response):\s*(\{.*?\})',
-            r'(?:here|below|following):\s*(\{.*?\})',
-            # JSON in boxed LaTeX
-            r'\\boxed\{([^}]+)\}',
-            # JSON after "json format is:"
-            r'json format is:\s*([^}]+)',
-            # JSON after "final json format is:"
-            r'final json format is:\s*([^}]+)',
-            # Mistral-specific patterns
-            r'(?:Here|Here\'s|This is|Generated):\s*(\{.*?\})',
-            r'(?:Question|Answer):\s*(\{.*?\})',
-        ]
-        
-        for pattern in json_patterns:
-            matches = re.findall(pattern, response, re.DOTALL | re.IGNORECASE)
-            for match in matches:
-                # Clean the match
-                cleaned = match.strip()
-                
-                # Remove LaTeX formatting
-                cleaned = cleaned.replace('\\', '').replace('{', '').replace('}', '')
-                
-                # Try to find the actual JSON
-                json_start = cleaned.find('{')
-                json_end = cleaned.rfind('}') + 1
-                
-                if json_start != -1 and json_end > json_start:
-                    json_str = cleaned[json_start:json_end]
-                    logger.debug(f"Found JSON with pattern: {json_str}")
-                    return json_str
-        
-        # Strategy 2: Look for JSON-like structure and reconstruct
-        lines = response.split('\n')
-        json_lines = []
-        in_json = False
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('{') or in_json:
-                in_json = True
-                json_lines.append(line)
-                if line.endswith('}') and line.count('{') <= line.count('}'):
-                    break
-        
-        if json_lines:
-            reconstructed = ' '.join(json_lines)
-            logger.debug(f"Reconstructed JSON: {reconstructed}")
-            return reconstructed
-        
-        # Strategy 3: Find any text that looks like JSON
-        json_match = re.search(r'\{[^{}]*"question"[^{}]*\}', response, re.DOTALL)
-        if json_match:
-            logger.debug(f"Found JSON with fallback: {json_match.group()}")
-            return json_match.group()
-        
-        return None
+    def _question_from_payload(self, data: Dict, topic: str) -> Question:
+        question_id = f"generated_{topic}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        return Question(
+            id=question_id,
+            question=data['question'],
+            options=data.get('options', []),
+            correct_answer_index=data.get('correct_answer_index', -1),
+            correct_answer_text=data.get('correct_answer_text', ''),
+            topic=topic,
+            source="Generated",
+            question_type=data['question_type'],
+            marks=data['marks']
+        )
+    
+    def _load_structured_question(self, response: str, question_type: str) -> Optional[Dict]:
+        """The response as a question object if it is exactly one schema-conforming JSON object"""
+        if not (response.startswith('{') and response.endswith('}')):
+            return None
+        try:
+            # Keep LaTeX such as \frac or \times as written instead of decoding \f and \t
+            data = json.loads(escape_latex(response))
+        except ValueError:
+            return None
+        problem = check_question_payload(data, question_type)
+        if problem:
+            logger.debug(f"Response does not match the question schema: {problem}")
+            return None
+        return data
+    
+    def _extract_question_json(self, response: str) -> Optional[Dict]:
+        """First complete JSON object with a "question" key in a model response.
+        One brace/quote-aware pass; code fences and surrounding prose are skipped, and
+        trailing commas, smart or single quotes and Python literals are repaired.
+        """
+        # Drop an echoed Mistral instruction block, whose examples also carry "question"
+        response = _INSTRUCTION_ECHO.sub('', response.strip(), count=1)
+        return extract_json_object(response, required_keys=("question",))
     
     def _extract_partial_question(self, response: str, topic: str, question_type: str) -> Optional[Question]:
         """Extract question information even if JSON parsing fails"""
@@ -2524,31 +2230,67 @@ RESPOND WITH ONLY THIS JSON (no extra text):
         
         return question_text
 
-class QuestionValidator:
-    """Enhanced question validator with quality control"""
-    
-    def __init__(self, lm_client: Optional[LMStudioClient] = None):
-        self.enable_manual_review = True  # Enable strict manual review for quality
-        self.lm_client = lm_client  # LM Studio client for AI-powered review
-        self.min_question_length = 35  # Slightly reduced to avoid rejecting concise valid stems
-        self.max_question_length = 1000  # Maximum question length (allow richer scenarios)
-        # When False, relax option/answer enforcement to focus on question quality
-        # Enforce strict answer/option checks so unsound MCQs are rejected early
-        self.strict_answer_checks = True
-        self.required_keywords = ['what', 'how', 'find', 'calculate', 'determine', 'solve', 'show', 'work', 'answer', 'find', 'total', 'area', 'perimeter', 'volume', 'cost', 'price', 'time', 'speed', 'distance']
-        self.simple_patterns = [
-            r'add\s+\d+\s+and\s+\d+',
-            r'subtract\s+\d+\s+from\s+\d+',
-            r'multiply\s+\d+\s+by\s+\d+',
-            r'divide\s+\d+\s+by\s+\d+',
-            r'what\s+is\s+\d+\s*\+\s*\d+',
-            r'what\s+is\s+\d+\s*-\s*\d+',
-            r'what\s+is\s+\d+\s*\*\s*\d+',
-            r'what\s+is\s+\d+\s*/\s*\d+'
-        ]
-    
-    def validate_question(self, question: Question) -> bool:
-        """Comprehensive question validation"""
+REVIEW_CRITERIA = """
+
+Check for:
+1. **SOLVABILITY**: Can this question be solved with the information provided?
+   - If it mentions fractions/percentages (e.g., "3/4 of..." or "20% of..."), is the total/base amount explicitly stated?
+   - If it's a ratio problem, are there enough numbers or is a total mentioned?
+   - If it asks "how many", are there enough numbers/context to calculate?
+   - For speed/distance/time problems, are at least 2 of the 3 quantities provided?
+   - Does it have all the information needed to solve it?
+
+2. **QUALITY & CLARITY**: 
+   - Is the question clearly written and understandable?
+   - Does it have formatting issues, trailing fragments (like "? are" at the end), or incomplete sentences?
+   - **CRITICAL**: Does it have incomplete fractions (e.g., "3/" instead of "3/4") that make it unsolvable?
+   - Is it asking something that can be answered?
+
+3. **LOGICAL CONSISTENCY**:
+   - Does the question make mathematical sense?
+   - If asking for percentage increase, are initial and final values provided?
+   - Are the numbers realistic and appropriate for the problem type?
+
+4. **MCQ SPECIFIC** (if MCQ):
+   - Are all 4 options valid (not placeholders, not empty, not duplicates)?
+   - Do the options make sense as distractors?
+   - **CRITICAL**: Is the correct answer actually correct for the question? Verify the calculation:
+     * If question asks "X into Y equal pieces" or "X ÷ Y" or "X divided by Y", calculate X ÷ Y and check if the correct answer matches (within reasonable rounding)
+     * If question asks "How many...", verify the correct answer matches the calculation
+     * If question asks for area/volume/length, check units and values are reasonable
+     * If question asks about fractions/percentages, verify the correct answer matches the calculation
+     * **REJECT if correct answer doesn't match what the question is asking for** - this is a critical error
+     * Check if ALL options are wrong (none match the correct calculation) - this is also a critical error
+
+5. **COMPLETENESS**:
+   - Does the question have enough numbers/context for the type of problem?
+   - Is it missing any critical information?"""
+
+
+class QuestionValidator:
+    """Enhanced question validator with quality control"""
+
+    # AI verdicts remembered by question content, so re-reviewing a candidate is free
+    REVIEW_CACHE_SIZE = 512
+    
+    def __init__(self, lm_client: Optional[LMStudioClient] = None, review_batch_size: Optional[int] = None):
+        self.enable_manual_review = True  # Enable strict manual review for quality
+        self.lm_client = lm_client  # LM Studio client for AI-powered review
+        self.min_question_length = 35  # Slightly reduced to avoid rejecting concise valid stems
+        self.max_question_length = 1000  # Maximum question length (allow richer scenarios)
+        # When False, relax option/answer enforcement to focus on question quality
+        # Enforce strict answer/option checks so unsound MCQs are rejected early
+        self.strict_answer_checks = True
+        # Questions sent to the AI reviewer per LM call
+        self.review_batch_size = max(1, review_batch_size or PROCESSING_CONFIG["batch_size"])
+        self.review_batcher: Optional[ReviewBatcher] = None
+        self._review_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._review_lock = threading.Lock()
+        # Settles the answer key of MCQs it can solve exactly, sparing their AI review
+        self.answer_checker = answer_checker.AnswerChecker()
+
+    def validate_question(self, question: Question) -> bool:
+        """Comprehensive question validation"""
         # Basic validation
         if not question.question or len(question.question.strip()) < self.min_question_length:
             logger.warning(f"Question too short: {len(question.question) if question.question else 0} chars")
@@ -2568,19 +2310,17 @@ class QuestionValidator:
                     logger.warning(f"Open-ended questions should have empty options: {question.options}")
                     # Don't fail validation, just warn
         
-        # Check question quality
-        if not self._validate_question_quality(question):
-            return False
-        
-        # Check for missing content
-        if not self._validate_question_content(question):
-            return False
-        
-        # Check for common issues found in PDF validation
-        if not self._validate_question_clarity(question):
+        # Quality, content and clarity rules from the compiled rule table
+        verdict = question_rules.evaluate(question, stages=question_rules.VALIDATION_STAGES)
+        if not verdict.passed:
+            logger.warning(f"REJECTED: {verdict.reason} - {question.question[:100]}")
             return False
         
         return True
+
+    def evaluate(self, question: Question) -> question_rules.RuleVerdict:
+        """Every rule failure plus the quality score components, for debugging and reports"""
+        return question_rules.evaluate(question, first_failure=False, score=True)
     
     def _validate_mcq_options(self, question: Question) -> bool:
         """Validate MCQ options are real answers, not generic placeholders"""
@@ -2675,501 +2415,165 @@ class QuestionValidator:
     
     def _validate_question_quality(self, question: Question) -> bool:
         """Validate question is challenging enough for P6 level"""
-        question_text = question.question.lower()
-        
-        # Check for required question words
-        has_question_word = any(keyword in question_text for keyword in self.required_keywords)
-        if not has_question_word:
-            logger.warning("Question lacks proper question words")
-            return False
-        
-        # Check if question is too simple
-        for pattern in self.simple_patterns:
-            if re.search(pattern, question_text):
-                logger.warning(f"Question too simple: {question.question[:100]}...")
-                return False
-        
-        # Composite mathematical complexity scoring
-        complexity_score = self._compute_complexity_score(question_text)
-        if complexity_score < 2:  # Slightly relaxed to reduce false negatives
-            logger.warning("Question lacks mathematical complexity")
-            return False
-        
-        return True
+        return question_rules.evaluate(question, stages=(question_rules.QUALITY,)).passed
 
     def _compute_complexity_score(self, question_text: str) -> int:
         """Compute a lightweight complexity score from multiple signals.
         Returns an integer score; higher is more complex.
         """
-        score = 0
-        import re
+        return question_rules.complexity_score(question_text)
 
-        # 1) Math topic indicators
-        math_indicators = [
-            'fraction', 'decimal', 'percentage', 'ratio', 'proportion',
-            'algebra', 'equation', 'variable', 'unknown',
-            'area', 'perimeter', 'volume', 'surface area', 'capacity',
-            'angle', 'triangle', 'rectangle', 'circle', 'square', 'polygon',
-            'time', 'hour', 'minute', 'second', 'speed', 'distance', 'rate',
-            'average', 'mean', 'median', 'mode', 'graph', 'chart', 'table',
-            'measurement', 'length', 'width', 'height', 'mass', 'weight', 'temperature',
-            'total', 'sum', 'difference', 'product', 'quotient',
-            'round', 'estimate', 'approximate'
-        ]
-        if any(ind in question_text for ind in math_indicators):
-            score += 1
-
-        # 2) Presence of at least two numbers (signals data richness)
-        numbers = re.findall(r"\b\d+(?:[.,]\d+)?\b", question_text)
-        if len(numbers) >= 2:
-            score += 1
-
-        # 3) Operations/equation cues (words or symbols)
-        if any(sym in question_text for sym in ['+', '-', '×', 'x', '*', '÷', '/', '%']):
-            score += 1
-        else:
-            op_words = ['sum of', 'difference between', 'product of', 'quotient of', 'twice', 'thrice', 'per']
-            if any(w in question_text for w in op_words):
-                score += 1
-
-        # 4) Units present (measurement realism)
-        units = [
-            'cm', 'm', 'km', 'mm', 'kg', 'g', 'mg', 'l', 'ml', '°c', 'deg',
-            'minutes', 'minute', 'hours', 'hour', 'seconds', 'second'
-        ]
-        if any(re.search(rf"\b{u}\b", question_text) for u in units):
-            score += 1
-
-        # 5) Multi-step / sequencing cues
-        multi_step = ['then', 'after', 'next', 'remaining', 'altogether', 'in total', 'finally', 'first']
-        if any(w in question_text for w in multi_step):
-            score += 1
-
-        return score
-    
     def _validate_question_content(self, question: Question) -> bool:
         """Validate question has complete content and is solvable"""
-        import re
-        # Check for missing question text
-        if not question.question or question.question.strip() == "":
-            logger.warning("Question text is empty")
-            return False
-        
-        # Check for incomplete questions
-        incomplete_indicators = [
-            'solve the problem',
-            'determine the correct answer',
-            'find the answer',
-            'calculate the result'
-        ]
-        
-        question_text = question.question.lower()
-        for indicator in incomplete_indicators:
-            if indicator in question_text and len(question.question) < 100:
-                logger.warning(f"Incomplete question: {question.question}")
-                return False
-        
-        # Check for solvability: questions with fractions/ratios/percentages need totals
-        # Pattern: "X/Y of" or "X% of" without a total number specified
-        fraction_pattern = r'(\d+/\d+|[\d.]+%)\s+of\s+(?:the\s+)?'
-        if re.search(fraction_pattern, question_text):
-            # Check if there's a total number mentioned AFTER the fraction/percentage
-            # Pattern like "3/4 of the 60 seats" or "20% of 100 items"
-            numbers = re.findall(r'\b\d+\b', question.question)
-            # Need at least 2 numbers (one for fraction/%, one for total) OR the total must be mentioned explicitly
-            has_explicit_total = re.search(r'(\d+/\d+|[\d.]+%)\s+of\s+(?:the\s+)?\d+', question_text)
-            
-            if not has_explicit_total and len(numbers) < 2:
-                # Check for total indicators that might imply a number elsewhere
-                has_total_indicator = re.search(r'\b(total|altogether|in all|sum|all|whole)\s+(?:of\s+)?\d+', question_text)
-                if not has_total_indicator:
-                    logger.warning(f"REJECTED: Fraction/percentage without explicit total - {question.question[:100]}")
-                    return False
-        
-        # Check for ratio problems - must have enough information
-        if re.search(r'\bratio\b.*\d+.*:\s*\d+', question_text, re.IGNORECASE):
-            numbers = re.findall(r'\b\d+\b', question.question)
-            # Ratio problems typically need at least 3 numbers (2 for ratio, 1 for quantity)
-            if len(numbers) < 3:
-                has_total = re.search(r'\b(total|altogether|in all|sum)\s+(?:of\s+)?\d+', question_text, re.IGNORECASE)
-                if not has_total:
-                    logger.warning(f"REJECTED: Ratio problem without enough information - {question.question[:100]}")
-                    return False
-        
-        # Additional solvability checks for open-ended questions
-        if question.question_type == "Open-ended":
-            # Detect "each <noun>" constructions without an accompanying quantity for that noun
-            each_matches = re.finditer(r'\beach\s+(?:of\s+the\s+)?([a-z]+)', question_text, re.IGNORECASE)
-            missing_nouns = []
-            for match in each_matches:
-                noun = match.group(1).lower()
-                # Ignore measurement/unit nouns where individual counts are implied
-                if noun in {'centimetre', 'centimeter', 'metre', 'meter', 'kilometre', 'kilometer',
-                            'hour', 'minute', 'second', 'day', 'week', 'month', 'year', 'gram', 'kilogram'}:
-                    continue
-                plural = noun if noun.endswith('s') else noun + 's'
-                quantity_patterns = [
-                    rf'\b\d+\s+(?:\w+\s+)?{plural}\b',
-                    rf'\b\d+\s+(?:\w+\s+)?{noun}\b',
-                    rf'each\s+of\s+the\s+\d+\s+(?:\w+\s+)?{plural}\b'
-                ]
-                if not any(re.search(pattern, question_text, re.IGNORECASE) for pattern in quantity_patterns):
-                    missing_nouns.append(noun)
-            if missing_nouns:
-                logger.warning(
-                    f"REJECTED: 'each' reference without explicit count for {', '.join(sorted(set(missing_nouns)))} - "
-                    f"{question.question[:100]}"
-                )
-                return False
+        return question_rules.evaluate(question, stages=(question_rules.CONTENT,)).passed
 
-            # Fraction-of-total questions must include at least one standalone quantity beyond fractional parts
-            fraction_only = re.findall(r'\d+\s*/\s*\d+', question.question)
-            if fraction_only:
-                stripped = re.sub(r'\d+\s*/\s*\d+', ' ', question.question)
-                stripped = re.sub(r'\d+\s*:\s*\d+', ' ', stripped)
-                standalone_numbers = re.findall(r'\b\d+\b', stripped)
-                if not standalone_numbers:
-                    logger.warning(f"REJECTED: Fraction question missing a base quantity - {question.question[:100]}")
-                    return False
-        
-        # Check for questions asking "how many" without enough context
-        if re.search(r'how many\s+\w+\s+(are|is|was|were|does|do|did)', question_text):
-            numbers = re.findall(r'\b\d+\b', question.question)
-            # If asking "how many X are..." need at least one number for context
-            if len(numbers) < 1:
-                logger.warning(f"REJECTED: 'How many' question without numbers - {question.question[:100]}")
-                return False
-            # For "how many" with fractions/percentages, need totals
-            if re.search(r'how many.*(\d+/\d+|[\d.]+%)', question_text):
-                if not re.search(r'(\d+/\d+|[\d.]+%)\s+of\s+\d+', question_text):
-                    logger.warning(f"REJECTED: 'How many' with fraction/% without total - {question.question[:100]}")
-                    return False
-        
-        # Check for speed/distance/time problems - need at least 2 of the 3
-        if re.search(r'\b(speed|distance|time)\b', question_text, re.IGNORECASE):
-            has_speed = bool(re.search(r'\d+\s*(km/h|m/s|mph)', question_text, re.IGNORECASE))
-            has_distance = bool(re.search(r'\d+\s*(km|m|miles)', question_text, re.IGNORECASE))
-            has_time = bool(re.search(r'\d+\s*(hour|minute|second|hr|min|sec)', question_text, re.IGNORECASE))
-            provided = sum([has_speed, has_distance, has_time])
-            if provided < 2:
-                logger.warning(f"REJECTED: Speed/distance/time problem with insufficient info - {question.question[:100]}")
-                return False
-        
-        return True
-    
     def _validate_question_clarity(self, question: Question) -> bool:
         """Validate question clarity and catch common issues from PDF validation"""
-        import re
-        question_text = question.question
-        question_lower = question_text.lower()
-        
-        # 1. Check for diagram/figure references (CRITICAL - diagrams not shown in PDF)
-        diagram_patterns = [
-            r'look at (the )?(diagram|figure|picture|number line|graph|chart|table|image)',
-            r'refer to (the )?(diagram|figure|picture|number line|graph|chart|table|image)',
-            r'see (the )?(diagram|figure|picture|number line|graph|chart|table|image)',
-            r'(diagram|figure|picture|number line|graph|chart|table|image) (shown|below|above|here)'
-        ]
-        for pattern in diagram_patterns:
-            if re.search(pattern, question_lower, re.IGNORECASE):
-                logger.warning(f"REJECTED: Question references diagram/figure - {question.question[:100]}")
-                return False
-        
-        # 2. Check for common typos
-        if re.search(r'\bin most\b', question_lower):
-            logger.warning(f"REJECTED: Contains typo 'in most' (should be 'in all') - {question.question[:100]}")
-            return False
-        
-        # 3. Check for extraneous text that shouldn't be in questions
-        extraneous_patterns = [
-            r'requiring equation solving',
-            r'at a construction site\.',
-            r'at a [^\.]+\.\s*$'  # Location mention at end of sentence
-        ]
-        for pattern in extraneous_patterns:
-            if re.search(pattern, question_text, re.IGNORECASE):
-                logger.warning(f"REJECTED: Contains extraneous text - {question.question[:100]}")
-                return False
-        
-        # 4. For MCQ: Check unit consistency between question and options
-        if question.question_type == "MCQ" and question.options:
-            # Check if question asks for a count ("how many X")
-            count_patterns = [
-                r'how many\s+\w+\s+(?:can|are|is|were|was|does|do|did|will)',
-                r'how many\s+\w+\s+(?:equal|parts|pieces|items|objects|things)',
-                r'how many\s+(?:equal\s+)?parts',
-                r'how many\s+(?:pieces|items|objects|things)',
-                r'number of\s+\w+\s+(?:equal|parts|pieces)'
-            ]
-            asks_for_count = any(re.search(pattern, question_lower) for pattern in count_patterns)
-            
-            if asks_for_count:
-                # Check if options have units (indicating measurement, not count)
-                unit_pattern = r'\b(m|cm|mm|km|m2|m\^2|cm2|cm\^2|m3|m\^3|kg|g|mg|l|ml|litre|liter)\b'
-                options_with_units = 0
-                for option in question.options:
-                    option_str = str(option).strip()
-                    # Remove labels like "A) " or "1. "
-                    option_clean = re.sub(r'^[A-Da-d0-9][\)\.:\-\s]+', '', option_str)
-                    if re.search(unit_pattern, option_clean, re.IGNORECASE):
-                        options_with_units += 1
-                
-                # If most/all options have units but question asks for count, reject
-                if options_with_units >= 3:
-                    logger.warning(f"REJECTED: Question asks for count but options have units - {question.question[:100]}")
-                    return False
-        
-        # 5. Check for unclear phrasing in open-ended questions
-        if question.question_type == "Open-ended":
-            # Check for ambiguous "X more" or "X times more" without clear reference
-            if re.search(r'\d+/\d+\s+more\s+(?:than\s+)?(?:what|which|it|they|them)', question_lower):
-                logger.warning(f"REJECTED: Ambiguous 'X more' phrasing without clear reference - {question.question[:100]}")
-                return False
-            
-            # Check for contradictory ratio constraints
-            ratio_match = re.search(r'ratio.*?(\d+)\s*:\s*(\d+)', question_text, re.IGNORECASE)
-            more_match = re.search(r'(\d+)\s+more\s+(?:red|blue|first|second)', question_lower)
-            if ratio_match and more_match:
-                # This might be a contradictory constraint - log warning but don't reject automatically
-                # (let AI review handle this)
-                logger.debug(f"Potential contradictory constraints: ratio {ratio_match.group(1)}:{ratio_match.group(2)} and 'more' constraint")
-        
-        # 6. Check for logic confusion (mixing different categories)
-        # Pattern: Questions that mix trees/flowers, red/blue without clear relationship
-        category_mix_patterns = [
-            (r'\d+\s+tree\s+species', r'\d+\s+(?:flower|plant)\s+species'),
-            (r'(?:tree|trees)', r'(?:flower|flowers)'),
-        ]
-        for pattern1, pattern2 in category_mix_patterns:
-            if re.search(pattern1, question_lower) and re.search(pattern2, question_lower):
-                # Check if the question makes logical sense
-                if 'plant species' not in question_lower and 'species' in question_lower:
-                    logger.warning(f"REJECTED: Logic confusion - mixes different categories - {question.question[:100]}")
-                    return False
-        
-        return True
-    
+        return question_rules.evaluate(question, stages=(question_rules.CLARITY,)).passed
+
     def _manual_rule_checks(self, question: Question) -> tuple[bool, str]:
         """Apply rule-based sanity checks that catch common generation failures."""
-        import re
-        q_text = question.question or ""
-        q_lower = q_text.lower()
-
-        def _value_in_answer(value: str) -> bool:
-            if not value:
-                return False
-            pattern = rf"\b{re.escape(value)}\b"
-            if re.search(pattern, question.correct_answer_text or "", re.IGNORECASE):
-                return True
-            for opt in question.options or []:
-                if re.search(pattern, str(opt), re.IGNORECASE):
-                    return True
-            return False
-
-        def fail(reason: str) -> tuple[bool, str]:
-            logger.warning(f"REJECTED: {reason} - {q_text[:100]}")
-            return False, reason
-
-        # Obvious corrupted phrases or unnatural wording
-        if "how few" in q_lower:
-            return fail("Contains unnatural phrase 'how few'")
-        bad_tokens = ["parmostel", "smmoster", "mostocated"]
-        for token in bad_tokens:
-            if token in q_lower:
-                return fail(f"Contains corrupted word '{token}'")
-        if re.search(r'\bare\.\s*$', q_lower):
-            return fail("Ends with stray 'are.' fragment")
-        if re.search(r'\bare there are\b', q_lower):
-            return fail("Contains duplicated phrase 'are there are'")
-        if re.search(r'\bbelow\b', q_lower) or re.search(r'\bshown\b', q_lower):
-            return fail("References diagram/table that is not present")
-
-        # Trailing fragments or formatting issues
-        if re.search(r'\?\.\s+|\.\s+(are|is|was|were|have|has|had)\s*$', q_lower):
-            return fail("Has trailing fragments or formatting issues")
-        if re.search(r'\?\s+(in|at|on)\s+(a|an|the)\s+\w+', q_lower):
-            return fail("Has location phrase after question mark")
-
-        # Fractions/percentages require explicit totals
-        fraction_match = re.search(r'(\d+/\d+|[\d.]+%)\s+of\s+(?:the\s+)?([^.!?]+)', q_lower)
-        if fraction_match:
-            after_of = fraction_match.group(2)
-            if not re.search(r'\d+', after_of):
-                numbers = re.findall(r'\b\d+\b', q_text)
-                if len(numbers) < 2:
-                    has_total = re.search(r'\b(total|altogether|in all|sum|all|whole)\s+(?:of\s+)?\d+', q_lower)
-                    if not has_total:
-                        return fail(f"Fraction/percentage '{fraction_match.group(1)}' missing explicit total")
-
-        # Ratio problems need enough numbers
-        if re.search(r'\bratio\b.*\d+.*:\s*\d+', q_lower, re.IGNORECASE):
-            numbers = re.findall(r'\b\d+\b', q_text)
-            if len(numbers) < 3:
-                has_total = re.search(r'\b(total|altogether|in all|sum)\s+(?:of\s+)?\d+', q_lower, re.IGNORECASE)
-                if not has_total:
-                    return fail("Ratio problem missing sufficient numbers or total")
-
-        # "How many" questions must include contextual numbers and totals
-        if re.search(r'how many\s+\w+\s+(are|is|was|were|does|do|did)', q_lower):
-            numbers = re.findall(r'\b\d+\b', q_text)
-            if len(numbers) < 1:
-                return fail("'How many' question has no numbers")
-            if re.search(r'how many.*(\d+/\d+|[\d.]+%)', q_lower):
-                if not re.search(r'(\d+/\d+|[\d.]+%)\s+of\s+\d+', q_lower):
-                    return fail("'How many' with fraction/% missing total")
-
-        # Speed/distance/time problems need at least 2 of the 3 quantities
-        if re.search(r'\b(speed|distance|time)\b', q_lower, re.IGNORECASE):
-            has_speed = bool(re.search(r'\d+\s*(km/h|m/s|mph)', q_lower, re.IGNORECASE))
-            has_distance = bool(re.search(r'\d+\s*(km|m|miles)', q_lower, re.IGNORECASE))
-            has_time = bool(re.search(r'\d+\s*(hour|minute|second|hr|min|sec)', q_lower, re.IGNORECASE))
-            provided = sum([has_speed, has_distance, has_time])
-            if provided < 2:
-                return fail(f"Speed/distance/time problem missing information (has {provided} of 3 needed)")
-
-        discrete_keywords = {
-            "goal", "goals", "student", "students", "child", "children", "boy", "boys", "girl", "girls",
-            "book", "books", "shelf", "shelves", "swing", "swings", "turtle", "turtles", "plant", "plants",
-            "computer", "computers", "stand", "stands", "equipment", "items", "boxes", "signpost", "signposts",
-            "dish", "dishes", "test tube", "test tubes", "jar", "jars", "laptop", "laptops", "seat", "seats",
-            "painting", "paintings", "instrument", "instruments", "toy", "toys"
-        }
-        measurement_keywords = {
-            "km", "kilometre", "kilometer", "meter", "metre", "centimetre", "centimeter", "cm", "mm",
-            "litre", "liter", "ml", "kg", "g", "hour", "hours", "minute", "minutes", "second", "seconds",
-            "rate", "speed", "percentage", "percent", "%", "area", "volume", "capacity", "$", "dollar",
-            "price", "cost"
-        }
-
-        if any(k in q_lower for k in discrete_keywords):
-            decimals_in_question = re.findall(r'\d+\.\d+', q_text)
-            decimals_in_options = []
-            if question.question_type == "MCQ":
-                for opt in question.options or []:
-                    decimals_in_options.extend(re.findall(r'\d+\.\d+', str(opt)))
-            if (decimals_in_question or decimals_in_options) and not any(unit in q_lower for unit in measurement_keywords):
-                return fail("Decimal values present in discrete count context")
-
-        still_need_match = re.search(r'still\s+need[s]?\s+(?:to\s+\w+\s+)?(\d+(?:\.\d+)?)', q_lower)
-        if still_need_match and re.search(r'left\s+to\s+\w+\s+in\s+total', q_lower):
-            expected_val = still_need_match.group(1)
-            if not _value_in_answer(expected_val):
-                return fail("Mismatch between 'still needs' amount and provided answer/options")
-
-        total_match = re.search(r'together\s+scored\s+(\d+(?:\.\d+)?)', q_lower)
-        initial_match = re.search(r'scored\s+a\s+total\s+of\s+(\d+(?:\.\d+)?)', q_lower)
-        more_match = re.search(r'scored\s+(\d+(?:\.\d+)?)\s+(?:more|additional)', q_lower)
-        if total_match and initial_match and more_match:
-            try:
-                initial_val = float(initial_match.group(1))
-                add_val = float(more_match.group(1))
-                total_val = float(total_match.group(1))
-                if abs((initial_val + add_val) - total_val) > 0.01:
-                    return fail("Addition relationship inconsistent (initial + more != together total)")
-            except ValueError:
-                pass
-
-        if re.search(r'how many', q_lower) and any(k in q_lower for k in discrete_keywords):
-            if re.search(r'\d+\.\d+', question.correct_answer_text or "") and not any(unit in q_lower for unit in measurement_keywords):
-                return fail("Correct answer is non-integer for discrete 'How many' question")
-
-        if re.search(r'\d+\s*/\s*\d+', q_lower):
-            stripped_numeric = re.sub(r'\d+\s*/\s*\d+', ' ', q_lower)
-            stripped_numeric = re.sub(r'\d+(?:\.\d+)?\s*%', ' ', stripped_numeric)
-            if not re.search(r'\b\d+\b', stripped_numeric):
-                return fail("Fraction problem missing explicit total value")
-
-        if question.question_type == "MCQ":
-            if re.search(r'(correct to|decimal place|nearest tenth|nearest hundredth|1 dp|2 dp)', q_lower):
-                decimal_options = [opt for opt in question.options if '.' in str(opt)]
-                if not decimal_options:
-                    return fail("Decimal rounding question without decimal options")
-
-        return True, ""
+        verdict = question_rules.evaluate(question, stages=(question_rules.MANUAL,))
+        if not verdict.passed:
+            logger.warning(f"REJECTED: {verdict.reason} - {(question.question or '')[:100]}")
+        return verdict.passed, verdict.reason
     
-    def manual_review_question(self, question: Question, topic: str):
+    def manual_review_question(self, question: Question, topic: str, use_ai: bool = True):
         """
         AI-powered manual review of a question before adding to paper.
         Uses AI reasoning to validate quality, solvability, and clarity.
+        With use_ai=False only the local checks run (rules, calculation, patterns).
         Returns (is_approved, rejection_reason)
         """
-        import re
-        import json
-        
+        if not use_ai:
+            rejection = self._pre_review_rejection(question)
+            if rejection:
+                return False, rejection
+            return self._calculated_verdict(question) or self._pattern_review(question)
+        if self.review_batcher is not None:
+            # Concurrent paper slots: share one batched review call with the other slots
+            return self.review_batcher.review(question, topic)
+        return self.manual_review_questions([(question, topic)])[0]
+
+    def enable_review_batching(self, window: float = 0.25) -> None:
+        """Route manual_review_question through a ReviewBatcher (for concurrently generated slots)"""
+        self.review_batcher = ReviewBatcher(self.manual_review_questions, self.review_batch_size, window)
+
+    def manual_review_questions(self, items: List[tuple]) -> List[tuple]:
+        """
+        Review several (question, topic) candidates with as few LM calls as possible.
+        Rule checks run first, then MCQs whose answer can be calculated are settled
+        locally; survivors are sent to the AI reviewer review_batch_size at a time, and
+        any item the batched reply does not cover is reviewed on its own.
+        Returns one (is_approved, reason) per item, in order.
+        """
+        verdicts: List[Optional[tuple]] = [None] * len(items)
+        pending = []
+        for i, (question, topic) in enumerate(items):
+            rejection = self._pre_review_rejection(question)
+            if rejection:
+                verdicts[i] = (False, rejection)
+                continue
+            calculated = self._calculated_verdict(question)
+            if calculated:
+                verdicts[i] = calculated
+                continue
+            with self._review_lock:
+                cached = self._review_cache.get(self._review_key(question, topic))
+            if cached:
+                verdicts[i] = cached
+                continue
+            pending.append(i)
+
+        if pending and self._lm_review_available():
+            for start in range(0, len(pending), self.review_batch_size):
+                chunk = pending[start:start + self.review_batch_size]
+                batched = self._ai_review_batch([items[i] for i in chunk]) if len(chunk) > 1 else {}
+                for position, i in enumerate(chunk):
+                    verdict = batched.get(position) or self._ai_review_single(*items[i])
+                    if verdict:
+                        verdicts[i] = verdict
+                        self._remember_review(self._review_key(*items[i]), verdict)
+
+        # FALLBACK: Enhanced pattern matching if AI review not available
+        for i in pending:
+            if verdicts[i] is None:
+                verdicts[i] = self._pattern_review(items[i][0])
+        return verdicts
+
+    def _calculated_verdict(self, question: Question) -> Optional[tuple]:
+        """
+        (True, reason) for an MCQ whose answer key answer_checker confirms, or None.
+        A calculation that disagrees with the key may have misread the stem, so the
+        question goes on to the AI review (or pattern review) with its key unchanged.
+        """
+        if question.question_type != "MCQ":
+            return None
+        check = self.answer_checker.check(question.question, question.options, question.correct_answer_index)
+        if check.status == answer_checker.VERIFIED:
+            return True, check.reason
+        if check.decided:
+            logger.info(f"Calculation disagrees with the answer key, leaving it to review ({check.reason}): "
+                        f"{question.question[:80]}")
+        return None
+
+    def _lm_review_available(self) -> bool:
+        try:
+            return bool(self.lm_client and self.lm_client.is_available())
+        except AttributeError:
+            return False
+
+    @staticmethod
+    def _review_key(question: Question, topic: str) -> tuple:
+        return (topic, question.question_type, question.question, tuple(question.options or ()),
+                question.correct_answer_text)
+
+    def _remember_review(self, key: tuple, verdict: tuple) -> None:
+        with self._review_lock:
+            self._review_cache[key] = verdict
+            self._review_cache.move_to_end(key)
+            while len(self._review_cache) > self.REVIEW_CACHE_SIZE:
+                self._review_cache.popitem(last=False)
+
+    def _pre_review_rejection(self, question: Question) -> Optional[str]:
+        """Quick critical checks that reject a question before any AI review"""
         if not question or not question.question:
-            return False, "Question text is missing"
+            return "Question text is missing"
         
-        # Quick basic checks first (these are critical and fast)
         q_text = question.question
-        q_lower = q_text.lower()
         
         # Basic formatting check
         if '[Name]' in q_text or '[name]' in q_text:
-            return False, "Contains placeholder [Name]"
+            return "Contains placeholder [Name]"
         
-        # MCQ basic validation - check if correct answer makes sense for simple problems
+        # MCQ basic validation (whether the key is right is left to answer_checker)
         if question.question_type == "MCQ":
-            # Quick validation: Check simple division problems
-            # Pattern: "X m into Y equal pieces" -> answer should be approximately X ÷ Y
-            import re
-            division_match = re.search(r'(\d+(?:\.\d+)?)\s*(?:m|cm|km|kg|g|l|ml)?\s+(?:into|÷|divided by|/\s)\s*(\d+)\s+(?:equal\s+)?pieces?', q_lower)
-            if division_match:
-                try:
-                    dividend = float(division_match.group(1))
-                    divisor = float(division_match.group(2))
-                    expected = dividend / divisor
-                    # Get the correct answer value
-                    correct_str = question.correct_answer_text or ""
-                    correct_match = re.search(r'(\d+(?:\.\d+)?)', correct_str)
-                    if correct_match:
-                        correct_val = float(correct_match.group(1))
-                        # Check if correct answer is close to expected (within 10% tolerance)
-                        if abs(correct_val - expected) > max(expected * 0.1, 0.5):
-                            # Also check if any option is close to the correct answer
-                            options_have_correct = False
-                            for opt in question.options:
-                                opt_match = re.search(r'(\d+(?:\.\d+)?)', str(opt))
-                                if opt_match:
-                                    opt_val = float(opt_match.group(1))
-                                    if abs(opt_val - expected) <= max(expected * 0.1, 0.5):
-                                        options_have_correct = True
-                                        break
-                            if not options_have_correct:
-                                return False, f"MCQ division answer mismatch: expected ~{expected:.1f}, got {correct_val}, options don't match calculation"
-                except (ValueError, ZeroDivisionError):
-                    pass  # Skip if parsing fails
             if not question.options or len(question.options) < 4:
-                return False, f"MCQ has invalid options: {len(question.options) if question.options else 0} options"
+                return f"MCQ has invalid options: {len(question.options) if question.options else 0} options"
             
             # Check for placeholder options
             for opt in question.options:
                 opt_str = str(opt).lower().strip()
                 if re.match(r'^(option|choice)\s*\d+$', opt_str):
-                    return False, f"MCQ contains placeholder option: {opt}"
+                    return f"MCQ contains placeholder option: {opt}"
                 if not opt or not str(opt).strip():
-                    return False, "MCQ has empty option"
+                    return "MCQ has empty option"
         
         # Rule-based checks before consulting AI review
         rule_ok, rule_reason = self._manual_rule_checks(question)
         if not rule_ok:
-            return False, rule_reason
-        
-        # Now use AI to intelligently review the question
-        # Get LM client from the generator (it's passed to validator through generator)
-        # We need to find a way to access the LM client - let's check the structure
-        # Actually, we should pass lm_client to the validator
-        # For now, let's check if we can access it through the generator
-        # Actually, the validator might not have direct access to lm_client
-        # Let's add it to the validator's __init__
-        
-        # Build the AI review prompt
+            return rule_reason
+        return None
+
+    @staticmethod
+    def _review_prompt(question: Question, topic: str) -> str:
         review_prompt = f"""You are an expert PSLE Math teacher reviewing a question for a practice paper.
 
 QUESTION TO REVIEW:
 Topic: {topic}
 Type: {question.question_type}
 
-Question: {q_text}
+Question: {question.question}
 
 """
         
@@ -3184,41 +2588,7 @@ Correct Answer: {question.correct_answer_text if question.correct_answer_text el
 
 """
         
-        review_prompt += """TASK: Carefully review this question and determine if it should be APPROVED or REJECTED.
-
-Check for:
-1. **SOLVABILITY**: Can this question be solved with the information provided?
-   - If it mentions fractions/percentages (e.g., "3/4 of..." or "20% of..."), is the total/base amount explicitly stated?
-   - If it's a ratio problem, are there enough numbers or is a total mentioned?
-   - If it asks "how many", are there enough numbers/context to calculate?
-   - For speed/distance/time problems, are at least 2 of the 3 quantities provided?
-   - Does it have all the information needed to solve it?
-
-2. **QUALITY & CLARITY**: 
-   - Is the question clearly written and understandable?
-   - Does it have formatting issues, trailing fragments (like "? are" at the end), or incomplete sentences?
-   - **CRITICAL**: Does it have incomplete fractions (e.g., "3/" instead of "3/4") that make it unsolvable?
-   - Is it asking something that can be answered?
-
-3. **LOGICAL CONSISTENCY**:
-   - Does the question make mathematical sense?
-   - If asking for percentage increase, are initial and final values provided?
-   - Are the numbers realistic and appropriate for the problem type?
-
-4. **MCQ SPECIFIC** (if MCQ):
-   - Are all 4 options valid (not placeholders, not empty, not duplicates)?
-   - Do the options make sense as distractors?
-   - **CRITICAL**: Is the correct answer actually correct for the question? Verify the calculation:
-     * If question asks "X into Y equal pieces" or "X ÷ Y" or "X divided by Y", calculate X ÷ Y and check if the correct answer matches (within reasonable rounding)
-     * If question asks "How many...", verify the correct answer matches the calculation
-     * If question asks for area/volume/length, check units and values are reasonable
-     * If question asks about fractions/percentages, verify the correct answer matches the calculation
-     * **REJECT if correct answer doesn't match what the question is asking for** - this is a critical error
-     * Check if ALL options are wrong (none match the correct calculation) - this is also a critical error
-
-5. **COMPLETENESS**:
-   - Does the question have enough numbers/context for the type of problem?
-   - Is it missing any critical information?
+        review_prompt += "TASK: Carefully review this question and determine if it should be APPROVED or REJECTED." + REVIEW_CRITERIA + """
 
 RESPOND WITH JSON ONLY:
 {
@@ -3227,51 +2597,105 @@ RESPOND WITH JSON ONLY:
 }
 
 Be STRICT but FAIR. Only approve if the question is truly complete, solvable, and well-written. Reject if there are any critical issues that would make it unsolvable or confusing for students."""
+        return review_prompt
 
-        # Use AI-powered review with LM Studio if available
+    @staticmethod
+    def _batch_review_prompt(items: List[tuple]) -> str:
+        entries = []
+        for index, (question, topic) in enumerate(items):
+            entry = {"id": index, "topic": topic, "type": question.question_type, "question": question.question}
+            if question.question_type == "MCQ":
+                entry["options"] = list(question.options or [])
+                entry["correct_answer"] = question.correct_answer_text or "N/A"
+            entries.append(entry)
+        return f"""You are an expert PSLE Math teacher reviewing questions for a practice paper.
+
+QUESTIONS TO REVIEW (JSON array):
+{json.dumps(entries, ensure_ascii=False, indent=2)}
+
+TASK: Carefully review EACH question independently and determine if it should be APPROVED or REJECTED.""" + REVIEW_CRITERIA + """
+
+RESPOND WITH A JSON ARRAY ONLY, one object per question, in the same order:
+[
+  {"id": 0, "approved": true or false, "reason": "Brief explanation"}
+]
+
+Be STRICT but FAIR. Only approve a question if it is truly complete, solvable, and well-written."""
+
+    @staticmethod
+    def _ai_verdict(result: Dict) -> tuple:
+        approved = result.get("approved", False)
+        reason = result.get("reason", "No reason provided")
+        if approved is True or str(approved).strip().lower() == "true":
+            logger.info(f"AI REVIEW: APPROVED - {reason}")
+            return True, "Approved by AI review"
+        logger.warning(f"AI REVIEW: REJECTED - {reason}")
+        return False, f"AI Review: {reason}"
+
+    def _ai_review_single(self, question: Question, topic: str) -> Optional[tuple]:
+        """One-question AI review; None when the model is unavailable or its reply is unusable"""
         try:
-            if self.lm_client and self.lm_client.is_available():
-                response, success = self.lm_client.chat(
-                    messages=[{"role": "user", "content": review_prompt}],
-                    temperature=0.1,  # Low temperature for consistent validation
-                    max_tokens=200,
-                )
-                if success and response:
-                    try:
-                        # Try to parse JSON response
-                        # Sometimes the model wraps JSON in markdown, so clean it
-                        response_clean = response.strip()
-                        if response_clean.startswith('```'):
-                            # Extract JSON from markdown code block
-                            json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_clean, re.DOTALL)
-                            if json_match:
-                                response_clean = json_match.group(1)
-                        
-                        result = json.loads(response_clean)
-                        approved = result.get("approved", False)
-                        reason = result.get("reason", "No reason provided")
-                        
-                        if approved:
-                            rule_ok, rule_reason = self._manual_rule_checks(question)
-                            if not rule_ok:
-                                return False, rule_reason
-                            logger.info(f"AI REVIEW: APPROVED - {reason}")
-                            return True, "Approved by AI review"
-                        else:
-                            logger.warning(f"AI REVIEW: REJECTED - {reason}")
-                            return False, f"AI Review: {reason}"
-                    except (json.JSONDecodeError, KeyError) as e:
-                        logger.warning(f"AI review response parsing failed: {e}, response: {response[:200]}")
-                        # Fall through to enhanced pattern matching
+            response, success = self.lm_client.chat(
+                messages=[{"role": "user", "content": self._review_prompt(question, topic)}],
+                temperature=0.1,  # Low temperature for consistent validation
+                max_tokens=200,
+            )
         except AttributeError:
-            # No LM client available, fall through to enhanced pattern matching
-            pass
-        
-        # FALLBACK: Enhanced pattern matching if AI review not available
-        # Run rule checks again in case AI path was unavailable
-        rule_ok, rule_reason = self._manual_rule_checks(question)
-        if not rule_ok:
-            return False, rule_reason
+            return None
+        if not success or not response:
+            return None
+        try:
+            # Sometimes the model wraps JSON in markdown, so clean it
+            response_clean = response.strip()
+            if response_clean.startswith('```'):
+                json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', response_clean, re.DOTALL)
+                if json_match:
+                    response_clean = json_match.group(1)
+            result = json.loads(response_clean)
+            if not isinstance(result, dict):
+                raise ValueError("review reply is not a JSON object")
+            return self._ai_verdict(result)
+        except ValueError as e:
+            logger.warning(f"AI review response parsing failed: {e}, response: {response[:200]}")
+            return None
+
+    def _ai_review_batch(self, items: List[tuple]) -> Dict[int, tuple]:
+        """Review several questions in one LM call; returns verdicts by position for the items the reply covered"""
+        try:
+            response, success = self.lm_client.chat(
+                messages=[{"role": "user", "content": self._batch_review_prompt(items)}],
+                temperature=0.1,
+                max_tokens=120 * len(items) + 80,
+            )
+        except AttributeError:
+            return {}
+        if not success or not response:
+            return {}
+        start, end = response.find('['), response.rfind(']')
+        try:
+            results = json.loads(response[start:end + 1], strict=False) if 0 <= start < end else None
+        except ValueError:
+            results = None
+        if not isinstance(results, list):
+            logger.warning(f"Batched AI review reply unusable, reviewing {len(items)} questions one by one: {response[:200]}")
+            return {}
+        verdicts = {}
+        for position, result in enumerate(results):
+            if not isinstance(result, dict):
+                continue
+            index = result.get("id", position)
+            if isinstance(index, str) and index.strip().isdigit():
+                index = int(index)
+            if isinstance(index, int) and 0 <= index < len(items) and index not in verdicts:
+                verdicts[index] = self._ai_verdict(result)
+        if len(verdicts) < len(items):
+            logger.info(f"Batched AI review covered {len(verdicts)}/{len(items)} questions; reviewing the rest one by one")
+        return verdicts
+
+    def _pattern_review(self, question: Question) -> tuple:
+        """Review without the model: the rule checks already passed, add MCQ and clarity checks"""
+        q_text = question.question
+        q_lower = q_text.lower()
         
         # Additional MCQ-specific duplicate option check
         if question.question_type == "MCQ":
@@ -3296,132 +2720,256 @@ Be STRICT but FAIR. Only approve if the question is truly complete, solvable, an
     
     def get_quality_score(self, question: Question) -> int:
         """Score PSLE P6 suitability (0–10) with signals aligned to curriculum expectations."""
-        score = 0
-        qt = (question.question or "").lower()
-
-        # 1) Length (0–2): broader acceptable window; avoid over-penalizing multi-line stems
-        qlen = len(question.question or "")
-        if 60 <= qlen <= 220:
-            score += 2
-        elif 40 <= qlen <= 300:
-            score += 1
-
-        # 2) Topic indicators (0–2): presence of PSLE-relevant math terms
-        psle_terms = [
-            'fraction', 'decimal', 'percentage', 'ratio', 'proportion',
-            'area', 'perimeter', 'volume', 'capacity', 'speed', 'distance', 'time',
-            'angle', 'triangle', 'rectangle', 'circle', 'algebra', 'equation',
-            'average', 'mean', 'data', 'graph', 'chart', 'mass', 'weight', 'length', 'height', 'width', 'unit'
-        ]
-        if any(t in qt for t in psle_terms):
-            score += 2
+        return question_rules.evaluate(question, stages=(), score=True).score
 
-        # 3) Application verbs and question words (0–2)
-        if any(w in qt for w in ['calculate', 'find', 'determine', 'solve', 'how many', 'how much']):
-            score += 2
-        elif any(w in qt for w in ['what is', 'what', 'work out']):
-            score += 1
+class PDFFormattingAgent:
+    """Specialized agent for professional PDF formatting
+
+    Packs questions onto pages by their measured size. Every flowable is wrapped at
+    the frame's width and placed the way a platypus Frame places it (no space before
+    the first flowable on a page, a flowable's space before overlapping the previous
+    one's space after), so a question only moves to the next page when it really
+    would not fit on the current one.
+    """
+
+    # SimpleDocTemplate's frame pads its content by this much on every side
+    FRAME_PADDING = 6
+    # Tolerance of platypus' own fit check (rl_config._FUZZ)
+    FIT_TOLERANCE = 1e-6
+
+    def __init__(self, frame_width: float = 612 - 2 * 72 - 2 * FRAME_PADDING,
+                 frame_height: float = 792 - 2 * 72 - 2 * FRAME_PADDING):
+        # Defaults: Letter page with 1 inch margins
+        self.frame_width = frame_width
+        self.frame_height = frame_height
+        self.pages = 1
+        self.reset_page()
+
+    @classmethod
+    def for_document(cls, doc) -> "PDFFormattingAgent":
+        return cls(doc.width - 2 * cls.FRAME_PADDING, doc.height - 2 * cls.FRAME_PADDING)
 
-        # 4) Data richness (numbers) (0–1)
-        import re as _re
-        nums = _re.findall(r"\b\d+(?:[.,]\d+)?\b", qt)
-        if len(nums) >= 2:
-            score += 1
-
-        # 5) Units present (0–1)
-        if any(_re.search(rf"\b{u}\b", qt) for u in ['cm','m','km','mm','kg','g','mg','l','ml','minutes','minute','hours','hour','seconds','second']):
-            score += 1
-
-        # 6) Multi-step cues (0–2)
-        if any(w in qt for w in ['then', 'after', 'next', 'remaining', 'altogether', 'in total', 'finally', 'first']):
-            score += 2
-
-        # 7) Format compliance (0–1)
-        if question.question_type == 'MCQ':
-            opts = question.options or []
-            if len(opts) == 4:
-                # credit if at least 3 numeric-like options
-                numeric_like = 0
-                for o in opts:
-                    s = _re.sub(r"^[\s]*[A-D]\)\s*", "", o, flags=_re.IGNORECASE)
-                    if _re.search(r"^\$?\s*-?(?:\d+(?:[.,]\d+)?|\d+\s*/\s*\d+)\s*(?:[a-z%°c]+)?\s*$", s, flags=_re.IGNORECASE):
-                        numeric_like += 1
-                if numeric_like >= 3:
-                    score += 1
-        else:
-            if any(w in qt for w in ['show your working', 'working', 'steps', 'explain']):
-                score += 1
+    def reset_page(self):
+        """Start a new, empty page"""
+        self.remaining_height = self.frame_height
+        self.at_top = True
+        self._previous_space_after = 0.0
+
+    def _place(self, flowables, state):
+        """(remaining height, at top, previous space after) once `flowables` are placed, or None if they don't fit"""
+        remaining, at_top, previous_space_after = state
+        for flowable in flowables:
+            space_before = 0.0 if at_top else max(flowable.getSpaceBefore() - previous_space_after, 0)
+            if remaining - space_before <= 0:
+                return None
+            _, height = flowable.wrap(self.frame_width, remaining - space_before)
+            if remaining - space_before - height < -self.FIT_TOLERANCE:
+                return None
+            space_after = flowable.getSpaceAfter()
+            used = space_before + height + space_after
+            remaining -= used
+            previous_space_after = space_after
+            at_top = at_top and not used
+        return remaining, at_top, previous_space_after
+
+    def fits(self, flowables) -> bool:
+        """Whether `flowables` fit whole on the rest of the current page"""
+        return self._place(flowables, (self.remaining_height, self.at_top, self._previous_space_after)) is not None
+
+    def add(self, flowables):
+        """Track flowables placed on the page; one that no longer fits continues on the next page"""
+        for flowable in flowables:
+            state = self._place([flowable], (self.remaining_height, self.at_top, self._previous_space_after))
+            if state is None:
+                self.pages += 1
+                self.reset_page()
+                state = self._place([flowable], (self.remaining_height, True, 0.0)) or (0.0, False, 0.0)
+            self.remaining_height, self.at_top, self._previous_space_after = state
+
+    def add_question(self, flowables) -> bool:
+        """Place one question's flowables, keeping them on one page; True when it starts a new page"""
+        new_page = not self.at_top and not self.fits(flowables)
+        if new_page:
+            self.new_page()
+        self.add(flowables)
+        return new_page
+
+    def new_page(self):
+        """An explicit page break"""
+        self.pages += 1
+        self.reset_page()
+
+# LaTeX-style fractions, rewritten as ReportLab markup in this order
+_LATEX_FRACTION_PATTERNS = [re.compile(pattern) for pattern in (
+    r'\\?\(frac\{([^}]+)\}\{([^}]+)\}\)',  # \(frac{3}{4}\) - with parentheses and backslash
+    r'\\frac\{([^}]+)\}\{([^}]+)\}',         # \frac{3}{4} - standard LaTeX
+    r'frac\{([^}]+)\}\{([^}]+)\}',           # frac{3}{4} - without backslash
+    r'\(frac\{([^}]+)\}\{([^}]+)\}\)',       # (frac{3}{4}) - with parentheses only
+)]
+# Simple fractions like 3/4 (but not in URLs or complex expressions)
+_SIMPLE_FRACTION = re.compile(r'(?<!\w)(\d+)/(\d+)(?!\w)')
+# Mixed numbers like 1 3/4
+_MIXED_NUMBER = re.compile(r'(\d+)\s+(\d+)/(\d+)')
+# "A) ", "2. " labels the model sometimes puts in front of options
+_OPTION_LABEL = re.compile(r'^\s*([A-D]|[1-4])[\)\.]\s+')
+
+
+def _fraction_markup(match) -> str:
+    numerator = match.group(1).strip()
+    denominator = match.group(2).strip()
+    return f'<font size="8"><sup>{numerator}</sup></font>/<font size="8"><sub>{denominator}</sub></font>'
+
+
+def convert_latex_fractions(text):
+    """Convert LaTeX fractions to proper ReportLab formatting"""
+    if not text:
+        return text
+    # Every pattern needs "frac" or a slash; most stems have neither
+    if "frac" in text:
+        for pattern in _LATEX_FRACTION_PATTERNS:
+            text = pattern.sub(_fraction_markup, text)
+    if "/" in text:
+        text = _SIMPLE_FRACTION.sub(r'<font size="8"><sup>\1</sup></font>/<font size="8"><sub>\2</sub></font>', text)
+        text = _MIXED_NUMBER.sub(r'\1<font size="8"><sup>\2</sup></font>/<font size="8"><sub>\3</sub></font>', text)
+    return text
+
+
+# Bump whenever a change to PaperFormatter alters the rendered pages, so cached papers aren't reused
+PDF_LAYOUT_VERSION = 1
+
+
+@lru_cache(maxsize=None)
+def _paragraph_class():
+    """Paragraph that keeps its line breaking when wrapped again at the same width.
+
+    PDFFormattingAgent measures each question before platypus lays it out, and
+    Paragraph.wrap breaks the lines again on every call. Paragraph.split drops the
+    line breaking when it pushes a paragraph to the next page, so that re-wraps too.
+    """
+    from reportlab.platypus import Paragraph
+
+    class MeasuredParagraph(Paragraph):
+        def wrap(self, availWidth, availHeight):
+            if getattr(self, "_wrapped_width", None) != availWidth or not hasattr(self, "blPara"):
+                super().wrap(availWidth, availHeight)
+                self._wrapped_width = availWidth
+            return self.width, self.height
+
+    return MeasuredParagraph
+
+
+@lru_cache(maxsize=None)
+def _pdf_styles() -> Dict:
+    """Paragraph styles of the paper, built once per process (ReportLab is imported on first use).
+
+    Styles are only read while a document is built, so every paper and thread shares them.
+    The built-in Helvetica family is used, so there are no fonts to register.
+    """
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+    styles = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            spaceAfter=30,
+            alignment=1  # Center alignment
+        ),
+        "info": ParagraphStyle(
+            'Info',
+            parent=styles['Normal'],
+            fontSize=10,
+            spaceAfter=12
+        ),
+        # Questions - Optimized spacing for better readability
+        "question": ParagraphStyle(
+            'Question',
+            parent=styles['Normal'],
+            fontSize=12,
+            spaceAfter=12,  # Reduced from 18 to prevent large gaps
+            spaceBefore=6,  # Reduced from 8
+            leftIndent=0,
+            leading=18  # Increased line spacing for better readability
+        ),
+        "option": ParagraphStyle(
+            'Option',
+            parent=styles['Normal'],
+            fontSize=10,
+            spaceAfter=6,  # Reduced from 8
+            spaceBefore=2,  # Reduced from 4
+            leftIndent=20,
+            leading=16  # Increased line spacing
+        ),
+        "section": ParagraphStyle(
+            'SectionHeader',
+            parent=styles['Heading2'],
+            fontSize=14,
+            spaceAfter=20,
+            alignment=0  # Left alignment
+        ),
+        # Answer key lines
+        "answer": ParagraphStyle(
+            'Answer',
+            parent=styles['Normal'],
+            fontSize=11,
+            spaceAfter=6,
+            leading=16
+        ),
+    }
 
-        # 8) Mild penalty for overused contexts (max -1)
-        overused = ['canteen', 'shopping', 'mall', 'supermarket', 'pizza', 'ice cream']
-        if sum(1 for t in overused if t in qt) >= 1:
-            score -= 1
 
-        return max(0, min(10, score))
+@dataclass
+class _PreparedQuestion:
+    """A question's number and ReportLab markup, converted once for the paper and its answer key"""
+    question: Question
+    number: int
+    text: str
+    options: List[str]
 
-class PDFFormattingAgent:
-    """Specialized agent for professional PDF formatting"""
-    
-    def __init__(self):
-        self.page_height = 792  # Letter size height in points
-        self.margin = 72  # 1 inch margins
-        self.content_height = self.page_height - (2 * self.margin)
-        self.current_page_height = 0
-        self.questions_per_page = 0
-        self.max_questions_per_page = 7  # Fit more questions per page when space allows
-    
-    def estimate_question_height(self, question_text, question_type):
-        """Estimate the height needed for a complete question"""
-        # More accurate height estimation based on actual content
-        # Count words and estimate lines (assuming ~12 words per line)
-        word_count = len(question_text.split())
-        estimated_lines = max(1, word_count // 12)
-        
-        # Base height for question text (more conservative)
-        base_height = max(30, estimated_lines * 18)  # ~18 points per line
-        
-        if question_type == "MCQ":
-            # Add space for 4 options + spacing (more conservative)
-            return base_height + 110  # ~27 points per option
+
+def _prepare_questions(questions: List[Question]) -> List[_PreparedQuestion]:
+    prepared = []
+    # Track question numbers for each section
+    mcq_count = 0
+    open_ended_count = 0
+    for question in questions:
+        # Determine question number based on type
+        if question.question_type == "MCQ":
+            mcq_count += 1
+            question_num = mcq_count
         else:
-            # Add space for working area (increase to avoid split of 'Answer:')
-            return base_height + 120
-    
-    def should_break_before_question(self, question_text, question_type):
-        """Determine if we should break before this question to avoid cutting it off"""
-        question_height = self.estimate_question_height(question_text, question_type)
-        
-        # Add buffer space to prevent questions from being cut off
-        buffer_space = 100  # Extra space for safety to avoid orphaned lines
-        
-        # If adding this question would exceed page capacity, break before it
-        if self.current_page_height + question_height + buffer_space > self.content_height:
-            return True
-        
-        # If we already have many questions on this page, consider breaking
-        if self.questions_per_page >= self.max_questions_per_page:
-            return True
-            
-        return False
-    
-    def add_question_to_page(self, question_text, question_type):
-        """Track that we've added a question to the current page"""
-        question_height = self.estimate_question_height(question_text, question_type)
-        # Add extra height for spacing between questions
-        spacing_height = 12  # Height of Spacer(1, 12)
-        self.current_page_height += question_height + spacing_height
-        self.questions_per_page += 1
-    
-    def reset_page(self):
-        """Reset counters for a new page"""
-        self.current_page_height = 0
-        self.questions_per_page = 0
+            open_ended_count += 1
+            question_num = open_ended_count
+
+        options = []
+        if question.question_type == "MCQ" and question.options:
+            # Ensure exactly 4 options for MCQ, padding with generic options if needed
+            raw_options = question.options[:4]
+            raw_options += [f"Option {i+1}" for i in range(len(raw_options), 4)]
+            options = [convert_latex_fractions(_OPTION_LABEL.sub('', opt).strip()) for opt in raw_options]
+
+        # Convert LaTeX fractions to proper HTML format
+        prepared.append(_PreparedQuestion(question, question_num, convert_latex_fractions(question.question), options))
+    return prepared
+
 
 class PaperFormatter:
-    """Paper formatter"""
+    """Paper formatter
+
+    With a `pdf_cache`, papers are rendered once per question set: the cached document has
+    a blank header area and each request's header is stamped onto its first page (this needs
+    PyPDF2; without it every paper is rendered in full).
+
+    `save_to_pdf` can also write the answer key, and a booklet of the paper followed by its
+    answer key, in the same pass: the questions are numbered and converted to markup once.
+    """
     
-    def __init__(self):
+    def __init__(self, pdf_cache: Optional[PaperPDFCache] = None):
         self.pdf_agent = PDFFormattingAgent()
+        self.pdf_cache = pdf_cache if pdf_merging_available() else None
+        if pdf_cache is not None and self.pdf_cache is None:
+            logger.info("PDF cache disabled: PyPDF2 is not installed")
     
     def format_paper(self, paper_data: Dict) -> str:
         """Format paper data into a readable string"""
@@ -3446,192 +2994,212 @@ class PaperFormatter:
         
         return "\n".join(output)
     
-    def save_to_pdf(self, paper_data: Dict, filename: str) -> bool:
-        """Save paper to PDF"""
-        try:
-            import os
-            from reportlab.lib.pagesizes import letter
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, KeepTogether, ListFlowable, ListItem
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            from reportlab.lib.units import inch
-            import re
+    def save_to_pdf(self, paper_data: Dict, filename: Union[str, BinaryIO],
+                    answer_key: Optional[Union[str, BinaryIO]] = None,
+                    booklet: Optional[Union[str, BinaryIO]] = None) -> bool:
+        """Save paper to PDF, either to a file path or into a writable binary stream (e.g. io.BytesIO)
 
+        `answer_key` and `booklet` (paths or streams) additionally receive the answer key and
+        marking scheme, and the paper followed by it.
+        """
+        try:
             # Ensure output directory exists
-            output_dir = os.path.dirname(filename) or "."
-            os.makedirs(output_dir, exist_ok=True)
-            
-            def convert_latex_fractions(text):
-                """Convert LaTeX fractions to proper ReportLab formatting"""
-                if not text:
-                    return text
-                
-                # Convert (frac{numerator}{denominator}) to proper fractions
-                def replace_fraction(match):
-                    numerator = match.group(1).strip()
-                    denominator = match.group(2).strip()
-                    return f'<font size="8"><sup>{numerator}</sup></font>/<font size="8"><sub>{denominator}</sub></font>'
-                
-                # Handle various LaTeX fraction formats
-                # Pattern 1: \(frac{3}{4}\) - with parentheses and backslash
-                text = re.sub(r'\\?\(frac\{([^}]+)\}\{([^}]+)\}\)', replace_fraction, text)
-                # Pattern 2: \frac{3}{4} - standard LaTeX
-                text = re.sub(r'\\frac\{([^}]+)\}\{([^}]+)\}', replace_fraction, text)
-                # Pattern 3: frac{3}{4} - without backslash
-                text = re.sub(r'frac\{([^}]+)\}\{([^}]+)\}', replace_fraction, text)
-                # Pattern 4: (frac{3}{4}) - with parentheses only
-                text = re.sub(r'\(frac\{([^}]+)\}\{([^}]+)\}\)', replace_fraction, text)
-                
-                # Handle simple fractions like 3/4 (but not in URLs or complex expressions)
-                text = re.sub(r'(?<!\w)(\d+)/(\d+)(?!\w)', r'<font size="8"><sup>\1</sup></font>/<font size="8"><sub>\2</sub></font>', text)
-                
-                # Handle mixed numbers like 1 3/4
-                text = re.sub(r'(\d+)\s+(\d+)/(\d+)', r'\1<font size="8"><sup>\2</sup></font>/<font size="8"><sub>\3</sub></font>', text)
-                
-                return text
-            
-            doc = SimpleDocTemplate(filename, pagesize=letter)
-            # Allow flowables to split to avoid overflows
-            doc.allowSplitting = 1
-            styles = getSampleStyleSheet()
-            story = []
+            for target in (filename, answer_key, booklet):
+                if isinstance(target, str):
+                    output_dir = os.path.dirname(target) or "."
+                    os.makedirs(output_dir, exist_ok=True)
+
+            prepared = _prepare_questions(paper_data['questions'])
+            # A booklet reuses the rendered paper's pages when PDFs can be merged
+            merge_booklet = booklet is not None and pdf_merging_available()
+            paper_pdf = None
+            if self.pdf_cache is not None:
+                paper_pdf = self._render_with_cache(paper_data, prepared)
+            elif merge_booklet:
+                buffer = io.BytesIO()
+                self._build_pdf(paper_data, prepared, buffer, self._header_flowables(paper_data))
+                paper_pdf = buffer.getvalue()
+            else:
+                self._build_pdf(paper_data, prepared, filename, self._header_flowables(paper_data))
+            if paper_pdf is not None:
+                self._write_pdf(filename, paper_pdf)
+
+            if answer_key is not None or booklet is not None:
+                key_buffer = io.BytesIO()
+                self._new_document(key_buffer).build(self._answer_key_flowables(paper_data, prepared))
+                if answer_key is not None:
+                    self._write_pdf(answer_key, key_buffer.getvalue())
+                if merge_booklet:
+                    self._write_pdf(booklet, concatenate_pdfs(paper_pdf, key_buffer.getvalue()))
+                elif booklet is not None:
+                    from reportlab.platypus import PageBreak
+                    self._build_pdf(paper_data, prepared, booklet, self._header_flowables(paper_data),
+                                    trailer=[PageBreak()] + self._answer_key_flowables(paper_data, prepared))
+            return True
             
+        except Exception as e:
+            logger.error(f"Failed to save PDF: {e}")
+            return False
+
+    @staticmethod
+    def _write_pdf(target: Union[str, BinaryIO], pdf: bytes) -> None:
+        if isinstance(target, str):
+            with open(target, "wb") as f:
+                f.write(pdf)
+        else:
+            target.write(pdf)
+
+    @staticmethod
+    def _new_document(target: Union[str, BinaryIO]):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.platypus import SimpleDocTemplate
+
+        doc = SimpleDocTemplate(target, pagesize=letter)
+        # Allow flowables to split to avoid overflows
+        doc.allowSplitting = 1
+        return doc
+
+    @staticmethod
+    def _header_flowables(paper_data: Dict) -> List:
+        """Title and paper info at the top of the first page"""
+        from reportlab.platypus import Spacer
+        Paragraph = _paragraph_class()
+
+        styles = _pdf_styles()
+        info_style = styles["info"]
+        return [
             # Title
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=16,
-                spaceAfter=30,
-                alignment=1  # Center alignment
-            )
-            story.append(Paragraph(paper_data['title'], title_style))
-            story.append(Spacer(1, 20))
-            
+            Paragraph(paper_data['title'], styles["title"]),
+            Spacer(1, 20),
             # Paper info
-            info_style = ParagraphStyle(
-                'Info',
-                parent=styles['Normal'],
-                fontSize=10,
-                spaceAfter=12
-            )
-            story.append(Paragraph(f"Total Questions: {paper_data['total_questions']}", info_style))
-            story.append(Paragraph(f"Topics: {', '.join(paper_data['topics_covered'])}", info_style))
-            story.append(Paragraph(f"Generated: {paper_data['generated_at']}", info_style))
-            story.append(Spacer(1, 20))
-            
-            # Questions - Optimized spacing for better readability
-            question_style = ParagraphStyle(
-                'Question',
-                parent=styles['Normal'],
-                fontSize=12,
-                spaceAfter=12,  # Reduced from 18 to prevent large gaps
-                spaceBefore=6,  # Reduced from 8
-                leftIndent=0,
-                leading=18  # Increased line spacing for better readability
-            )
-            
-            option_style = ParagraphStyle(
-                'Option',
-                parent=styles['Normal'],
-                fontSize=10,
-                spaceAfter=6,  # Reduced from 8
-                spaceBefore=2,  # Reduced from 4
-                leftIndent=20,
-                leading=16  # Increased line spacing
-            )
-            
-            # Track question numbers for each section
-            mcq_count = 0
-            open_ended_count = 0
-            
-            # Initialize formatting agent
-            formatting_agent = PDFFormattingAgent()
-            
-            # Add section header for MCQ questions at the beginning
-            if paper_data['questions'] and paper_data['questions'][0].question_type == "MCQ":
-                section_style = ParagraphStyle(
-                    'SectionHeader',
-                    parent=styles['Heading2'],
-                    fontSize=14,
-                    spaceAfter=20,
-                    alignment=0  # Left alignment
-                )
-                story.append(Paragraph("<b>MULTIPLE CHOICE QUESTIONS</b>", section_style))
-                story.append(Spacer(1, 10))
+            Paragraph(f"Total Questions: {paper_data['total_questions']}", info_style),
+            Paragraph(f"Topics: {', '.join(paper_data['topics_covered'])}", info_style),
+            Paragraph(f"Generated: {paper_data['generated_at']}", info_style),
+            Spacer(1, 20),
+        ]
+
+    def _render_with_cache(self, paper_data: Dict, prepared: List[_PreparedQuestion]) -> bytes:
+        """The paper's pages from the cache (rendered on a miss) with this paper's header stamped on"""
+        from reportlab.platypus import Spacer
+
+        header = self._header_flowables(paper_data)
+        header_buffer = io.BytesIO()
+        header_doc = self._new_document(header_buffer)
+        measure = PDFFormattingAgent.for_document(header_doc)
+        measure.add(header)
+        header_height = measure.frame_height - measure.remaining_height
+        key = paper_cache_key(paper_data, header_height, PDF_LAYOUT_VERSION)
+
+        try:
+            body = self.pdf_cache.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"PDF cache unavailable: {e}")
+            body = None
+        if body is None:
+            buffer = io.BytesIO()
+            # A blank area exactly as tall as the header keeps every page laid out the same
+            self._build_pdf(paper_data, prepared, buffer, [Spacer(1, header_height)])
+            body = buffer.getvalue()
+            try:
+                self.pdf_cache.put(key, body)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not cache rendered paper: {e}")
+
+        header_doc.build(header)
+        return stamp_header(body, header_buffer.getvalue())
+
+    def _answer_key_flowables(self, paper_data: Dict, prepared: List[_PreparedQuestion]) -> List:
+        """Answer key and marking scheme: the correct option or answer and the marks of each question"""
+        from reportlab.platypus import Spacer
+        Paragraph = _paragraph_class()
+
+        styles = _pdf_styles()
+        info_style = styles["info"]
+        total_marks = sum(item.question.marks for item in prepared)
+        flowables = [
+            Paragraph(f"Answer Key: {paper_data['title']}", styles["title"]),
+            Spacer(1, 20),
+            Paragraph(f"Total Questions: {paper_data['total_questions']}", info_style),
+            Paragraph(f"Total Marks: {total_marks}", info_style),
+            Paragraph(f"Generated: {paper_data['generated_at']}", info_style),
+            Spacer(1, 20),
+        ]
+        section = None
+        for item in prepared:
+            question = item.question
+            if question.question_type != section:
+                section = question.question_type
+                heading = "MULTIPLE CHOICE QUESTIONS" if section == "MCQ" else "OPEN-ENDED QUESTIONS"
+                flowables.append(Paragraph(f"<b>{heading}</b>", styles["section"]))
+            if item.options and 0 <= question.correct_answer_index < len(item.options):
+                answer = f"{question.correct_answer_index + 1}. {item.options[question.correct_answer_index]}"
+            else:
+                answer = convert_latex_fractions(str(question.correct_answer_text or ''))
+            marks = f"{question.marks} mark{'s' if question.marks > 1 else ''}"
+            flowables.append(Paragraph(f"<b>Question {item.number}</b> ({marks}): {answer}", styles["answer"]))
+        return flowables
+
+    def _build_pdf(self, paper_data: Dict, prepared: List[_PreparedQuestion], target: Union[str, BinaryIO],
+                   header: List, trailer: List = ()) -> None:
+        """Lay out the paper below `header` (and above `trailer`) and write it to `target`"""
+        from reportlab.platypus import Spacer, PageBreak
+        Paragraph = _paragraph_class()
+
+        doc = self._new_document(target)
+        styles = _pdf_styles()
+        story = list(header)
+        # Packs whole questions onto pages by their measured height
+        formatting_agent = PDFFormattingAgent.for_document(doc)
+        
+        question_style = styles["question"]
+        option_style = styles["option"]
+        section_style = styles["section"]
+        
+        # Add section header for MCQ questions at the beginning
+        if prepared and prepared[0].question.question_type == "MCQ":
+            story.append(Paragraph("<b>MULTIPLE CHOICE QUESTIONS</b>", section_style))
+            story.append(Spacer(1, 10))
+        # Track the title, paper info and section header height
+        formatting_agent.add(story)
+        
+        for item in prepared:
+            question, question_num, converted_question = item.question, item.number, item.text
+            # Add section header for first open-ended question
+            if question.question_type == "Open-ended" and question_num == 1:
+                # Add page break before open-ended section
+                story.append(PageBreak())
+                formatting_agent.new_page()
+                header = [Paragraph("<b>OPEN-ENDED QUESTIONS</b>", section_style), Spacer(1, 10)]
                 # Track the section header height
-                formatting_agent.add_question_to_page("Section Header", "MCQ")
+                formatting_agent.add(header)
+                story.extend(header)
             
-            for i, question in enumerate(paper_data['questions']):
-                # Add section header for first open-ended question
-                if question.question_type == "Open-ended" and open_ended_count == 0:
-                    # Add page break before open-ended section
-                    story.append(PageBreak())
-                    formatting_agent.reset_page()  # Reset page counter for new section
-                    section_style = ParagraphStyle(
-                        'SectionHeader',
-                        parent=styles['Heading2'],
-                        fontSize=14,
-                        spaceAfter=20,
-                        alignment=0  # Left alignment
-                    )
-                    story.append(Paragraph("<b>OPEN-ENDED QUESTIONS</b>", section_style))
-                    story.append(Spacer(1, 10))
-                    # Track the section header height
-                    formatting_agent.add_question_to_page("Section Header", "Open-ended")
-                
-                # Determine question number based on type
-                if question.question_type == "MCQ":
-                    mcq_count += 1
-                    question_num = mcq_count
-                else:
-                    open_ended_count += 1
-                    question_num = open_ended_count
-                
-                # Convert LaTeX fractions to proper HTML format
-                converted_question = convert_latex_fractions(question.question)
-                
-                # Smart page breaking - only break if question would be cut off
-                if formatting_agent.should_break_before_question(converted_question, question.question_type):
-                    story.append(PageBreak())
-                    formatting_agent.reset_page()
-                    formatting_agent.reset_page()
-                question_header = f"<b>Question {question_num} ({question.question_type}) - {question.marks} mark{'s' if question.marks > 1 else ''}:</b> {converted_question}"
-                story.append(Paragraph(question_header, question_style))
-                story.append(Spacer(1, 4))  # Reduced from 6 to prevent large gaps
-
-                if question.question_type == "MCQ" and question.options:
-                    # Ensure exactly 4 options for MCQ
-                    import re as _re
-                    options = question.options[:4]  # Take only first 4 options
-                    if len(options) < 4:
-                        # Pad with generic options if needed
-                        for i in range(len(options), 4):
-                            options.append(f"Option {i+1}")
-                    
-                    # Render options as numbered paragraphs
-                    for idx, opt in enumerate(options, 1):
-                        cleaned = _re.sub(r'^\s*([A-D]|[1-4])[\)\.]\s+', '', opt).strip()
-                        cleaned = convert_latex_fractions(cleaned)
-                        story.append(Paragraph(f"{idx}. {cleaned}", option_style))
-                    story.append(Spacer(1, 6))  # Reduced from 8
-                else:
-                    # Open-ended: provide working area
-                    story.append(Paragraph("Show your working:", option_style))
-                    story.append(Spacer(1, 20))  # Reduced from 24
-                    story.append(Paragraph("Answer: ________________", option_style))
-                    story.append(Spacer(1, 6))  # Reduced from 8
-                
-                # Add spacing between questions
-                story.append(Spacer(1, 12))  # Reduced from 20 to prevent large gaps
-                
-                # Track this question in the formatting agent
-                formatting_agent.add_question_to_page(converted_question, question.question_type)
+            question_header = f"<b>Question {question_num} ({question.question_type}) - {question.marks} mark{'s' if question.marks > 1 else ''}:</b> {converted_question}"
+            flowables = [Paragraph(question_header, question_style)]
+            flowables.append(Spacer(1, 4))  # Reduced from 6 to prevent large gaps
+
+            if item.options:
+                # Render options as numbered paragraphs
+                for idx, option in enumerate(item.options, 1):
+                    flowables.append(Paragraph(f"{idx}. {option}", option_style))
+                flowables.append(Spacer(1, 6))  # Reduced from 8
+            else:
+                # Open-ended: provide working area
+                flowables.append(Paragraph("Show your working:", option_style))
+                flowables.append(Spacer(1, 20))  # Reduced from 24
+                flowables.append(Paragraph("Answer: ________________", option_style))
+                flowables.append(Spacer(1, 6))  # Reduced from 8
             
-            doc.build(story)
-            return True
+            # Add spacing between questions
+            flowables.append(Spacer(1, 12))  # Reduced from 20 to prevent large gaps
             
-        except Exception as e:
-            logger.error(f"Failed to save PDF: {e}")
-            return False
+            # Keep the question whole: start a new page only if it doesn't fit on this one
+            if formatting_agent.add_question(flowables):
+                story.append(PageBreak())
+            story.extend(flowables)
+        
+        story.extend(trailer)
+        doc.build(story)
 
 def main():
     """Main function"""
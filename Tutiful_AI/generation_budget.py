@@ -0,0 +1,81 @@
+"""
+Wall-clock budget for generating one paper.
+
+A slow LM server must not keep a paper job busy for many minutes. As the
+deadline approaches the generator gives up its expensive stages one by one
+(quality nudge, AI review, LM generation) and falls back to curated originals
+and local variations; once the budget is spent the best-effort fallback and
+top-up phases stop. Every stage skipped is counted so the paper can report
+how it was degraded.
+"""
+
+import math
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+QUALITY_NUDGE = "quality_nudge"
+AI_REVIEW = "ai_review"
+LM_GENERATION = "lm_generation"
+FALLBACK = "fallback"
+TOP_UP = "top_up"
+
+# Share of the budget that must still remain for a stage to run; the least
+# useful stages are dropped first
+STAGE_RESERVES: Dict[str, float] = {
+    QUALITY_NUDGE: 0.30,
+    AI_REVIEW: 0.20,
+    LM_GENERATION: 0.10,
+    FALLBACK: 0.0,
+    TOP_UP: 0.0,
+}
+
+
+class GenerationBudget:
+    """
+    Deadline shared by every slot of one paper (safe to use from several threads).
+
+    `seconds` of None or <= 0 means no budget: every stage is always allowed.
+    """
+
+    def __init__(self, seconds: Optional[float], clock: Callable[[], float] = time.monotonic):
+        self.seconds = seconds if seconds and seconds > 0 else None
+        self._clock = clock
+        self._started = clock()
+        self._lock = threading.Lock()
+        self._skipped: Dict[str, int] = {}
+
+    @property
+    def elapsed(self) -> float:
+        return self._clock() - self._started
+
+    @property
+    def remaining(self) -> float:
+        if self.seconds is None:
+            return math.inf
+        return self.seconds - self.elapsed
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining <= 0
+
+    def allows(self, stage: str) -> bool:
+        """Whether `stage` still fits in the budget; a refusal is recorded as a degradation."""
+        if self.seconds is None or self.remaining > self.seconds * STAGE_RESERVES.get(stage, 0.0):
+            return True
+        with self._lock:
+            self._skipped[stage] = self._skipped.get(stage, 0) + 1
+        return False
+
+    @property
+    def degradations(self) -> Dict[str, int]:
+        """Times each stage was skipped for lack of time."""
+        with self._lock:
+            return dict(self._skipped)
+
+    def report(self) -> Dict:
+        return {
+            "time_budget_seconds": self.seconds,
+            "elapsed_seconds": round(self.elapsed, 2),
+            "degradations": self.degradations,
+        }
@@ -0,0 +1,268 @@
+"""
+Per-(topic, question_type, source) generation outcomes, kept across runs, and
+the retry policy derived from them.
+
+Some topics almost never get an LM-generated question past validation while
+others rarely fail. RetryPolicy reads the recorded yield and latency of each
+generation stage and skips the stages that are not worth their LM calls for a
+bucket, e.g. going straight to variations of curated questions.
+"""
+
+import logging
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Generation stages whose outcomes are recorded (Question.source values, plus the nudge re-prompt)
+GENERATED = "Generated"
+NUDGE = "Nudge"
+VARIATION = "Variation"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generation_stats (
+    topic TEXT NOT NULL,
+    question_type TEXT NOT NULL,
+    source TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    successes INTEGER NOT NULL,
+    total_seconds REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (topic, question_type, source)
+);
+"""
+
+Key = Tuple[str, str, str]
+
+
+@dataclass
+class StageStats:
+    attempts: int = 0
+    successes: int = 0
+    total_seconds: float = 0.0
+
+    @property
+    def success_rate(self) -> float:
+        """Smoothed with one success in two prior attempts, so a few early failures don't condemn a stage."""
+        return (self.successes + 1) / (self.attempts + 2)
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.attempts if self.attempts else 0.0
+
+    @property
+    def seconds_per_success(self) -> float:
+        return self.mean_seconds / self.success_rate
+
+
+class GenerationStats:
+    """
+    SQLite-backed outcome counters; safe to share between threads and processes.
+
+    Reads are served from memory, refreshed from the database every
+    `refresh_interval` seconds to pick up other processes' outcomes.
+    """
+
+    def __init__(self, db_path: str, refresh_interval: float = 60.0):
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._stats: Dict[Key, StageStats] = {}
+        self._loaded_at = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+        self._refresh()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    def _refresh(self) -> None:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT topic, question_type, source, attempts, successes, total_seconds FROM generation_stats"
+            ).fetchall()
+        finally:
+            conn.close()
+        with self._lock:
+            self._stats = {(t, q, s): StageStats(a, n, secs) for t, q, s, a, n, secs in rows}
+            self._loaded_at = time.monotonic()
+
+    def record(self, topic: str, question_type: str, source: str, success: bool, seconds: float) -> None:
+        key = (topic, question_type, source)
+        with self._lock:
+            stats = self._stats.setdefault(key, StageStats())
+            stats.attempts += 1
+            stats.successes += int(success)
+            stats.total_seconds += seconds
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "INSERT INTO generation_stats "
+                    "(topic, question_type, source, attempts, successes, total_seconds, updated_at) "
+                    "VALUES (?, ?, ?, 1, ?, ?, ?) "
+                    "ON CONFLICT (topic, question_type, source) DO UPDATE SET "
+                    "attempts = attempts + 1, successes = successes + excluded.successes, "
+                    "total_seconds = total_seconds + excluded.total_seconds, updated_at = excluded.updated_at",
+                    (topic, question_type, source, int(success), seconds, time.time()),
+                )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not persist generation stats: {e}")
+
+    def get(self, topic: str, question_type: str, source: str) -> StageStats:
+        if time.monotonic() - self._loaded_at > self.refresh_interval:
+            try:
+                self._refresh()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not refresh generation stats: {e}")
+                self._loaded_at = time.monotonic()
+        with self._lock:
+            stats = self._stats.get((topic, question_type, source))
+            return StageStats(stats.attempts, stats.successes, stats.total_seconds) if stats else StageStats()
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Outcomes per stage, keyed "topic / question_type / source"."""
+        with self._lock:
+            items = sorted(self._stats.items())
+        return {
+            " / ".join(key): {
+                "attempts": stats.attempts,
+                "successes": stats.successes,
+                "success_rate": round(stats.success_rate, 3),
+                "avg_seconds": round(stats.mean_seconds, 2),
+            }
+            for key, stats in items
+        }
+
+
+@dataclass(frozen=True)
+class RetryPlan:
+    max_attempts: int
+    use_lm: bool
+    use_nudge: bool
+
+
+class RetryPolicy:
+    """
+    Chooses, per slot, which generation stages are worth trying for a (topic, question_type).
+
+    A stage is skipped once it has MIN_SAMPLES recorded attempts and a success rate
+    below MIN_SUCCESS_RATE, or when its expected seconds per accepted question exceed
+    the time left. A skipped stage is still tried EXPLORE_RATE of the time so its
+    statistics can recover. Without stats every stage runs, as before.
+    """
+
+    DEFAULT_ATTEMPTS = 2
+    # Variations are generated locally, so an extra round costs no LM call
+    VARIATION_ONLY_ATTEMPTS = 3
+    MIN_SAMPLES = 8
+    MIN_SUCCESS_RATE = 0.15
+    EXPLORE_RATE = 0.1
+    TYPE_SWITCH_AFTER = 8
+    QUICK_TYPE_SWITCH_AFTER = 3
+
+    def __init__(self, stats: Optional[GenerationStats] = None):
+        self.stats = stats
+
+    def _worth_trying(self, topic: str, question_type: str, source: str, remaining_seconds: float) -> bool:
+        stats = self.stats.get(topic, question_type, source)
+        if stats.attempts < self.MIN_SAMPLES:
+            return True
+        unpromising = (stats.success_rate < self.MIN_SUCCESS_RATE
+                       or stats.seconds_per_success > remaining_seconds)
+        return not unpromising or random.random() < self.EXPLORE_RATE
+
+    def plan(self, topic: str, question_type: str, remaining_seconds: float = math.inf) -> RetryPlan:
+        if self.stats is None:
+            return RetryPlan(self.DEFAULT_ATTEMPTS, use_lm=True, use_nudge=True)
+        use_lm = self._worth_trying(topic, question_type, GENERATED, remaining_seconds)
+        use_nudge = use_lm and self._worth_trying(topic, question_type, NUDGE, remaining_seconds)
+        if not use_lm:
+            logger.info(f"Skipping LM generation for {topic} ({question_type}): it rarely passes validation")
+        attempts = self.DEFAULT_ATTEMPTS if use_lm else self.VARIATION_ONLY_ATTEMPTS
+        return RetryPlan(attempts, use_lm=use_lm, use_nudge=use_nudge)
+
+    def type_switch_after(self, topic: str, question_type: str) -> int:
+        """Consecutive failures before the top-up tries the other question type."""
+        if self.stats is None:
+            return self.TYPE_SWITCH_AFTER
+        stages = [self.stats.get(topic, question_type, source) for source in (GENERATED, VARIATION)]
+        attempts = sum(s.attempts for s in stages)
+        successes = sum(s.successes for s in stages)
+        if attempts >= self.MIN_SAMPLES and (successes + 1) / (attempts + 2) < self.MIN_SUCCESS_RATE:
+            return self.QUICK_TYPE_SWITCH_AFTER
+        return self.TYPE_SWITCH_AFTER
+
+    def outcomes(self, topic: str, question_type: str) -> "StageOutcomes":
+        return StageOutcomes(self.stats, topic, question_type)
+
+
+class StageOutcomes:
+    """
+    Times the stages one generate_question call goes through and records their outcomes.
+
+    `start(source)` closes the stage in progress as a failure; `succeed()` closes it
+    as a success; `finish()` closes whatever is left as a failure.
+
+    A stage started with `needs_reply` is an LM request: it is only recorded once
+    `replied()` reports that the server answered. Timeouts, server errors and an open
+    circuit breaker say nothing about how well a topic's questions pass validation,
+    so a slow or flapping server must not make the policy give up on the topic.
+    """
+
+    def __init__(self, stats: Optional[GenerationStats], topic: str, question_type: str):
+        self.stats = stats
+        self.topic = topic
+        self.question_type = question_type
+        self._current: Optional[Tuple[str, float, bool]] = None  # (source, started, answered)
+
+    def _close(self, success: bool) -> None:
+        if self._current is None:
+            return
+        source, started, answered = self._current
+        self._current = None
+        if not answered:
+            logger.debug(f"No LM reply for {self.topic} ({self.question_type}) {source}; outcome not recorded")
+            return
+        if self.stats is not None:
+            self.stats.record(self.topic, self.question_type, source, success, time.perf_counter() - started)
+
+    def start(self, source: str, needs_reply: bool = False) -> None:
+        self._close(False)
+        self._current = (source, time.perf_counter(), not needs_reply)
+
+    def replied(self) -> None:
+        """The LM answered the stage's request, so its outcome counts."""
+        if self._current is not None:
+            source, started, _ = self._current
+            self._current = (source, started, True)
+
+    def succeed(self) -> None:
+        self._close(True)
+
+    def finish(self) -> None:
+        self._close(False)
+
+    @contextmanager
+    def tracking(self) -> Iterator["StageOutcomes"]:
+        try:
+            yield self
+        finally:
+            self.finish()
@@ -0,0 +1,158 @@
+"""
+On-disk cache of rendered paper PDFs, keyed by the paper's question set.
+
+Everything in a paper except its header (title, question count, topics and
+generation time) is fixed by its questions, so the formatter caches the
+document rendered with a blank header area of the same height and stamps the
+header of each request onto the first page. A re-download, or another paper
+that ended up with the same questions, then costs a one-page header render
+instead of laying out the whole paper.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+try:
+    from PyPDF2 import PdfReader, PdfWriter
+except ImportError:  # Only needed to combine rendered PDFs (cached paper headers, booklets)
+    PdfReader = PdfWriter = None
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS paper_pdfs (
+    key TEXT PRIMARY KEY,
+    pdf BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_paper_pdfs_access ON paper_pdfs (last_access);
+"""
+
+
+def pdf_merging_available() -> bool:
+    return PdfReader is not None
+
+
+def paper_cache_key(paper_data: Dict, header_height: float, layout_version: int) -> str:
+    """Stable hash of everything that shapes a paper's pages below its header."""
+    material = json.dumps(
+        {
+            "layout": layout_version,
+            "header_height": round(header_height, 3),
+            "questions": [
+                [q.id, q.question_type, q.marks, q.question, list(q.options or [])]
+                for q in paper_data["questions"]
+            ],
+        },
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def stamp_header(body_pdf: bytes, header_pdf: bytes) -> bytes:
+    """Overlay the first page of `header_pdf` onto the first page of `body_pdf`."""
+    body = PdfReader(io.BytesIO(body_pdf))
+    header_page = PdfReader(io.BytesIO(header_pdf)).pages[0]
+    writer = PdfWriter()
+    for index, page in enumerate(body.pages):
+        if index == 0:
+            page.merge_page(header_page)
+        writer.add_page(page)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def concatenate_pdfs(*pdfs: bytes) -> bytes:
+    """One document with the pages of every PDF in `pdfs`, in order."""
+    writer = PdfWriter()
+    for pdf in pdfs:
+        for page in PdfReader(io.BytesIO(pdf)).pages:
+            writer.add_page(page)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+class PaperPDFCache:
+    """
+    SQLite-backed store of header-less paper PDFs with least-recently-used eviction.
+
+    Safe to share between threads and processes; every call uses its own
+    short-lived connection, like the LM response cache.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 500):
+        self.db_path = db_path
+        self.max_entries = max(1, max_entries)
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    def _count(self, stat: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, stat, getattr(self, stat) + amount)
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT pdf FROM paper_pdfs WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            conn.execute("UPDATE paper_pdfs SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._count("hits")
+            return bytes(row[0])
+        finally:
+            conn.close()
+
+    def put(self, key: str, pdf: bytes) -> None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO paper_pdfs (key, pdf, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, pdf, now, now),
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM paper_pdfs").fetchone()
+            if count > self.max_entries:
+                cursor = conn.execute(
+                    "DELETE FROM paper_pdfs WHERE key IN ("
+                    "SELECT key FROM paper_pdfs ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                self._count("evictions", cursor.rowcount)
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
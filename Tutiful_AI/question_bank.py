@@ -0,0 +1,104 @@
+"""
+Indexed, read-only view of the curated question dataset.
+
+Built once when the generator loads the JSON file so that sampling questions
+for a topic is a bucket lookup instead of a scan over every question.
+"""
+
+import random
+import re
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+REQUIRED_FIELDS = ('question', 'options', 'correct_answer_index', 'correct_answer_text', 'topic')
+QUESTION_TYPES = ("MCQ", "Open-ended")
+
+
+def _topic_words(topic: str) -> List[str]:
+    return [w for w in re.split(r"[^a-zA-Z]+", (topic or "").lower()) if w]
+
+
+class QuestionBank:
+    """
+    Buckets the dataset by exact topic, by topic word and by MCQ/open-ended.
+
+    A question is MCQ when it has options. Questions missing any of
+    REQUIRED_FIELDS are still available as originals but are never used as
+    prompt samples. Apart from a memo of similar-topic fallbacks the bank is
+    immutable after construction, so one instance is shared by every thread;
+    per-paper "already used" ids are passed in.
+    """
+
+    def __init__(self, questions: List[Dict]):
+        self.questions = questions
+        self._complete_by_topic: Dict[str, List[Dict]] = {}
+        self._by_topic_type: Dict[Tuple[str, str], List[Dict]] = {}
+        self._topics_by_word: Dict[str, Set[str]] = {}
+        self._similar_cache: Dict[str, List[Dict]] = {}
+
+        for data in questions:
+            if 'topic' not in data:
+                continue
+            topic = data['topic']
+            question_type = "MCQ" if data.get('options') else "Open-ended"
+            self._by_topic_type.setdefault((topic, question_type), []).append(data)
+            if all(field in data for field in REQUIRED_FIELDS):
+                self._complete_by_topic.setdefault(topic, []).append(data)
+            for word in _topic_words(topic):
+                self._topics_by_word.setdefault(word, set()).add(topic)
+
+        self.topics: List[str] = sorted({topic for topic, _ in self._by_topic_type})
+
+    def __len__(self) -> int:
+        return len(self.questions)
+
+    def _similar_topic_questions(self, topic: str) -> List[Dict]:
+        """Complete questions from topics sharing a word (substring) with `topic`."""
+        cached = self._similar_cache.get(topic)
+        if cached is None:
+            words = _topic_words(topic)
+            matching = {
+                candidate
+                for indexed_word, topics in self._topics_by_word.items()
+                if any(word in indexed_word for word in words)
+                for candidate in topics
+            }
+            # Keep dataset order so sampling matches a scan of the raw list
+            cached = [q for q in self.questions if q.get('topic') in matching
+                      and all(field in q for field in REQUIRED_FIELDS)]
+            self._similar_cache[topic] = cached
+        return cached
+
+    def sample_questions(self, topic: str, count: int) -> List[Dict]:
+        """Random complete questions for `topic`, falling back to similarly named topics."""
+        pool = self._complete_by_topic.get(topic) or self._similar_topic_questions(topic)
+        return random.sample(pool, min(count, len(pool)))
+
+    def originals(self, topic: str, question_type: str) -> List[Dict]:
+        bucket_type = "MCQ" if question_type == "MCQ" else "Open-ended"
+        return self._by_topic_type.get((topic, bucket_type), [])
+
+    def iter_unused(self, topic: str, question_type: str, used_ids: Set,
+                    exclude: Optional[Callable[[Dict], bool]] = None) -> Iterator[Dict]:
+        """
+        Yield the bucket's questions in random order, skipping ids in `used_ids`
+        and questions for which `exclude` returns True.
+
+        Sampling is a lazy Fisher-Yates shuffle, so a caller that accepts the
+        first candidate does not pay for shuffling the whole bucket. `used_ids`
+        is checked at each step, so ids reserved meanwhile are skipped too.
+        """
+        bucket = self.originals(topic, question_type)
+        order = list(range(len(bucket)))
+        remaining = len(order)
+        while remaining:
+            pick = random.randrange(remaining)
+            remaining -= 1
+            order[pick], order[remaining] = order[remaining], order[pick]
+            data = bucket[order[remaining]]
+            if data.get('id') not in used_ids and not (exclude and exclude(data)):
+                yield data
+
+    def count(self, topic: str, question_type: Optional[str] = None) -> int:
+        if question_type:
+            return len(self.originals(topic, question_type))
+        return sum(len(self.originals(topic, qt)) for qt in QUESTION_TYPES)
@@ -0,0 +1,203 @@
+"""
+Pre-generated question stock, so papers can be assembled instead of generated
+on the request path.
+
+The inventory stores validated questions per (topic, question_type) together
+with their quality score and context tags. Taking a question removes it, so a
+stocked question is only ever handed to one paper. InventoryBuilder keeps the
+buckets topped up in the background.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS question_inventory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    topic TEXT NOT NULL,
+    question_type TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    quality_score INTEGER NOT NULL,
+    contexts TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_question_inventory_bucket
+    ON question_inventory (topic, question_type, quality_score DESC, created_at);
+"""
+
+Bucket = Tuple[str, str]
+
+
+class QuestionInventory:
+    """SQLite-backed question stock; safe to share between threads and processes."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        return conn
+
+    def add(self, topic: str, question_type: str, payload: Dict, quality_score: int, contexts: Iterable[str]) -> None:
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO question_inventory "
+                "(topic, question_type, payload, quality_score, contexts, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (topic, question_type, json.dumps(payload), int(quality_score),
+                 json.dumps(sorted(contexts)), time.time()),
+            )
+        finally:
+            conn.close()
+
+    def take(self,
+             topic: str,
+             question_type: str,
+             accept: Optional[Callable[[Dict, List[str]], bool]] = None,
+             scan_limit: int = 25) -> Optional[Dict]:
+        """
+        Remove and return the best stocked question in the bucket that `accept`
+        (payload, context tags) allows, or None when nothing suitable is stocked.
+        """
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT id, payload, contexts FROM question_inventory "
+                "WHERE topic = ? AND question_type = ? "
+                "ORDER BY quality_score DESC, created_at LIMIT ?",
+                (topic, question_type, scan_limit),
+            ).fetchall()
+            for row_id, payload, contexts in rows:
+                payload = json.loads(payload)
+                if accept and not accept(payload, json.loads(contexts)):
+                    continue
+                # Another worker may have taken the same row in the meantime
+                if conn.execute("DELETE FROM question_inventory WHERE id = ?", (row_id,)).rowcount:
+                    return payload
+            return None
+        finally:
+            conn.close()
+
+    def contexts(self, topic: str, question_type: str) -> Set[str]:
+        """Context tags already used by the stock of one bucket."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT contexts FROM question_inventory WHERE topic = ? AND question_type = ?",
+                (topic, question_type),
+            ).fetchall()
+        finally:
+            conn.close()
+        tags = set()
+        for (contexts,) in rows:
+            tags.update(json.loads(contexts))
+        return tags
+
+    def levels(self) -> Dict[str, int]:
+        """Stock per bucket, keyed "topic / question_type"."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT topic, question_type, COUNT(*) FROM question_inventory GROUP BY topic, question_type"
+            ).fetchall()
+        finally:
+            conn.close()
+        return {f"{topic} / {question_type}": count for topic, question_type, count in rows}
+
+    def count(self, topic: str, question_type: str) -> int:
+        conn = self._connect()
+        try:
+            (count,) = conn.execute(
+                "SELECT COUNT(*) FROM question_inventory WHERE topic = ? AND question_type = ?",
+                (topic, question_type),
+            ).fetchone()
+            return count
+        finally:
+            conn.close()
+
+
+class InventoryBuilder:
+    """
+    Background thread that tops up every bucket to `target` questions, always
+    filling the emptiest bucket first.
+
+    `produce(topic, question_type, used_contexts)` generates and stocks one
+    question and returns whether it succeeded. While `should_pause()` is true
+    (e.g. papers are being generated live) the builder leaves the LM server alone.
+    """
+
+    def __init__(self,
+                 inventory: QuestionInventory,
+                 buckets: Iterable[Bucket],
+                 produce: Callable[[str, str, Set[str]], bool],
+                 target: int,
+                 should_pause: Optional[Callable[[], bool]] = None,
+                 idle_interval: float = 30.0,
+                 failure_backoff: float = 10.0):
+        self.inventory = inventory
+        self.buckets = list(buckets)
+        self.produce = produce
+        self.target = target
+        self.should_pause = should_pause or (lambda: False)
+        self.idle_interval = idle_interval
+        self.failure_backoff = failure_backoff
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._failures: Dict[Bucket, int] = {}
+
+    def start(self) -> None:
+        if self._thread is not None or not self.buckets or self.target <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="question-inventory-builder", daemon=True)
+        self._thread.start()
+        logger.info(f"Question inventory builder started: {len(self.buckets)} buckets, target {self.target} each")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _next_bucket(self) -> Optional[Bucket]:
+        levels = {bucket: self.inventory.count(*bucket) for bucket in self.buckets}
+        # Buckets that keep failing are tried after the others
+        short = [bucket for bucket, level in levels.items() if level < self.target]
+        if not short:
+            return None
+        return min(short, key=lambda bucket: (self._failures.get(bucket, 0), levels[bucket]))
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            if self.should_pause():
+                self._stopped.wait(1.0)
+                continue
+            try:
+                bucket = self._next_bucket()
+                if bucket is None:
+                    self._stopped.wait(self.idle_interval)
+                    continue
+                topic, question_type = bucket
+                if self.produce(topic, question_type, self.inventory.contexts(topic, question_type)):
+                    self._failures.pop(bucket, None)
+                else:
+                    self._failures[bucket] = self._failures.get(bucket, 0) + 1
+                    self._stopped.wait(self.failure_backoff)
+            except Exception as e:
+                logger.error(f"Question inventory builder error: {e}")
+                self._stopped.wait(self.failure_backoff)
+        logger.info("Question inventory builder stopped")
@@ -0,0 +1,580 @@
+"""
+Declarative rule table for validating and scoring question stems.
+
+Every rule is a small function over a StemScan, which lowercases the stem and
+extracts shared facts (numbers, fractions, speed/distance/time quantities)
+once. Keyword lists are compiled into single alternation patterns, so a check
+costs one regex search however many keywords it covers. evaluate() runs the
+rules of the requested stages in table order and returns a RuleVerdict.
+"""
+
+import re
+from dataclasses import dataclass, field
+from functools import cached_property, lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+# Stages, in the order QuestionValidator.validate_question applies them
+QUALITY = "quality"
+CONTENT = "content"
+CLARITY = "clarity"
+MANUAL = "manual"
+VALIDATION_STAGES = (QUALITY, CONTENT, CLARITY)
+ALL_STAGES = (QUALITY, CONTENT, CLARITY, MANUAL)
+
+
+def _keywords(words: Iterable[str]) -> "re.Pattern":
+    """One pattern matching wherever any of `words` occurs as a substring."""
+    ordered = sorted(set(words), key=len, reverse=True)
+    return re.compile("|".join(re.escape(w) for w in ordered))
+
+
+def _any_of(patterns: Iterable[str], flags: int = 0) -> "re.Pattern":
+    return re.compile("|".join(f"(?:{p})" for p in patterns), flags)
+
+
+_I = re.IGNORECASE
+
+# Shared extractors
+_INTEGER = re.compile(r"\b\d+\b")
+_NUMBER = re.compile(r"\b\d+(?:[.,]\d+)?\b")
+_DECIMAL = re.compile(r"\d+\.\d+")
+_FRACTION = re.compile(r"\d+\s*/\s*\d+")
+_RATIO_PAIR = re.compile(r"\d+\s*:\s*\d+")
+_PERCENT_VALUE = re.compile(r"\d+(?:\.\d+)?\s*%")
+
+# Fractions, ratios and totals
+_FRACTION_OF = re.compile(r"(\d+/\d+|[\d.]+%)\s+of\s+(?:the\s+)?")
+_FRACTION_OF_NUMBER = re.compile(r"(\d+/\d+|[\d.]+%)\s+of\s+(?:the\s+)?\d+")
+_FRACTION_OF_REST = re.compile(r"(\d+/\d+|[\d.]+%)\s+of\s+(?:the\s+)?([^.!?]+)")
+_FRACTION_OF_TOTAL = re.compile(r"(\d+/\d+|[\d.]+%)\s+of\s+\d+")
+_TOTAL_INDICATOR = re.compile(r"\b(total|altogether|in all|sum|all|whole)\s+(?:of\s+)?\d+")
+_RATIO_TOTAL = re.compile(r"\b(total|altogether|in all|sum)\s+(?:of\s+)?\d+", _I)
+_RATIO_PROBLEM = re.compile(r"\bratio\b.*\d+.*:\s*\d+", _I)
+_DIGIT = re.compile(r"\d+")
+
+# "How many" questions
+_HOW_MANY_VERB = re.compile(r"how many\s+\w+\s+(are|is|was|were|does|do|did)")
+_HOW_MANY_FRACTION = re.compile(r"how many.*(\d+/\d+|[\d.]+%)")
+_HOW_MANY = re.compile(r"how many")
+
+# Speed / distance / time
+_SDT_TOPIC = re.compile(r"\b(speed|distance|time)\b", _I)
+_SDT_SPEED = re.compile(r"\d+\s*(km/h|m/s|mph)", _I)
+_SDT_DISTANCE = re.compile(r"\d+\s*(km|m|miles)", _I)
+_SDT_TIME = re.compile(r"\d+\s*(hour|minute|second|hr|min|sec)", _I)
+
+# Quality stage
+_QUESTION_WORDS = _keywords([
+    'what', 'how', 'find', 'calculate', 'determine', 'solve', 'show', 'work', 'answer',
+    'total', 'area', 'perimeter', 'volume', 'cost', 'price', 'time', 'speed', 'distance',
+])
+_TOO_SIMPLE = _any_of([
+    r'add\s+\d+\s+and\s+\d+',
+    r'subtract\s+\d+\s+from\s+\d+',
+    r'multiply\s+\d+\s+by\s+\d+',
+    r'divide\s+\d+\s+by\s+\d+',
+    r'what\s+is\s+\d+\s*\+\s*\d+',
+    r'what\s+is\s+\d+\s*-\s*\d+',
+    r'what\s+is\s+\d+\s*\*\s*\d+',
+    r'what\s+is\s+\d+\s*/\s*\d+',
+])
+_MATH_INDICATORS = _keywords([
+    'fraction', 'decimal', 'percentage', 'ratio', 'proportion',
+    'algebra', 'equation', 'variable', 'unknown',
+    'area', 'perimeter', 'volume', 'surface area', 'capacity',
+    'angle', 'triangle', 'rectangle', 'circle', 'square', 'polygon',
+    'time', 'hour', 'minute', 'second', 'speed', 'distance', 'rate',
+    'average', 'mean', 'median', 'mode', 'graph', 'chart', 'table',
+    'measurement', 'length', 'width', 'height', 'mass', 'weight', 'temperature',
+    'total', 'sum', 'difference', 'product', 'quotient',
+    'round', 'estimate', 'approximate',
+])
+_OPERATION_SYMBOL = re.compile(r"[+\-×x*÷/%]")
+_OPERATION_WORDS = _keywords(['sum of', 'difference between', 'product of', 'quotient of', 'twice', 'thrice', 'per'])
+_COMPLEXITY_UNITS = re.compile(
+    r"\b(?:cm|m|km|mm|kg|g|mg|l|ml|°c|deg|minutes|minute|hours|hour|seconds|second)\b"
+)
+_SCORE_UNITS = re.compile(r"\b(?:cm|m|km|mm|kg|g|mg|l|ml|minutes|minute|hours|hour|seconds|second)\b")
+_MULTI_STEP = _keywords(['then', 'after', 'next', 'remaining', 'altogether', 'in total', 'finally', 'first'])
+
+# Content stage
+_INCOMPLETE_INDICATORS = _keywords([
+    'solve the problem', 'determine the correct answer', 'find the answer', 'calculate the result',
+])
+_EACH_NOUN = re.compile(r"\beach\s+(?:of\s+the\s+)?([a-z]+)", _I)
+_EACH_UNIT_NOUNS = frozenset({
+    'centimetre', 'centimeter', 'metre', 'meter', 'kilometre', 'kilometer',
+    'hour', 'minute', 'second', 'day', 'week', 'month', 'year', 'gram', 'kilogram',
+})
+
+# Clarity stage
+_DIAGRAM_REFERENCE = _any_of([
+    r'look at (the )?(diagram|figure|picture|number line|graph|chart|table|image)',
+    r'refer to (the )?(diagram|figure|picture|number line|graph|chart|table|image)',
+    r'see (the )?(diagram|figure|picture|number line|graph|chart|table|image)',
+    r'(diagram|figure|picture|number line|graph|chart|table|image) (shown|below|above|here)',
+], _I)
+_IN_MOST = re.compile(r"\bin most\b")
+_EXTRANEOUS = _any_of([
+    r'requiring equation solving',
+    r'at a construction site\.',
+    r'at a [^\.]+\.\s*$',  # Location mention at end of sentence
+], _I)
+_ASKS_FOR_COUNT = _any_of([
+    r'how many\s+\w+\s+(?:can|are|is|were|was|does|do|did|will)',
+    r'how many\s+\w+\s+(?:equal|parts|pieces|items|objects|things)',
+    r'how many\s+(?:equal\s+)?parts',
+    r'how many\s+(?:pieces|items|objects|things)',
+    r'number of\s+\w+\s+(?:equal|parts|pieces)',
+])
+_OPTION_LABEL = re.compile(r"^[A-Da-d0-9][\)\.:\-\s]+")
+_OPTION_UNIT = re.compile(r"\b(m|cm|mm|km|m2|m\^2|cm2|cm\^2|m3|m\^3|kg|g|mg|l|ml|litre|liter)\b", _I)
+_AMBIGUOUS_MORE = re.compile(r"\d+/\d+\s+more\s+(?:than\s+)?(?:what|which|it|they|them)")
+
+# Manual stage
+_CORRUPTED_WORDS = ("parmostel", "smmoster", "mostocated")
+_STRAY_ARE = re.compile(r"\bare\.\s*$")
+_ARE_THERE_ARE = re.compile(r"\bare there are\b")
+_BELOW_OR_SHOWN = re.compile(r"\bbelow\b|\bshown\b")
+_TRAILING_FORMAT = re.compile(r"\?\.\s+|\.\s+(are|is|was|were|have|has|had)\s*$")
+_LOCATION_AFTER_QUESTION = re.compile(r"\?\s+(in|at|on)\s+(a|an|the)\s+\w+")
+_DISCRETE_KEYWORDS = _keywords([
+    "goal", "goals", "student", "students", "child", "children", "boy", "boys", "girl", "girls",
+    "book", "books", "shelf", "shelves", "swing", "swings", "turtle", "turtles", "plant", "plants",
+    "computer", "computers", "stand", "stands", "equipment", "items", "boxes", "signpost", "signposts",
+    "dish", "dishes", "test tube", "test tubes", "jar", "jars", "laptop", "laptops", "seat", "seats",
+    "painting", "paintings", "instrument", "instruments", "toy", "toys",
+])
+_MEASUREMENT_KEYWORDS = _keywords([
+    "km", "kilometre", "kilometer", "meter", "metre", "centimetre", "centimeter", "cm", "mm",
+    "litre", "liter", "ml", "kg", "g", "hour", "hours", "minute", "minutes", "second", "seconds",
+    "rate", "speed", "percentage", "percent", "%", "area", "volume", "capacity", "$", "dollar",
+    "price", "cost",
+])
+_STILL_NEED = re.compile(r"still\s+need[s]?\s+(?:to\s+\w+\s+)?(\d+(?:\.\d+)?)")
+_LEFT_IN_TOTAL = re.compile(r"left\s+to\s+\w+\s+in\s+total")
+_TOGETHER_SCORED = re.compile(r"together\s+scored\s+(\d+(?:\.\d+)?)")
+_SCORED_TOTAL = re.compile(r"scored\s+a\s+total\s+of\s+(\d+(?:\.\d+)?)")
+_SCORED_MORE = re.compile(r"scored\s+(\d+(?:\.\d+)?)\s+(?:more|additional)")
+_ROUNDING_INSTRUCTION = re.compile(r"(correct to|decimal place|nearest tenth|nearest hundredth|1 dp|2 dp)")
+
+# Quality score
+_PSLE_TERMS = _keywords([
+    'fraction', 'decimal', 'percentage', 'ratio', 'proportion',
+    'area', 'perimeter', 'volume', 'capacity', 'speed', 'distance', 'time',
+    'angle', 'triangle', 'rectangle', 'circle', 'algebra', 'equation',
+    'average', 'mean', 'data', 'graph', 'chart', 'mass', 'weight', 'length', 'height', 'width', 'unit',
+])
+_APPLICATION_WORDS = _keywords(['calculate', 'find', 'determine', 'solve', 'how many', 'how much'])
+_QUESTION_PHRASES = _keywords(['what', 'work out'])
+_WORKING_WORDS = _keywords(['working', 'steps', 'explain'])
+_OVERUSED_CONTEXTS = _keywords(['canteen', 'shopping', 'mall', 'supermarket', 'pizza', 'ice cream'])
+_LABELLED_OPTION = re.compile(r"^[\s]*[A-D]\)\s*", _I)
+_NUMERIC_OPTION = re.compile(r"^\$?\s*-?(?:\d+(?:[.,]\d+)?|\d+\s*/\s*\d+)\s*(?:[a-z%°c]+)?\s*$", _I)
+
+
+@lru_cache(maxsize=512)
+def _each_quantity_pattern(noun: str) -> "re.Pattern":
+    """Explicit count for the noun after 'each' (e.g. '12 boxes', 'each of the 5 bags')."""
+    plural = noun if noun.endswith('s') else noun + 's'
+    return _any_of([
+        rf'\b\d+\s+(?:\w+\s+)?{plural}\b',
+        rf'\b\d+\s+(?:\w+\s+)?{noun}\b',
+        rf'each\s+of\s+the\s+\d+\s+(?:\w+\s+)?{plural}\b',
+    ], _I)
+
+
+class StemScan:
+    """The facts about one question that several rules share, each computed at most once."""
+
+    def __init__(self, question):
+        self.question = question
+        self.text = question.question or ""
+        self.lower = self.text.lower()
+        self.is_mcq = question.question_type == "MCQ"
+        self.options = question.options or []
+
+    @cached_property
+    def integers(self) -> List[str]:
+        return _INTEGER.findall(self.text)
+
+    @cached_property
+    def numbers(self) -> List[str]:
+        return _NUMBER.findall(self.lower)
+
+    @cached_property
+    def sdt_quantities(self) -> int:
+        """How many of speed, distance and time are given with a value."""
+        return sum((
+            bool(_SDT_SPEED.search(self.lower)),
+            bool(_SDT_DISTANCE.search(self.lower)),
+            bool(_SDT_TIME.search(self.lower)),
+        ))
+
+    @cached_property
+    def has_discrete_nouns(self) -> bool:
+        return bool(_DISCRETE_KEYWORDS.search(self.lower))
+
+    @cached_property
+    def has_measurement(self) -> bool:
+        return bool(_MEASUREMENT_KEYWORDS.search(self.lower))
+
+    def value_in_answer(self, value: str) -> bool:
+        if not value:
+            return False
+        pattern = re.compile(rf"\b{re.escape(value)}\b", _I)
+        if pattern.search(self.question.correct_answer_text or ""):
+            return True
+        return any(pattern.search(str(opt)) for opt in self.options)
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    stage: str
+    # Returns the rejection reason, or None when the question passes
+    check: Callable[[StemScan], Optional[str]]
+
+
+@dataclass
+class RuleVerdict:
+    passed: bool = True
+    reasons: List[str] = field(default_factory=list)
+    failed_rules: List[str] = field(default_factory=list)
+    score_components: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def reason(self) -> str:
+        return self.reasons[0] if self.reasons else ""
+
+    @property
+    def score(self) -> int:
+        return max(0, min(10, sum(self.score_components.values())))
+
+
+RULES: List[Rule] = []
+
+
+def rule(stage: str, name: str):
+    """Register a check in the rule table; rules run in registration order."""
+    def register(check: Callable[[StemScan], Optional[str]]):
+        RULES.append(Rule(name, stage, check))
+        return check
+    return register
+
+
+def complexity_score(lower: str, numbers: Optional[List[str]] = None) -> int:
+    """Lightweight complexity signal for a lowercased stem; validation requires at least 2."""
+    score = 0
+    if _MATH_INDICATORS.search(lower):
+        score += 1
+    if len(_NUMBER.findall(lower) if numbers is None else numbers) >= 2:
+        score += 1
+    if _OPERATION_SYMBOL.search(lower) or _OPERATION_WORDS.search(lower):
+        score += 1
+    if _COMPLEXITY_UNITS.search(lower):
+        score += 1
+    if _MULTI_STEP.search(lower):
+        score += 1
+    return score
+
+
+def quality_score_components(scan: StemScan) -> Dict[str, int]:
+    """PSLE P6 suitability signals; their sum (clamped to 0-10) is the quality score."""
+    qt = scan.lower
+    qlen = len(scan.text)
+    components = {
+        'length': 2 if 60 <= qlen <= 220 else 1 if 40 <= qlen <= 300 else 0,
+        'topic_terms': 2 if _PSLE_TERMS.search(qt) else 0,
+        'application': 2 if _APPLICATION_WORDS.search(qt) else 1 if _QUESTION_PHRASES.search(qt) else 0,
+        'numbers': 1 if len(scan.numbers) >= 2 else 0,
+        'units': 1 if _SCORE_UNITS.search(qt) else 0,
+        'multi_step': 2 if _MULTI_STEP.search(qt) else 0,
+        'format': 0,
+        'overused_context': -1 if _OVERUSED_CONTEXTS.search(qt) else 0,
+    }
+    if scan.is_mcq:
+        if len(scan.options) == 4:
+            # Credit if at least 3 options are numeric-like
+            numeric_like = sum(1 for o in scan.options if _NUMERIC_OPTION.search(_LABELLED_OPTION.sub("", o)))
+            if numeric_like >= 3:
+                components['format'] = 1
+    elif _WORKING_WORDS.search(qt):
+        components['format'] = 1
+    return components
+
+
+# -- Quality ------------------------------------------------------------------
+
+@rule(QUALITY, "question_word")
+def _question_word(scan: StemScan) -> Optional[str]:
+    if not _QUESTION_WORDS.search(scan.lower):
+        return "Question lacks proper question words"
+
+
+@rule(QUALITY, "too_simple")
+def _too_simple(scan: StemScan) -> Optional[str]:
+    if _TOO_SIMPLE.search(scan.lower):
+        return "Question too simple"
+
+
+@rule(QUALITY, "complexity")
+def _complexity(scan: StemScan) -> Optional[str]:
+    if complexity_score(scan.lower, scan.numbers) < 2:
+        return "Question lacks mathematical complexity"
+
+
+# -- Content ------------------------------------------------------------------
+
+@rule(CONTENT, "empty")
+def _empty(scan: StemScan) -> Optional[str]:
+    if scan.text.strip() == "":
+        return "Question text is empty"
+
+
+@rule(CONTENT, "incomplete")
+def _incomplete(scan: StemScan) -> Optional[str]:
+    if len(scan.text) < 100 and _INCOMPLETE_INDICATORS.search(scan.lower):
+        return "Incomplete question"
+
+
+@rule(CONTENT, "fraction_total")
+def _fraction_total(scan: StemScan) -> Optional[str]:
+    # "3/4 of the 60 seats" is fine; "3/4 of the seats" needs a total somewhere
+    if _FRACTION_OF.search(scan.lower) and not _FRACTION_OF_NUMBER.search(scan.lower):
+        if len(scan.integers) < 2 and not _TOTAL_INDICATOR.search(scan.lower):
+            return "Fraction/percentage without explicit total"
+
+
+@rule(CONTENT, "ratio_information")
+def _ratio_information(scan: StemScan) -> Optional[str]:
+    # Ratio problems typically need 3 numbers (2 for the ratio, 1 for a quantity)
+    if _RATIO_PROBLEM.search(scan.lower) and len(scan.integers) < 3 and not _RATIO_TOTAL.search(scan.lower):
+        return "Ratio problem without enough information"
+
+
+@rule(CONTENT, "each_count")
+def _each_count(scan: StemScan) -> Optional[str]:
+    if scan.question.question_type != "Open-ended":
+        return None
+    missing = set()
+    for match in _EACH_NOUN.finditer(scan.lower):
+        noun = match.group(1).lower()
+        # Measurement/unit nouns imply individual counts
+        if noun in _EACH_UNIT_NOUNS:
+            continue
+        if not _each_quantity_pattern(noun).search(scan.lower):
+            missing.add(noun)
+    if missing:
+        return f"'each' reference without explicit count for {', '.join(sorted(missing))}"
+
+
+@rule(CONTENT, "fraction_base")
+def _fraction_base(scan: StemScan) -> Optional[str]:
+    if scan.question.question_type != "Open-ended" or not _FRACTION.search(scan.text):
+        return None
+    stripped = _RATIO_PAIR.sub(' ', _FRACTION.sub(' ', scan.text))
+    if not _INTEGER.search(stripped):
+        return "Fraction question missing a base quantity"
+
+
+@rule(CONTENT, "how_many_context")
+def _how_many_context(scan: StemScan) -> Optional[str]:
+    if not _HOW_MANY_VERB.search(scan.lower):
+        return None
+    if not scan.integers:
+        return "'How many' question without numbers"
+    if _HOW_MANY_FRACTION.search(scan.lower) and not _FRACTION_OF_TOTAL.search(scan.lower):
+        return "'How many' with fraction/% without total"
+
+
+@rule(CONTENT, "speed_distance_time")
+def _speed_distance_time(scan: StemScan) -> Optional[str]:
+    if _SDT_TOPIC.search(scan.lower) and scan.sdt_quantities < 2:
+        return "Speed/distance/time problem with insufficient info"
+
+
+# -- Clarity ------------------------------------------------------------------
+
+@rule(CLARITY, "diagram_reference")
+def _diagram_reference(scan: StemScan) -> Optional[str]:
+    # Diagrams are never rendered in the PDF
+    if _DIAGRAM_REFERENCE.search(scan.lower):
+        return "Question references diagram/figure"
+
+
+@rule(CLARITY, "typo_in_most")
+def _typo_in_most(scan: StemScan) -> Optional[str]:
+    if _IN_MOST.search(scan.lower):
+        return "Contains typo 'in most' (should be 'in all')"
+
+
+@rule(CLARITY, "extraneous_text")
+def _extraneous_text(scan: StemScan) -> Optional[str]:
+    if _EXTRANEOUS.search(scan.text):
+        return "Contains extraneous text"
+
+
+@rule(CLARITY, "count_with_units")
+def _count_with_units(scan: StemScan) -> Optional[str]:
+    if not scan.is_mcq or not scan.options or not _ASKS_FOR_COUNT.search(scan.lower):
+        return None
+    with_units = sum(1 for option in scan.options
+                     if _OPTION_UNIT.search(_OPTION_LABEL.sub('', str(option).strip())))
+    if with_units >= 3:
+        return "Question asks for count but options have units"
+
+
+@rule(CLARITY, "ambiguous_more")
+def _ambiguous_more(scan: StemScan) -> Optional[str]:
+    if scan.question.question_type == "Open-ended" and _AMBIGUOUS_MORE.search(scan.lower):
+        return "Ambiguous 'X more' phrasing without clear reference"
+
+
+@rule(CLARITY, "category_mix")
+def _category_mix(scan: StemScan) -> Optional[str]:
+    # Trees and flowers counted as "species" without saying "plant species"
+    q = scan.lower
+    if 'tree' in q and 'flower' in q and 'species' in q and 'plant species' not in q:
+        return "Logic confusion - mixes different categories"
+
+
+# -- Manual review ------------------------------------------------------------
+
+@rule(MANUAL, "unnatural_phrase")
+def _unnatural_phrase(scan: StemScan) -> Optional[str]:
+    if "how few" in scan.lower:
+        return "Contains unnatural phrase 'how few'"
+    for token in _CORRUPTED_WORDS:
+        if token in scan.lower:
+            return f"Contains corrupted word '{token}'"
+    if _STRAY_ARE.search(scan.lower):
+        return "Ends with stray 'are.' fragment"
+    if _ARE_THERE_ARE.search(scan.lower):
+        return "Contains duplicated phrase 'are there are'"
+
+
+@rule(MANUAL, "missing_figure")
+def _missing_figure(scan: StemScan) -> Optional[str]:
+    if _BELOW_OR_SHOWN.search(scan.lower):
+        return "References diagram/table that is not present"
+
+
+@rule(MANUAL, "trailing_fragments")
+def _trailing_fragments(scan: StemScan) -> Optional[str]:
+    if _TRAILING_FORMAT.search(scan.lower):
+        return "Has trailing fragments or formatting issues"
+    if _LOCATION_AFTER_QUESTION.search(scan.lower):
+        return "Has location phrase after question mark"
+
+
+@rule(MANUAL, "fraction_explicit_total")
+def _fraction_explicit_total(scan: StemScan) -> Optional[str]:
+    match = _FRACTION_OF_REST.search(scan.lower)
+    if match and not _DIGIT.search(match.group(2)):
+        if len(scan.integers) < 2 and not _TOTAL_INDICATOR.search(scan.lower):
+            return f"Fraction/percentage '{match.group(1)}' missing explicit total"
+
+
+@rule(MANUAL, "ratio_numbers")
+def _ratio_numbers(scan: StemScan) -> Optional[str]:
+    if _RATIO_PROBLEM.search(scan.lower) and len(scan.integers) < 3 and not _RATIO_TOTAL.search(scan.lower):
+        return "Ratio problem missing sufficient numbers or total"
+
+
+@rule(MANUAL, "how_many_numbers")
+def _how_many_numbers(scan: StemScan) -> Optional[str]:
+    if not _HOW_MANY_VERB.search(scan.lower):
+        return None
+    if not scan.integers:
+        return "'How many' question has no numbers"
+    if _HOW_MANY_FRACTION.search(scan.lower) and not _FRACTION_OF_TOTAL.search(scan.lower):
+        return "'How many' with fraction/% missing total"
+
+
+@rule(MANUAL, "speed_distance_time_values")
+def _speed_distance_time_values(scan: StemScan) -> Optional[str]:
+    if _SDT_TOPIC.search(scan.lower) and scan.sdt_quantities < 2:
+        return f"Speed/distance/time problem missing information (has {scan.sdt_quantities} of 3 needed)"
+
+
+@rule(MANUAL, "discrete_decimals")
+def _discrete_decimals(scan: StemScan) -> Optional[str]:
+    if not scan.has_discrete_nouns or scan.has_measurement:
+        return None
+    has_decimals = bool(_DECIMAL.search(scan.text))
+    if not has_decimals and scan.is_mcq:
+        has_decimals = any(_DECIMAL.search(str(opt)) for opt in scan.options)
+    if has_decimals:
+        return "Decimal values present in discrete count context"
+
+
+@rule(MANUAL, "still_needs_answer")
+def _still_needs_answer(scan: StemScan) -> Optional[str]:
+    match = _STILL_NEED.search(scan.lower)
+    if match and _LEFT_IN_TOTAL.search(scan.lower) and not scan.value_in_answer(match.group(1)):
+        return "Mismatch between 'still needs' amount and provided answer/options"
+
+
+@rule(MANUAL, "scored_total")
+def _scored_total(scan: StemScan) -> Optional[str]:
+    total = _TOGETHER_SCORED.search(scan.lower)
+    initial = _SCORED_TOTAL.search(scan.lower)
+    more = _SCORED_MORE.search(scan.lower)
+    if total and initial and more:
+        try:
+            if abs((float(initial.group(1)) + float(more.group(1))) - float(total.group(1))) > 0.01:
+                return "Addition relationship inconsistent (initial + more != together total)"
+        except ValueError:
+            pass
+
+
+@rule(MANUAL, "discrete_answer")
+def _discrete_answer(scan: StemScan) -> Optional[str]:
+    if (_HOW_MANY.search(scan.lower) and scan.has_discrete_nouns
+            and _DECIMAL.search(scan.question.correct_answer_text or "") and not scan.has_measurement):
+        return "Correct answer is non-integer for discrete 'How many' question"
+
+
+@rule(MANUAL, "fraction_base_value")
+def _fraction_base_value(scan: StemScan) -> Optional[str]:
+    if not _FRACTION.search(scan.lower):
+        return None
+    stripped = _PERCENT_VALUE.sub(' ', _FRACTION.sub(' ', scan.lower))
+    if not _INTEGER.search(stripped):
+        return "Fraction problem missing explicit total value"
+
+
+@rule(MANUAL, "rounding_options")
+def _rounding_options(scan: StemScan) -> Optional[str]:
+    if scan.is_mcq and _ROUNDING_INSTRUCTION.search(scan.lower):
+        if not any('.' in str(opt) for opt in scan.options):
+            return "Decimal rounding question without decimal options"
+
+
+def evaluate(question,
+             stages: Sequence[str] = ALL_STAGES,
+             first_failure: bool = True,
+             score: bool = False) -> RuleVerdict:
+    """
+    Run the rules of `stages` against `question`.
+
+    With `first_failure` evaluation stops at the first failing rule, as the
+    validator's accept/reject path needs; otherwise every failure is
+    collected. `score` also fills in the quality score components.
+    """
+    scan = StemScan(question)
+    verdict = RuleVerdict()
+    for entry in RULES:
+        if entry.stage not in stages:
+            continue
+        reason = entry.check(scan)
+        if reason:
+            verdict.passed = False
+            verdict.reasons.append(reason)
+            verdict.failed_rules.append(entry.name)
+            if first_failure:
+                break
+    if score:
+        verdict.score_components = quality_score_components(scan)
+    return verdict
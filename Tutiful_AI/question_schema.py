@@ -0,0 +1,91 @@
+"""
+JSON schema of a generated question, for structured-output generation.
+
+LM Studio constrains decoding to a schema passed as `response_format`, so a
+model that supports it returns exactly one well-formed question object.
+`check_question_payload` is the matching check on the parsed result: it is
+hand-written rather than a general schema validator because it runs on every
+generated candidate and only has to cover these few fields.
+"""
+
+from typing import Dict, Optional
+
+OPTION_COUNT = 4
+MAX_MARKS = 5
+
+
+def question_schema(question_type: str) -> Dict:
+    """Schema of the `Question` fields the model fills in for `question_type`."""
+    if question_type == "MCQ":
+        options = {"type": "array", "items": {"type": "string", "minLength": 1},
+                   "minItems": OPTION_COUNT, "maxItems": OPTION_COUNT}
+        answer_index = {"type": "integer", "minimum": 0, "maximum": OPTION_COUNT - 1}
+    else:
+        options = {"type": "array", "items": {"type": "string"}, "maxItems": 0}
+        answer_index = {"type": "integer", "enum": [-1]}
+    return {
+        "type": "object",
+        "properties": {
+            "question": {"type": "string", "minLength": 1},
+            "options": options,
+            "correct_answer_index": answer_index,
+            "correct_answer_text": {"type": "string", "minLength": 1},
+            "question_type": {"type": "string", "enum": [question_type]},
+            "marks": {"type": "integer", "minimum": 1, "maximum": MAX_MARKS},
+        },
+        "required": ["question", "options", "correct_answer_index",
+                     "correct_answer_text", "question_type", "marks"],
+        "additionalProperties": False,
+    }
+
+
+def question_response_format(question_type: str) -> Dict:
+    """`response_format` for a chat request that must return one question."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "psle_question", "strict": True, "schema": question_schema(question_type)},
+    }
+
+
+def _is_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def check_question_payload(data, question_type: str) -> Optional[str]:
+    """
+    Check a parsed model response against `question_schema(question_type)`.
+
+    Returns None when it conforms, otherwise a short description of the
+    first problem found.
+    """
+    if not isinstance(data, dict):
+        return "not a JSON object"
+    question = data.get("question")
+    if not isinstance(question, str) or not question.strip():
+        return "missing question text"
+    if data.get("question_type") != question_type:
+        return f"question_type is {data.get('question_type')!r}, expected {question_type!r}"
+    answer_text = data.get("correct_answer_text")
+    if not isinstance(answer_text, str) or not answer_text.strip():
+        return "missing correct_answer_text"
+    marks = data.get("marks")
+    if not _is_int(marks) or not 1 <= marks <= MAX_MARKS:
+        return f"marks must be an integer from 1 to {MAX_MARKS}"
+
+    options = data.get("options")
+    index = data.get("correct_answer_index")
+    if not isinstance(options, list):
+        return "options must be a list"
+    if question_type == "MCQ":
+        if len(options) != OPTION_COUNT:
+            return f"MCQ needs {OPTION_COUNT} options, got {len(options)}"
+        if not all(isinstance(option, str) and option.strip() for option in options):
+            return "options must be non-empty strings"
+        if not _is_int(index) or not 0 <= index < OPTION_COUNT:
+            return f"correct_answer_index must be 0-{OPTION_COUNT - 1}"
+    else:
+        if options:
+            return "open-ended questions take no options"
+        if index != -1:
+            return "open-ended correct_answer_index must be -1"
+    return None
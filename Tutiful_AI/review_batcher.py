@@ -0,0 +1,96 @@
+"""
+Micro-batching of AI review requests from concurrently generated questions.
+
+When the questions of a paper are generated on several threads, each slot asks
+for a review of its own candidate. ReviewBatcher holds those requests for a
+short window and hands them to one batched review call, so the LM server sees
+one prompt per batch instead of one per candidate.
+"""
+
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+ReviewItem = Tuple[object, str]
+Verdict = Tuple[bool, str]
+
+
+class _PendingReview:
+    __slots__ = ("question", "topic", "verdict")
+
+    def __init__(self, question, topic: str):
+        self.question = question
+        self.topic = topic
+        self.verdict: Optional[Verdict] = None
+
+
+class ReviewBatcher:
+    """
+    Collects review requests from many threads into batches.
+
+    There is no background thread: the first waiting caller collects a batch
+    (up to `batch_size` requests, or whatever arrived within `window` seconds),
+    runs `review_batch` on it outside the lock and hands every caller its
+    verdict. Callers whose request did not fit take over collecting the next one.
+    """
+
+    def __init__(self,
+                 review_batch: Callable[[Sequence[ReviewItem]], List[Verdict]],
+                 batch_size: int,
+                 window: float = 0.25):
+        self.review_batch = review_batch
+        self.batch_size = max(1, batch_size)
+        self.window = window
+        self._cond = threading.Condition()
+        self._pending: List[_PendingReview] = []
+        self._collecting = False
+        self.batches = 0
+        self.reviews = 0
+
+    def review(self, question, topic: str) -> Verdict:
+        """Review one question; blocks until the batch carrying it has been reviewed."""
+        item = _PendingReview(question, topic)
+        with self._cond:
+            self._pending.append(item)
+            self._cond.notify_all()
+            while item.verdict is None:
+                if self._collecting or item not in self._pending:
+                    self._cond.wait()
+                    continue
+                batch = self._collect()
+                self._cond.release()
+                try:
+                    verdicts = self._run(batch)
+                finally:
+                    self._cond.acquire()
+                self.batches += 1
+                self.reviews += len(batch)
+                for pending, verdict in zip(batch, verdicts):
+                    pending.verdict = verdict
+                self._cond.notify_all()
+        return item.verdict
+
+    def _collect(self) -> List[_PendingReview]:
+        """Wait (lock held) until a full batch is queued or the window closes, then take it."""
+        self._collecting = True
+        deadline = time.monotonic() + self.window
+        while len(self._pending) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+        batch = self._pending[:self.batch_size]
+        del self._pending[:self.batch_size]
+        self._collecting = False
+        # Requests left behind elect the next collector
+        self._cond.notify_all()
+        return batch
+
+    def _run(self, batch: List[_PendingReview]) -> List[Verdict]:
+        try:
+            verdicts = self.review_batch([(p.question, p.topic) for p in batch])
+        except Exception as e:
+            verdicts = [(False, f"Review failed: {e}")] * len(batch)
+        if len(verdicts) != len(batch):
+            verdicts = list(verdicts) + [(False, "Review returned no verdict")] * (len(batch) - len(verdicts))
+        return verdicts
@@ -0,0 +1,408 @@
+"""
+Post-processing pipeline for generated question stems.
+
+Every LLM, nudge and variation candidate goes through the same clean-up
+(location openers, capitalisation, placeholder and stale names, trailing
+fragments, existential openings). The patterns are compiled once here and each
+stage is timed so the cost per candidate can be watched.
+"""
+
+import random
+import re
+import threading
+import time
+from typing import Callable, Dict
+
+NAME_POOL = (
+    "Aisha", "Hiro", "Priya", "Diego", "Liam", "Noah", "Emma", "Olivia", "Mia", "Zoe",
+    "Lucas", "Mateo", "Sofia", "Aria", "Isla", "Ethan", "Ava", "Nora", "Leo", "Ivy",
+    "Amir", "Yuna", "Jia", "Wei", "Hana", "Kai", "Maya", "Ravi", "Fatima", "Omar",
+    "Elena", "Camila", "Jonas", "Greta", "Silas", "Anya", "Nikolai", "Layla", "Youssef", "Sora",
+)
+# Overused/common defaults to swap away from
+STALE_NAMES = ("Sarah", "David", "John", "Mary", "Peter", "Jane", "Tom", "James", "Emma", "Michael")
+# 'The <noun>' openings that read better as 'A/An <noun>'
+GENERIC_NOUNS = frozenset((
+    "park", "garden", "hall", "room", "field", "playground", "banner", "plot", "lawn", "carpet",
+    "pond", "fountain", "container", "tank", "box", "crate", "pool", "building", "area",
+    "number", "amount", "ratio", "sum", "difference", "product", "average", "volume", "perimeter",
+    "length", "mass", "time", "distance", "speed", "rate", "student", "students",
+    "teacher", "shop", "store",
+))
+
+_I = re.IGNORECASE
+_VERBS = r"(are|is|was|were|have|has|had|do|does|did)"
+
+# Location openers ("In a park, ...")
+_LOCATION_OPENER = re.compile(r"^\s*(in|at|on)\s+(a|an|the)\s+\w", _I)
+_LOCATION_WITH_COMMA = re.compile(r"^\s*(in|at|on)\s+(a|an|the)\s+([^,]+),\s*(.+)$", _I)
+_LOCATION_NO_COMMA = re.compile(r"^\s*(in|at|on)\s+(a|an|the)\s+([^,]+)\s+(.*)$", _I)
+_TRAILING_COPULA = re.compile(r"\.\s+(are|is|was|were)\s*$", _I)
+
+# Opening polish
+_LOWER_START = re.compile(r"^[a-z]")
+_LEADING_THE = re.compile(r"^\s*the\s+")
+_THE_NOUN = re.compile(r"^The\s+([A-Za-z]+)(\b.*)$")
+_SPACE_BEFORE_PUNCT = re.compile(r"\s+([,.;!?])")
+
+# Names
+_CAPITALISED_WORD = re.compile(r"\b[A-Z][a-z]+\b")
+_NAME_PLACEHOLDER = re.compile(r"\[(?:name|Name|NAME)\]")
+_STALE_NAME_PATTERNS = tuple((name, re.compile(r"\b" + re.escape(name) + r"\b")) for name in STALE_NAMES)
+
+# Trailing fragments, in the order they are applied
+_FRAGMENT_AFTER_PUNCT = re.compile(r"([?!\.])\s*" + _VERBS + r"\s*\.?\s*$", _I)
+_LOCATION_AFTER_PUNCT = re.compile(
+    r"([?!\.])\s+(in|at|on)\s+(a|an|the)\s+[^.!?]+\s*\.?\s*" + _VERBS + r"?\s*$", _I
+)
+_VERB_AFTER_PERIOD = re.compile(r"\.\s+" + _VERBS + r"\s*$", _I)
+_TRAILING_VERB = re.compile(r"\s+" + _VERBS + r"\s*$", _I)
+_LOCATION_AT_END = re.compile(r"([?!\.])\s+(in|at|on)\s+(a|an|the)\s+\w+[^.!?]*\.?\s*$", _I)
+_HAS_QUESTION_PUNCT = re.compile(r"([?!])")
+_LOCATION_START = re.compile(r"^(in|at|on)\s+(a|an|the)\s+", _I)
+_LOCATION_START_SPACED = re.compile(r"^\s*(in|at|on)\s+(a|an|the)\s+", _I)
+_ONLY_VERB = re.compile(r"^" + _VERBS + r"\s*\.?\s*$", _I)
+_COPULA_START = re.compile(r"^(are|is|was|were)\s+", _I)
+_ONLY_COPULA = re.compile(r"^(are|is|was|were)\s*\.?\s*$", _I)
+_DOUBLE_PERIOD = re.compile(r"\.\s*\.\s*$")
+_QUESTION_THEN_PERIOD = re.compile(r"\?\s*\.\s*$")
+_DUPLICATE_DECIMAL_INSTRUCTION = re.compile(
+    r"to\s+(\d+)\s+decimal\s+place(?:s)?\.\s*to\s+(\d+)\s+decimal\s+place(?:s)?", _I
+)
+_DUPLICATE_CORRECT_TO = re.compile(
+    r"correct\s+to\s+(\d+)\s+decimal\s+place(?:s)?\.\s*to\s+(\d+)\s+decimal\s+place(?:s)?", _I
+)
+_DECIMAL_INSTRUCTION_TAIL = re.compile(
+    r"(decimal\s+place(?:s)?)\.\s+(with|or|and|using|in|for)\s+[^.!?]+\s*\.?$", _I
+)
+_TRAILING_INSTRUCTIONS = (
+    re.compile(r"\s+with\s+(cash|measurements|money|units)\s+or\s+[^.!?]+\s*\.?$", _I),
+    re.compile(r"\s+(with|or|and|using)\s+(cash|measurements|money|units)\s*\.?$", _I),
+)
+
+# Existential openings ("There are 24 apples ...")
+_EXISTENTIAL = re.compile(r"^\s*there\s+(is|are|was|were)\b", _I)
+_EXISTENTIAL_SPLIT = re.compile(r"^There\s+(is|are|was|were)\s+(.+)$", _I)
+_RELATIVE_CLAUSE = re.compile(r"^([^.?,;]+?)\s+(that|which)\s+(.*)$", _I)
+_PREPOSITIONAL_TAIL = re.compile(
+    r"^([^.?,;]+?)(\s+(?:in|at|on|with|within|inside|outside|by|for|from|over|under|near|beside|among)\b.*)$",
+    _I,
+)
+_WHITESPACE = re.compile(r"\s+")
+
+# Incomplete fractions such as "3/" or "3/ of"
+_INCOMPLETE_FRACTION = re.compile(r"\d+\s*/\s*(?=\s|of|$|[^0-9])", _I)
+_SLASH_THEN_SPACE_NO_DIGIT = re.compile(r"\b\d+\s*/\s+(?!\d)", _I)
+_SLASH_THEN_SPACE = re.compile(r"\d+\s*/\s+", _I)
+_STARTS_WITH_DIGIT = re.compile(r"^\d")
+_ARTICLE_OR_OF = re.compile(r"^(of|the|a|an)\s", _I)
+
+# Opening classification, matched against the lowercased stem
+_OPENING_PATTERNS = (
+    ("direct_question", re.compile(r"^(how|what|which|when|where|why)\s+")),
+    ("person_action", re.compile(
+        r"^[A-Z][a-z]+\s+(has|had|buys|bought|sells|sold|makes|made|gets|got|wants|needed|"
+        r"distributed|collected|painted|planted|shared|divided)"
+    )),
+    ("quantity_start", re.compile(r"^(\d+|A\s+total\s+of|A\s+group\s+of|An?\s+amount\s+of)\s+")),
+    ("existential", re.compile(r"^there\s+(is|are|was|were)\s+")),
+    ("action_time", re.compile(r"^(after|before|during|when|while|once|if)\s+")),
+    ("article_noun", re.compile(r"^(a|an|the)\s+")),
+    ("location_prep", re.compile(r"^(in|at|on)\s+(a|an|the)\s+")),
+    ("imperative", re.compile(r"^(find|calculate|solve|determine|work\s+out|compute)\s+")),
+)
+
+MAX_CLEANUP_PASSES = 5
+
+
+class StemNormalizer:
+    """
+    Compiled, instrumented clean-up pipeline for question stems.
+
+    Stateless apart from timing counters; per-paper variety state (recent
+    names, existential openings) comes from the GenerationSession passed to
+    `normalize`, so one instance is shared by every thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stage_stats: Dict[str, list] = {}
+
+    def _timed(self, stage: str, func: Callable[..., str], text: str, *args) -> str:
+        start = time.perf_counter()
+        try:
+            result = func(text, *args)
+        except Exception:
+            result = text
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats = self._stage_stats.setdefault(stage, [0, 0.0])
+            stats[0] += 1
+            stats[1] += elapsed
+        return result
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Calls and total/average milliseconds per stage."""
+        with self._lock:
+            return {
+                stage: {
+                    "calls": calls,
+                    "total_ms": round(total * 1000, 3),
+                    "avg_ms": round(total * 1000 / calls, 4) if calls else 0.0,
+                }
+                for stage, (calls, total) in self._stage_stats.items()
+            }
+
+    def normalize(self, text: str, session) -> str:
+        """Run the full pipeline; records the existential-opening decision in `session`."""
+        start = time.perf_counter()
+        s = text
+        if self.starts_with_location_opener(s or ""):
+            rewritten = self._timed("location_opener", self.rewrite_away_from_location_opener, s)
+            if rewritten:
+                s = rewritten
+        s = self._timed("polish_opening", self.polish_opening, s)
+        s = self._timed("placeholder_names", self.replace_placeholder_names, s, session)
+        s = self._timed("trailing_fragments", self.clean_trailing_fragments, s)
+        s = self._timed("existential_opening", self._handle_existential_opening, s, session)
+        s = self._timed("diversify_names", self.diversify_names, s, session)
+        # Fixed point: stop as soon as a pass changes nothing
+        for _ in range(MAX_CLEANUP_PASSES):
+            cleaned = self._timed("trailing_fragments", self.clean_trailing_fragments, s)
+            if cleaned == s:
+                break
+            s = cleaned
+        s = self._timed("fragment_after_question_mark", self._strip_fragment_after_question_mark, s)
+        with self._lock:
+            stats = self._stage_stats.setdefault("total", [0, 0.0])
+            stats[0] += 1
+            stats[1] += time.perf_counter() - start
+        return s
+
+    # -- Openings -----------------------------------------------------------
+
+    @staticmethod
+    def starts_with_location_opener(text: str) -> bool:
+        return bool(_LOCATION_OPENER.match((text or "").strip()))
+
+    @staticmethod
+    def rewrite_away_from_location_opener(text: str) -> str:
+        """Move a leading location phrase to the end.
+        Example: "In a park, Sarah planted trees." -> "Sarah planted trees in a park."
+        """
+        s = (text or "").strip()
+        m = _LOCATION_WITH_COMMA.match(s) or _LOCATION_NO_COMMA.match(s)
+        if not m:
+            return text
+        prep, art, place, rest = m.groups()
+        # Drop trailing fragments like ". are" or ". is"
+        rest = _TRAILING_COPULA.sub("", rest.strip())
+        if not rest.endswith(('.', '!', '?')):
+            rest = rest.rstrip('.')
+        return f"{rest} {prep.lower()} {art.lower()} {place}."
+
+    @staticmethod
+    def polish_opening(text: str) -> str:
+        """Capitalise the first letter and turn 'The <generic noun>' into 'A/An <noun>'."""
+        s = (text or "").strip()
+        if not s:
+            return text
+        if _LOWER_START.match(s):
+            s = s[0].upper() + s[1:]
+        s = _LEADING_THE.sub("The ", s)
+        m = _THE_NOUN.match(s)
+        if m:
+            noun, rest = m.group(1), m.group(2)
+            if noun.lower() in GENERIC_NOUNS:
+                article = "An" if noun[0].lower() in "aeiou" else "A"
+                s = f"{article} {noun}{rest}"
+        return _SPACE_BEFORE_PUNCT.sub(r"\1", s)
+
+    @staticmethod
+    def is_existential_opening(text: str) -> bool:
+        return bool(_EXISTENTIAL.match((text or "").strip()))
+
+    @staticmethod
+    def should_allow_existential(session) -> bool:
+        """Allow existential openings occasionally (about 20% over the recent window)."""
+        window = list(session.recent_existential)
+        if not window:
+            # Cold start: allow with 1/4 probability
+            return random.random() < 0.25
+        ratio = sum(1 for x in window if x) / len(window)
+        if ratio < 0.2:
+            return True
+        # Small chance even above target to avoid a deterministic feel
+        return random.random() < 0.10
+
+    @staticmethod
+    def rewrite_existential_opening(text: str) -> str:
+        """Rewrite 'There is/are/was/were ...' subject-first.
+        Examples:
+          There are 24 apples in a box. -> 24 apples are in a box.
+          There is a tank that holds 80 L. -> A tank holds 80 L.
+        """
+        s = (text or "").strip()
+        m = _EXISTENTIAL_SPLIT.match(s)
+        if not m:
+            return text
+        verb = m.group(1).lower()
+        rest = (m.group(2) or "").strip()
+        if not rest:
+            return text
+        rest_no_trailing = rest.rstrip().rstrip(".!?")
+
+        subject_phrase = rest_no_trailing
+        detail_phrase = ""
+        rel_match = _RELATIVE_CLAUSE.match(rest_no_trailing)
+        if rel_match:
+            subject_phrase = rel_match.group(1).strip()
+            detail_phrase = rel_match.group(3).strip()
+        else:
+            prep_match = _PREPOSITIONAL_TAIL.match(rest_no_trailing)
+            if prep_match:
+                subject_phrase = prep_match.group(1).strip()
+                detail_phrase = prep_match.group(2).strip()
+
+        if subject_phrase and subject_phrase[0].isalpha():
+            subject_phrase = subject_phrase[0].upper() + subject_phrase[1:]
+
+        if rel_match:
+            # The relative clause already has a verb (e.g. "holds 80 L"); drop the copula
+            sentence = f"{subject_phrase} {detail_phrase}"
+        elif detail_phrase:
+            sentence = f"{subject_phrase} {verb} {detail_phrase}"
+        else:
+            sentence = f"{subject_phrase} {verb}"
+
+        sentence = _WHITESPACE.sub(" ", sentence).strip()
+        if sentence and sentence[-1] not in ".!?":
+            sentence += "."
+        return sentence
+
+    def _handle_existential_opening(self, text: str, session) -> str:
+        if not self.is_existential_opening(text):
+            session.recent_existential.append(False)
+            return text
+        allow = self.should_allow_existential(session)
+        session.recent_existential.append(bool(allow))
+        return text if allow else self.rewrite_existential_opening(text)
+
+    @staticmethod
+    def classify_opening(text: str) -> str:
+        """Classify the opening pattern of a stem for variety tracking."""
+        s = (text or "").strip()
+        if not s:
+            return "unknown"
+        s_lower = s.lower()
+        for name, pattern in _OPENING_PATTERNS:
+            if pattern.match(s_lower):
+                return name
+        return "other"
+
+    # -- Names --------------------------------------------------------------
+
+    @staticmethod
+    def _pick_name(recent: set, present: set) -> str:
+        candidates = [n for n in NAME_POOL if n not in recent and n not in present]
+        if not candidates:
+            candidates = [n for n in NAME_POOL if n not in recent]
+        return random.choice(candidates) if candidates else random.choice(NAME_POOL)
+
+    def replace_placeholder_names(self, text: str, session) -> str:
+        """Replace [Name] placeholders with one name per question."""
+        s = text or ""
+        if not s or not _NAME_PLACEHOLDER.search(s):
+            return text
+        chosen = self._pick_name(set(session.recent_names), set(_CAPITALISED_WORD.findall(s)))
+        session.recent_names.append(chosen)
+        return _NAME_PLACEHOLDER.sub(chosen, s)
+
+    def diversify_names(self, text: str, session) -> str:
+        """Replace overused default names, avoiding names used recently or already present."""
+        s = text or ""
+        if not s:
+            return text
+        recent = set(session.recent_names)
+        present = set(_CAPITALISED_WORD.findall(s))
+        for _name, pattern in _STALE_NAME_PATTERNS:
+            if pattern.search(s):
+                new_name = self._pick_name(recent, present)
+                s = pattern.sub(new_name, s)
+                session.recent_names.append(new_name)
+        return s
+
+    # -- Trailing fragments -------------------------------------------------
+
+    @staticmethod
+    def clean_trailing_fragments(text: str) -> str:
+        """Remove fragments (stray verbs, location phrases, repeated instructions) after the stem ends."""
+        s = (text or "").strip()
+        if not s:
+            return text
+
+        # "? are" / ". in a bakery. were" / ". is" / trailing "are"
+        s = _FRAGMENT_AFTER_PUNCT.sub(r"\1", s)
+        s = _LOCATION_AFTER_PUNCT.sub(r"\1", s)
+        s = _VERB_AFTER_PERIOD.sub(".", s)
+        s = _TRAILING_VERB.sub("", s)
+        s = _LOCATION_AT_END.sub(r"\1", s)
+
+        # Keep the stem up to its last ?/! when what follows is a fragment
+        if _HAS_QUESTION_PUNCT.search(s):
+            last_punct = max(s.rfind('?'), s.rfind('!'))
+            if last_punct >= 0:
+                after_punct = s[last_punct + 1:].strip()
+                if _LOCATION_START.match(after_punct):
+                    s = s[:last_punct + 1]
+                elif _ONLY_VERB.match(after_punct):
+                    s = s[:last_punct + 1]
+                elif after_punct and '.' in after_punct:
+                    parts = after_punct.split('.')
+                    if len(parts) > 1 and _LOCATION_START_SPACED.match(parts[0]):
+                        s = s[:last_punct + 1]
+
+        s = _DOUBLE_PERIOD.sub(".", s)
+        s = _QUESTION_THEN_PERIOD.sub("?", s)
+
+        if '?' in s:
+            last_q = s.rfind('?')
+            after_q = s[last_q + 1:].strip()
+            if after_q and (_ONLY_VERB.match(after_q) or _COPULA_START.match(after_q)):
+                s = s[:last_q + 1]
+
+        s = _FRAGMENT_AFTER_PUNCT.sub(r"\1", s)
+        s = _TRAILING_VERB.sub("", s)
+
+        # "to 1 decimal place. to 2 decimal places" -> "to 2 decimal places"
+        s = _DUPLICATE_DECIMAL_INSTRUCTION.sub(r"to \2 decimal places", s)
+        s = _DUPLICATE_CORRECT_TO.sub(r"correct to \2 decimal places", s)
+        s = _DECIMAL_INSTRUCTION_TAIL.sub(r"\1.", s)
+        for pattern in _TRAILING_INSTRUCTIONS:
+            s = pattern.sub("", s)
+        return s.strip()
+
+    @staticmethod
+    def _strip_fragment_after_question_mark(text: str) -> str:
+        if text and '?' in text:
+            last_q = text.rfind('?')
+            after_q = text[last_q + 1:].strip()
+            if after_q and _ONLY_COPULA.match(after_q):
+                return text[:last_q + 1]
+        return text
+
+    # -- Checks -------------------------------------------------------------
+
+    @staticmethod
+    def has_incomplete_fraction(text: str) -> bool:
+        """Detect fractions such as '3/' or '3/ of' that make a question unsolvable."""
+        text = text or ""
+        if _INCOMPLETE_FRACTION.search(text):
+            return True
+        if _SLASH_THEN_SPACE_NO_DIGIT.search(text):
+            match = _SLASH_THEN_SPACE.search(text)
+            if match:
+                after_slash = text[match.end():].strip()
+                if after_slash and not _STARTS_WITH_DIGIT.match(after_slash) and _ARTICLE_OR_OF.match(after_slash):
+                    return True
+        return False
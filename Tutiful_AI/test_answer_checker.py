@@ -0,0 +1,102 @@
+"""
+Regression checks for answer_checker: answer keys must never be "corrected" by
+comparing bare-number options with a solution in a different unit, solvers must
+not fire on stems that ask for something else, and only a confirmed key lets a
+question skip the AI review.
+
+Runs offline: python test_answer_checker.py (or under pytest).
+"""
+
+from answer_checker import REPAIRED, UNDECIDED, VERIFIED, AnswerChecker
+from final_working_generator import Question, QuestionValidator
+
+
+def check(stem, options, answer_index):
+    return AnswerChecker().check(stem, options, answer_index)
+
+
+def test_converts_to_the_unit_asked():
+    result = check("A cuboid measures 50 cm by 40 cm by 30 cm. What is its volume in litres?",
+                   ["60", "600", "6", "60000"], 0)
+    assert result.status == VERIFIED, result
+    assert result.answer_index == 0
+
+    result = check("Eric cycled 10 km at 25 km/h. How many hours did he take?",
+                   ["0.4", "24", "2.5", "250"], 0)
+    assert result.status == VERIFIED, result
+
+    result = check("Eric cycled 10 km at 25 km/h. How many minutes did he take?",
+                   ["0.4", "24", "2.5", "250"], 0)
+    assert result.status == REPAIRED and result.answer_index == 1, result
+    print("[OK] Bare-number options are compared in the unit the question asks for")
+
+
+def test_ambiguous_rounding_keeps_the_key():
+    # 3.33 and 3.3 both round to 3.333... m/s; 200 (m/min) must not win
+    result = check("Tom ran 400 m in 2 minutes. What was his speed in m/s?",
+                   ["3.33", "200", "3.3", "6"], 0)
+    assert result.status == UNDECIDED, result
+    print("[OK] Speed in m/s is not repaired to the m/min value")
+
+
+def test_bare_numbers_without_an_asked_unit_stay_undecided():
+    result = check("A rectangle measures 5 cm by 3 cm. What is its area?", ["15", "8", "16", "30"], 1)
+    assert result.status == UNDECIDED, result
+
+    result = check("A rectangle measures 5 cm by 3 cm. What is its area?",
+                   ["15 cm²", "8 cm²", "16 cm²", "30 cm²"], 1)
+    assert result.status == REPAIRED and result.answer_index == 0, result
+
+    result = check("What is 25% of $80?", ["$20", "$25", "$60", "$40"], 1)
+    assert result.status == REPAIRED and result.answer_index == 0, result
+    print("[OK] Options in an unknown unit neither confirm nor correct the key")
+
+
+def test_solvers_ignore_stems_asking_for_something_else():
+    # "discounted" is not a new price: the question asks for a count of bags
+    result = check("A shop had 300 bags. 20% of them were discounted. "
+                   "How many bags were sold at the discounted price?", ["60", "240", "80", "100"], 0)
+    assert result.status == UNDECIDED, result
+
+    # The area asked for is the triangle's, not the square's
+    result = check("A square has a side of 6 cm. What is the area of a triangle formed by cutting it along a diagonal?",
+                   ["18 cm²", "36 cm²", "12 cm²", "24 cm²"], 0)
+    assert result.status == UNDECIDED, result
+
+    result = check("A bag cost $80. Its price was discounted by 20%. What is the new price?", ["$64", "$16", "$60", "$96"], 0)
+    assert result.status == VERIFIED, result
+    result = check("A square has a side of 6 cm. What is its area?", ["36 cm²", "24 cm²", "12 cm²", "18 cm²"], 0)
+    assert result.status == VERIFIED, result
+    print("[OK] Solvers only answer the quantity the question asks for")
+
+
+def _mcq(stem, options, answer_index):
+    return Question(id="t", question=stem, options=list(options), correct_answer_index=answer_index,
+                    correct_answer_text=options[answer_index], topic="Test", source="Generated", question_type="MCQ")
+
+
+def test_only_a_confirmed_key_skips_the_review():
+    validator = QuestionValidator()
+    question = _mcq("A cuboid measures 50 cm by 40 cm by 30 cm. What is its volume in litres?",
+                    ["60", "600", "6", "60000"], 0)
+    assert validator._calculated_verdict(question) == (True, "Answer verified by calculation (60 l)")
+
+    # A disagreeing calculation leaves the key alone and the question to the review
+    question = _mcq("A cuboid measures 50 cm by 40 cm by 30 cm. What is its volume in litres?",
+                    ["60", "600", "6", "60000"], 1)
+    assert validator._calculated_verdict(question) is None
+    assert question.correct_answer_index == 1 and question.correct_answer_text == "600"
+
+    question = _mcq("A cuboid measures 50 cm by 40 cm by 30 cm. What is its volume in litres?",
+                    ["61", "600", "6", "60000"], 0)
+    assert validator._calculated_verdict(question) is None
+    print("[OK] Repaired or wrong calculations go to review without changing the key")
+
+
+if __name__ == "__main__":
+    test_converts_to_the_unit_asked()
+    test_ambiguous_rounding_keeps_the_key()
+    test_bare_numbers_without_an_asked_unit_stay_undecided()
+    test_solvers_ignore_stems_asking_for_something_else()
+    test_only_a_confirmed_key_skips_the_review()
+    print("All answer checker checks passed!")